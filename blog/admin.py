@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
+from catalog.search import search_blog_posts
 from .models import BlogPost
 
 
@@ -7,9 +8,10 @@ from .models import BlogPost
 class BlogPostAdmin(admin.ModelAdmin):
     list_display = ['title', 'is_published', 'view_count', 'created_at']
     list_filter = ['is_published', 'created_at']
+    # Поле поиска использует полнотекстовый индекс (см. get_search_results)
     search_fields = ['title', 'content']
     list_editable = ['is_published']
-    readonly_fields = ['view_count', 'created_at']
+    readonly_fields = ['view_count', 'created_at', 'announced_at']
 
     fieldsets = (
         ('Основная информация', {
@@ -22,11 +24,17 @@ class BlogPostAdmin(admin.ModelAdmin):
             'fields': ('is_published',)
         }),
         ('Статистика', {
-            'fields': ('view_count', 'created_at'),
+            'fields': ('view_count', 'created_at', 'announced_at'),
             'classes': ('collapse',)
         })
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу вместо icontains по всему тексту записей"""
+        if not search_term.strip():
+            return queryset, False
+        return search_blog_posts(queryset, search_term), False
+
     def has_module_permission(self, request):
         """Только контент-менеджеры могут видеть модуль блога в админке"""
         return request.user.has_perm('blog.can_manage_blog')
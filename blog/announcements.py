@@ -0,0 +1,292 @@
+"""
+Рассылка уведомлений о новых записях блога.
+
+Опубликованная запись без отметки announced_at ждет рассылки; команда
+announce_blog_posts (cron или --loop) отмечает запись и рассылает письмо
+всем активным пользователям по порядку id:
+
+* письмо рендерится один раз на запись и отправляется каждому получателю
+  отдельно, без повторного рендеринга шаблонов;
+* адреса читаются из базы порциями через iterator() (на PostgreSQL —
+  серверный курсор), поэтому в памяти не держится весь список пользователей;
+* порции отправляют BLOG_ANNOUNCEMENT_WORKERS потоков, у каждого свое
+  SMTP-соединение на всю рассылку; общая скорость ограничена
+  BLOG_ANNOUNCEMENT_RATE писем в секунду (лимиты почтового сервера);
+* письма, которые не удалось отправить, сразу после своей порции попадают
+  в очередь users/outbox.py и доставляются командой send_outbox с повторными
+  попытками;
+* после каждой обработанной порции в записи сохраняется id последнего
+  получателя (announcement_cursor). Если процесс упал посреди рассылки,
+  запись без продвижения дольше BLOG_ANNOUNCEMENT_STALE_AFTER секунд снова
+  попадает в ожидающие, и рассылка продолжается со следующего получателя.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from users.outbox import enqueue_bulk
+from .models import BlogPost
+
+logger = logging.getLogger(__name__)
+
+SITE_NAME = 'Skystore'
+
+
+def get_workers():
+    return getattr(settings, 'BLOG_ANNOUNCEMENT_WORKERS', 4)
+
+
+def get_rate():
+    """Ограничение скорости рассылки, писем в секунду (0 — без ограничения)"""
+    return getattr(settings, 'BLOG_ANNOUNCEMENT_RATE', 50)
+
+
+def get_chunk_size():
+    return getattr(settings, 'BLOG_ANNOUNCEMENT_CHUNK_SIZE', 500)
+
+
+def get_stale_after():
+    """Через сколько секунд без продвижения рассылка считается прерванной"""
+    return getattr(settings, 'BLOG_ANNOUNCEMENT_STALE_AFTER', 10 * 60)
+
+
+def pending_posts():
+    """Опубликованные записи, ожидающие рассылки: новые и с прерванной рассылкой"""
+    stale = timezone.now() - timedelta(seconds=get_stale_after())
+    interrupted = Q(announcement_cursor__isnull=False, announced_at__lt=stale)
+    return (
+        BlogPost.objects.filter(is_published=True)
+        .filter(Q(announced_at__isnull=True) | interrupted)
+        .order_by('created_at', 'pk')
+    )
+
+
+def claim_post(post):
+    """
+    Отмечает начало (или продолжение прерванной) рассылки записи.
+
+    Условный UPDATE сравнивает отметки с прочитанными в pending_posts(),
+    поэтому выполняется только одним из одновременно запущенных
+    обработчиков, и запись не будет разослана дважды. Рассылка продолжается
+    с post.announcement_cursor.
+    """
+    cursor = post.announcement_cursor or 0
+    claimed = BlogPost.objects.filter(
+        pk=post.pk,
+        is_published=True,
+        announced_at=post.announced_at,
+        announcement_cursor=post.announcement_cursor,
+    ).update(announced_at=timezone.now(), announcement_cursor=cursor)
+    post.announcement_cursor = cursor
+    return bool(claimed)
+
+
+def save_progress(post, cursor):
+    """Запоминает, что получатели до cursor включительно обработаны"""
+    BlogPost.objects.filter(pk=post.pk).update(
+        announced_at=timezone.now(), announcement_cursor=cursor
+    )
+
+
+def finish_post(post):
+    BlogPost.objects.filter(pk=post.pk).update(
+        announced_at=timezone.now(), announcement_cursor=None
+    )
+
+
+def recipients(after=0, chunk_size=None):
+    """Пары (id, адрес) активных пользователей с id больше after, по порядку id"""
+    User = get_user_model()
+    return (
+        User.objects.filter(is_active=True, pk__gt=after)
+        .exclude(email='')
+        .order_by('pk')
+        .values_list('pk', 'email')
+        .iterator(chunk_size=chunk_size or get_chunk_size())
+    )
+
+
+def render_announcement(post):
+    """Тема, текст и HTML письма о записи — один раз на всю рассылку"""
+    site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000').rstrip('/')
+    context = {
+        'post': post,
+        'site_name': SITE_NAME,
+        'site_url': f'{site_url}/',
+        'post_url': f'{site_url}{post.get_absolute_url()}',
+    }
+    subject = f'Новая запись в блоге {SITE_NAME}: {post.title}'
+    body = render_to_string('blog/emails/post_announcement.txt', context)
+    html_body = render_to_string('blog/emails/post_announcement.html', context)
+    return subject, body, html_body
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class RateLimiter:
+    """Общее для всех потоков ограничение: не больше rate событий в секунду"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            slot = max(self.next_slot, time.monotonic())
+            self.next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class AnnouncementMailer:
+    """Отправка одного письма множеству получателей из пула потоков"""
+
+    def __init__(self, subject, body, html_body='', workers=None, rate=None):
+        self.subject = subject
+        self.body = body
+        self.html_body = html_body
+        self.workers = workers or get_workers()
+        self.limiter = RateLimiter(get_rate() if rate is None else rate)
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def get_connection(self):
+        """SMTP-соединение текущего потока: открывается один раз и переиспользуется"""
+        mail_connection = getattr(self.local, 'connection', None)
+        if mail_connection is None:
+            mail_connection = get_connection(fail_silently=False)
+            mail_connection.open()
+            self.local.connection = mail_connection
+            with self.lock:
+                self.connections.append(mail_connection)
+        return mail_connection
+
+    def reset_connection(self):
+        """После ошибки соединение потока открывается заново"""
+        mail_connection = getattr(self.local, 'connection', None)
+        self.local.connection = None
+        if mail_connection is not None:
+            try:
+                mail_connection.close()
+            except Exception:
+                pass
+
+    def send_chunk(self, emails):
+        """Отправляет письма порции; возвращает (отправлено, недоставленные адреса)"""
+        sent = 0
+        failed = []
+        for email in emails:
+            self.limiter.wait()
+            try:
+                message = EmailMultiAlternatives(
+                    self.subject, self.body, to=[email], connection=self.get_connection()
+                )
+                if self.html_body:
+                    message.attach_alternative(self.html_body, 'text/html')
+                message.send()
+            except Exception as error:
+                logger.warning('Не удалось отправить уведомление на %s: %s', email, error)
+                failed.append(email)
+                self.reset_connection()
+            else:
+                sent += 1
+        return sent, failed
+
+    def run(self, recipients, chunk_size=None, progress=None, on_failed=None, on_chunk_done=None):
+        """
+        Рассылает письмо всем получателям из recipients (пары (id, адрес) по порядку id).
+
+        В работе одновременно не больше двух порций на поток: адреса читаются
+        из базы по мере отправки. Порции завершаются в порядке отправки, поэтому
+        после on_chunk_done(id) все получатели до id включительно обработаны.
+
+        :param progress: вызывается после каждой порции с (отправлено, ошибок, секунд)
+        :param on_failed: вызывается с недоставленными адресами каждой порции
+        :param on_chunk_done: вызывается с id последнего получателя завершенной порции
+        :return: (отправлено, недоставленные адреса, секунд)
+        """
+        sent = 0
+        failed = []
+        started = time.monotonic()
+        # (id последнего получателя порции, future) в порядке отправки
+        in_flight = deque()
+
+        def collect():
+            nonlocal sent
+            while in_flight and in_flight[0][1].done():
+                last_id, future = in_flight.popleft()
+                chunk_sent, chunk_failed = future.result()
+                sent += chunk_sent
+                failed.extend(chunk_failed)
+                if chunk_failed and on_failed:
+                    on_failed(chunk_failed)
+                if on_chunk_done:
+                    on_chunk_done(last_id)
+                if progress:
+                    progress(sent, len(failed), time.monotonic() - started)
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='announce')
+        try:
+            for chunk in chunked(recipients, chunk_size or get_chunk_size()):
+                emails = [email for _, email in chunk]
+                in_flight.append((chunk[-1][0], executor.submit(self.send_chunk, emails)))
+                if len(in_flight) >= self.workers * 2:
+                    wait([in_flight[0][1]])
+                    collect()
+            wait([future for _, future in in_flight])
+            collect()
+        finally:
+            # После ошибки не начинаем еще не начатые порции: они будут разосланы при продолжении
+            executor.shutdown(wait=True, cancel_futures=True)
+            for mail_connection in self.connections:
+                try:
+                    mail_connection.close()
+                except Exception:
+                    pass
+
+        return sent, failed, time.monotonic() - started
+
+
+def announce_post(post, workers=None, rate=None, chunk_size=None, progress=None):
+    """
+    Рассылает уведомление о записи активным пользователям, начиная после
+    post.announcement_cursor, и отмечает рассылку завершенной.
+
+    :return: (отправлено, поставлено в очередь повторов, секунд)
+    """
+    subject, body, html_body = render_announcement(post)
+    mailer = AnnouncementMailer(subject, body, html_body, workers=workers, rate=rate)
+
+    def enqueue_failed(emails):
+        # Недоставленные письма доставит очередь с повторными попытками
+        enqueue_bulk(subject, body, emails, html_body=html_body)
+
+    sent, failed, elapsed = mailer.run(
+        recipients(post.announcement_cursor or 0, chunk_size),
+        chunk_size,
+        progress,
+        on_failed=enqueue_failed,
+        on_chunk_done=lambda cursor: save_progress(post, cursor),
+    )
+    finish_post(post)
+    return sent, len(failed), elapsed
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "blog"
+
+    def ready(self):
+        # Подключаем обработчики сигналов для инвалидации кэша блога
+        from . import signals  # noqa: F401
@@ -0,0 +1,30 @@
+"""
+Кэш списка записей блога.
+
+Страницы списка кэшируются целиком (записи страницы и общее количество),
+отдельно для посетителей и для тех, кто может управлять блогом и видит
+черновики. Ключи включают версию пространства имён блога (см. catalog/cache.py),
+поэтому сохранение или удаление любой записи делает все страницы устаревшими.
+"""
+from django.conf import settings
+
+from catalog.cache import invalidate_namespaces, make_versioned_key
+
+BLOG_NAMESPACE = 'blog'
+
+# Время жизни закэшированной страницы списка. Просмотры переносятся в базу
+# без сигналов (blog/counters.py), поэтому счетчики в списке обновляются по TTL
+BLOG_LIST_CACHE_TIMEOUT = getattr(settings, 'BLOG_LIST_CACHE_TIMEOUT', 60 * 15)
+
+
+def blog_list_page_key(can_manage_blog, page_number):
+    """Ключ страницы списка записей для уровня доступа и номера страницы"""
+    return make_versioned_key(
+        'blog_list_page', 'manage' if can_manage_blog else 'public', page_number,
+        namespaces=(BLOG_NAMESPACE,),
+    )
+
+
+def invalidate_blog_list():
+    """Сбрасывает все закэшированные страницы списка записей (сразу и после фиксации транзакции)"""
+    invalidate_namespaces(BLOG_NAMESPACE)
@@ -0,0 +1,173 @@
+"""
+Буферизованный счетчик просмотров записей блога.
+
+Просмотр не обновляет строку записи сразу: приращения накапливаются в буфере
+(хэш в Redis, если кэш работает на Redis, иначе — словарь в памяти процесса)
+и периодически переносятся в базу запросами вида
+UPDATE ... SET view_count = view_count + n. Популярные записи не становятся
+точкой конкуренции за запись, а одновременные просмотры не теряются.
+
+Буфер в Redis общий для всех процессов и переносится в базу только командой
+flush_blog_views (cron или --loop): просмотр страницы не выполняет запись.
+
+Буфер в памяти процесса команда не видит, поэтому без Redis каждый процесс
+сам сбрасывает свой буфер при просмотре, если с прошлого сброса прошло больше
+BLOG_VIEW_COUNT_FLUSH_INTERVAL секунд; ошибка сброса только записывается в
+лог, приращения возвращаются в буфер. Такой буфер теряется при перезапуске
+процесса — не больше просмотров, чем накоплено за один интервал.
+
+Отдельно от сырого счетчика уникальные просмотры учитываются в рейтинге
+популярности (catalog/trending.py), из которого берется блок «Популярное».
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from catalog import trending
+from catalog.cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'blog_view_buffer'
+
+# Сколько записей выводится в блоке «Популярное» и сколько живет закэшированный список
+POPULAR_POSTS_LIMIT = 5
+POPULAR_POSTS_CACHE_TIMEOUT = 60 * 5
+
+_local_buffer = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def get_flush_interval():
+    """Интервал сброса буфера в базу, секунды"""
+    return getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', 60)
+
+
+def record_view(post_id):
+    """Учитывает один просмотр записи; буфер в памяти процесса при необходимости сбрасывается"""
+    client = get_redis_client()
+    if client is not None:
+        client.hincrby(cache.make_key(BUFFER_KEY), post_id, 1)
+        return
+
+    with _lock:
+        _local_buffer[post_id] += 1
+
+    if time.monotonic() - _last_flush >= get_flush_interval():
+        try:
+            flush_view_counts()
+        except Exception:
+            # Просмотр страницы не должен завершаться ошибкой из-за счетчика
+            logger.exception('Не удалось перенести просмотры записей блога в базу')
+
+
+def pending_views(post_id):
+    """Просмотры записи, еще не перенесенные в базу"""
+    client = get_redis_client()
+    if client is not None:
+        return int(client.hget(cache.make_key(BUFFER_KEY), post_id) or 0)
+    with _lock:
+        return _local_buffer.get(post_id, 0)
+
+
+def _take_buffer():
+    """Забирает накопленные приращения, оставляя буфер пустым"""
+    client = get_redis_client()
+    if client is None:
+        with _lock:
+            counts = dict(_local_buffer)
+            _local_buffer.clear()
+        return counts
+
+    from redis.exceptions import ResponseError
+
+    # RENAME атомарен: просмотры, пришедшие во время сброса, попадут в новый хэш
+    key = cache.make_key(BUFFER_KEY)
+    flushing_key = f'{key}:flushing:{time.time_ns()}'
+    try:
+        client.rename(key, flushing_key)
+    except ResponseError:
+        # Ключа нет — буфер пуст
+        return {}
+    counts = {int(post_id): int(count) for post_id, count in client.hgetall(flushing_key).items()}
+    client.delete(flushing_key)
+    return counts
+
+
+def _return_to_buffer(counts):
+    """Возвращает приращения в буфер, если перенести их в базу не удалось"""
+    client = get_redis_client()
+    if client is not None:
+        key = cache.make_key(BUFFER_KEY)
+        for post_id, count in counts.items():
+            client.hincrby(key, post_id, count)
+        return
+    with _lock:
+        _local_buffer.update(counts)
+
+
+def flush_view_counts():
+    """
+    Переносит накопленные просмотры в базу.
+
+    Записи группируются по величине приращения, поэтому выполняется один
+    UPDATE на каждое различное значение n, а не на каждый просмотр.
+
+    :return: (количество записей, количество просмотров)
+    """
+    global _last_flush
+    from .models import BlogPost
+
+    _last_flush = time.monotonic()
+    counts = _take_buffer()
+    if not counts:
+        return 0, 0
+
+    by_increment = defaultdict(list)
+    for post_id, count in counts.items():
+        by_increment[count].append(post_id)
+
+    try:
+        with transaction.atomic():
+            for increment, post_ids in by_increment.items():
+                BlogPost.objects.filter(pk__in=post_ids).update(
+                    view_count=F('view_count') + increment
+                )
+    except Exception:
+        _return_to_buffer(counts)
+        raise
+
+    return len(counts), sum(counts.values())
+
+
+def get_popular_posts(limit=POPULAR_POSTS_LIMIT):
+    """
+    Опубликованные записи с наибольшим затухающим рейтингом уникальных
+    просмотров (catalog/trending.py). Результат кэшируется на несколько минут.
+    """
+    from .models import BlogPost
+
+    cache_key = f'blog_popular_posts:{limit}'
+    posts = cache.get(cache_key)
+    if posts is not None:
+        return posts
+
+    # Берем с запасом: часть записей могла быть снята с публикации
+    post_ids = trending.top_ids(trending.POST, limit * 2)
+    posts = []
+    if post_ids:
+        queryset = BlogPost.objects.filter(pk__in=post_ids, is_published=True).only(
+            'id', 'title', 'created_at', 'reading_time'
+        )
+        position = {pk: index for index, pk in enumerate(post_ids)}
+        posts = sorted(queryset, key=lambda post: position[post.pk])[:limit]
+
+    cache.set(cache_key, posts, POPULAR_POSTS_CACHE_TIMEOUT)
+    return posts
@@ -0,0 +1,124 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from blog.announcements import (
+    announce_post,
+    claim_post,
+    get_chunk_size,
+    get_rate,
+    get_workers,
+    pending_posts,
+)
+from blog.models import BlogPost
+
+# Как часто выводится промежуточная статистика рассылки, секунды
+PROGRESS_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = 'Рассылает пользователям уведомления о новых опубликованных записях блога'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--post', type=int, help='Разослать указанную запись, даже если рассылка уже была'
+        )
+        parser.add_argument(
+            '--workers', type=int, help='Потоков отправки (по умолчанию BLOG_ANNOUNCEMENT_WORKERS)'
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Писем в секунду, 0 — без ограничения (BLOG_ANNOUNCEMENT_RATE)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, help='Адресов в одной порции (BLOG_ANNOUNCEMENT_CHUNK_SIZE)'
+        )
+        parser.add_argument(
+            '--loop', action='store_true', help='Работать постоянно, проверяя новые записи'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Пауза между проверками в режиме --loop, секунды',
+        )
+
+    def handle(self, *args, **options):
+        self.workers = options['workers'] or get_workers()
+        self.rate = get_rate() if options['rate'] is None else options['rate']
+        self.chunk_size = options['chunk_size'] or get_chunk_size()
+        if self.workers < 1 or self.chunk_size < 1 or options['interval'] < 1:
+            raise CommandError('--workers, --chunk-size и --interval должны быть положительными')
+        if self.rate < 0:
+            raise CommandError('--rate не может быть отрицательным')
+
+        if options['post']:
+            try:
+                post = BlogPost.objects.get(pk=options['post'], is_published=True)
+            except BlogPost.DoesNotExist:
+                raise CommandError(f'Опубликованная запись {options["post"]} не найдена')
+            # Повторная рассылка всем получателям с начала
+            post.announcement_cursor = 0
+            BlogPost.objects.filter(pk=post.pk).update(
+                announced_at=timezone.now(), announcement_cursor=0
+            )
+            self.announce(post)
+            return
+
+        if not options['loop']:
+            if not self.announce_pending():
+                self.stdout.write('Новых записей для рассылки нет')
+            return
+
+        self.stdout.write('📣 Ожидание новых записей для рассылки (Ctrl+C для остановки)')
+        try:
+            while True:
+                self.announce_pending()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            return
+
+    def announce_pending(self):
+        """Рассылает все ожидающие записи; возвращает их количество"""
+        announced = 0
+        for post in pending_posts():
+            # Запись мог забрать другой обработчик
+            if claim_post(post):
+                if post.announcement_cursor:
+                    self.stdout.write(
+                        f'⏩ Продолжение прерванной рассылки после получателя '
+                        f'id={post.announcement_cursor}'
+                    )
+                self.announce(post)
+                announced += 1
+        return announced
+
+    def announce(self, post):
+        self.stdout.write(f'📣 Рассылка «{post.title}»...')
+        last_report = 0
+
+        def progress(sent, failed, elapsed):
+            nonlocal last_report
+            if elapsed - last_report >= PROGRESS_INTERVAL:
+                last_report = elapsed
+                rate = self.format_rate(sent, elapsed)
+                self.stdout.write(f'   отправлено: {sent}, ошибок: {failed} ({rate})')
+
+        sent, queued, elapsed = announce_post(
+            post,
+            workers=self.workers,
+            rate=self.rate,
+            chunk_size=self.chunk_size,
+            progress=progress,
+        )
+        rate = self.format_rate(sent, elapsed)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Отправлено: {sent} за {elapsed:.1f} с ({rate}), '
+            f'в очередь повторов: {queued}'
+        ))
+
+    @staticmethod
+    def format_rate(sent, elapsed):
+        return f'{sent / elapsed:.1f} писем/с' if elapsed > 0 else '—'
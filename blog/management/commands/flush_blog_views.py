@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.counters import flush_view_counts, get_flush_interval
+from catalog.cache import get_redis_client
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит накопленные просмотры записей блога из буфера в Redis в базу. '
+        'Без Redis буфер хранится в памяти каждого веб-процесса и сбрасывается им самим'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, сбрасывая буфер каждые BLOG_VIEW_COUNT_FLUSH_INTERVAL секунд',
+        )
+        parser.add_argument('--interval', type=int, help='Интервал сброса в режиме --loop, секунды')
+
+    def handle(self, *args, **options):
+        if get_redis_client() is None:
+            raise CommandError(
+                'Команда работает только с кэшем на Redis: без него просмотры копятся '
+                'в памяти веб-процессов, и каждый процесс переносит их в базу сам'
+            )
+
+        interval = options['interval'] or get_flush_interval()
+        if interval < 1:
+            raise CommandError('--interval должно быть положительным')
+
+        if not options['loop']:
+            self.flush()
+            return
+
+        self.stdout.write(f'🔁 Сброс просмотров каждые {interval} с (Ctrl+C для остановки)')
+        try:
+            while True:
+                self.flush()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.flush()
+
+    def flush(self):
+        posts, views = flush_view_counts()
+        if posts:
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ Перенесено просмотров: {views} (записей: {posts})')
+            )
+        else:
+            self.stdout.write('Буфер просмотров пуст')
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0002_alter_blogpost_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="excerpt",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=300,
+                verbose_name="Начало записи",
+            ),
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="reading_time",
+            field=models.PositiveSmallIntegerField(
+                default=0, editable=False, verbose_name="Время чтения, мин"
+            ),
+        ),
+        migrations.AddField(
+            model_name="blogpost",
+            name="word_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество слов"
+            ),
+        ),
+    ]
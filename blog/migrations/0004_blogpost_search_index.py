@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:30
+
+from django.db import migrations
+
+from catalog.search import BLOG_POST_INDEX
+
+
+def create_search_index(apps, schema_editor):
+    BLOG_POST_INDEX.install(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    BLOG_POST_INDEX.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0003_blogpost_text_metadata"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
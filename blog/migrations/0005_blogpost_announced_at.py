@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:52
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def mark_published_as_announced(apps, schema_editor):
+    # Уже опубликованные записи не рассылаются повторно при первом запуске рассылки
+    BlogPost = apps.get_model("blog", "BlogPost")
+    BlogPost.objects.filter(is_published=True).update(announced_at=Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0004_blogpost_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="announced_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Разослано уведомление",
+            ),
+        ),
+        migrations.RunPython(
+            mark_published_as_announced, migrations.RunPython.noop
+        ),
+    ]
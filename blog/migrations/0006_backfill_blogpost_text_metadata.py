@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:10
+
+from django.db import migrations
+
+from catalog.text import (
+    backfill_in_batches,
+    count_words,
+    make_excerpt,
+    reading_time_minutes,
+)
+
+# Значение BlogPost.EXCERPT_WORDS на момент миграции
+EXCERPT_WORDS = 20
+TEXT_METADATA_FIELDS = ["excerpt", "word_count", "reading_time"]
+
+
+def fill_text_metadata(apps, schema_editor):
+    BlogPost = apps.get_model("blog", "BlogPost")
+    max_length = BlogPost._meta.get_field("excerpt").max_length
+
+    def refresh(post):
+        post.excerpt = make_excerpt(post.content, EXCERPT_WORDS, max_length)
+        post.word_count = count_words(post.content)
+        post.reading_time = reading_time_minutes(post.word_count)
+
+    backfill_in_batches(
+        BlogPost.objects.only("pk", "content", *TEXT_METADATA_FIELDS),
+        refresh,
+        TEXT_METADATA_FIELDS,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0005_blogpost_announced_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_text_metadata, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0006_backfill_blogpost_text_metadata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blogpost",
+            name="announcement_cursor",
+            field=models.PositiveBigIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Рассылка: обработано до получателя",
+            ),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.urls import reverse
 
+from catalog.text import count_words, make_excerpt, reading_time_minutes
+
 class BlogPost(models.Model):
     """Model representing a blog post."""
     title = models.CharField(max_length=200, verbose_name='Заголовок')
@@ -9,6 +11,31 @@ class BlogPost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     is_published = models.BooleanField(default=False, verbose_name='Опубликовано')
     view_count = models.PositiveIntegerField(default=0, verbose_name='Количество просмотров')
+    # Вычисляются из content при сохранении: списки выводят их без загрузки текста
+    excerpt = models.CharField(
+        max_length=300, blank=True, default='', editable=False, verbose_name='Начало записи'
+    )
+    word_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество слов'
+    )
+    reading_time = models.PositiveSmallIntegerField(
+        default=0, editable=False, verbose_name='Время чтения, мин'
+    )
+    # Рассылка уведомления о публикации (blog/announcements.py): время последнего
+    # продвижения и id последнего получателя, до которого письма уже обработаны
+    # (None — рассылка не идет)
+    announced_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name='Разослано уведомление'
+    )
+    announcement_cursor = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, verbose_name='Рассылка: обработано до получателя'
+    )
+
+    # Сколько слов записи выводится в карточке списка
+    EXCERPT_WORDS = 20
+    TEXT_METADATA_FIELDS = ('excerpt', 'word_count', 'reading_time')
+    COUNTER_FIELDS = ('view_count',)
+    ANNOUNCEMENT_FIELDS = ('announced_at', 'announcement_cursor')
 
     class Meta:
         verbose_name = 'Запись блога'
@@ -25,6 +52,31 @@ class BlogPost(models.Model):
     def __str__(self):
         return self.title
 
+    def refresh_text_metadata(self):
+        """Пересчитывает начало записи, количество слов и время чтения"""
+        self.excerpt = make_excerpt(
+            self.content, self.EXCERPT_WORDS, self._meta.get_field('excerpt').max_length
+        )
+        self.word_count = count_words(self.content)
+        self.reading_time = reading_time_minutes(self.word_count)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.refresh_text_metadata()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.TEXT_METADATA_FIELDS}
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # Счетчик просмотров и ход рассылки меняются только через UPDATE
+            # (blog/counters.py, blog/announcements.py): обычное сохранение не должно
+            # записывать значения, загруженные до этих изменений
+            skipped = {*self.COUNTER_FIELDS, *self.ANNOUNCEMENT_FIELDS}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         """Returns the URL to access a detail record for this blog post."""
         return reverse('blog:post_detail', args=[str(self.id)])
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_blog_list
+from .models import BlogPost
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_on_post_change(sender, instance, **kwargs):
+    """Сбрасываем кэш списка при создании, редактировании, публикации и удалении записи"""
+    invalidate_blog_list()
@@ -1,3 +1,323 @@
-from django.test import TestCase
+from io import StringIO
+from smtplib import SMTPRecipientsRefused
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.tests import count_selects
+from users.models import OutboxEmail
+from .announcements import AnnouncementMailer, pending_posts
+from .cache import blog_list_page_key, invalidate_blog_list
+from . import counters
+from .counters import flush_view_counts
+from .models import BlogPost
+
+User = get_user_model()
+
+
+class BlogPostObjectLoadingTests(TestCase):
+    """Запись блога загружается один раз за запрос при редактировании и удалении"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(
+            username='manager', email='manager@example.com', password='pass'
+        )
+        cls.manager.user_permissions.add(*Permission.objects.filter(
+            codename__in=['can_manage_blog', 'can_edit_any_blog_post', 'can_delete_any_blog_post']
+        ))
+        cls.post = BlogPost.objects.create(title='Запись', content='Текст', is_published=True)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def assertPostLoadedOnce(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = method(url, data) if data is not None else method(url)
+        self.assertEqual(count_selects(queries.captured_queries, BlogPost._meta.db_table), 1)
+        return response
+
+    def test_update_post_loads_blog_post_once(self):
+        url = reverse('blog:post_update', kwargs={'post_id': self.post.pk})
+        data = {'title': 'Новый заголовок', 'content': 'Текст', 'is_published': 'on'}
+        response = self.assertPostLoadedOnce(self.client.post, url, data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_delete_post_loads_blog_post_once(self):
+        url = reverse('blog:post_delete', kwargs={'post_id': self.post.pk})
+        response = self.assertPostLoadedOnce(self.client.post, url, {})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(BlogPost.objects.filter(pk=self.post.pk).exists())
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=3600)
+class BlogPostViewCountTests(TestCase):
+    """Просмотры копятся в буфере и переносятся в базу одним обновлением"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = BlogPost.objects.create(title='Запись', content='Текст', is_published=True)
+        cls.draft = BlogPost.objects.create(title='Черновик', content='Текст', is_published=False)
+
+    def setUp(self):
+        flush_view_counts()
+
+    def test_views_are_buffered_and_flushed(self):
+        url = reverse('blog:post_detail', kwargs={'post_id': self.post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                response = self.client.get(url)
+        self.assertFalse(
+            any(query['sql'].startswith('UPDATE') for query in queries.captured_queries)
+        )
+        self.assertEqual(response.context['post'].view_count, 3)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+        self.assertEqual(flush_view_counts(), (1, 3))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+
+    def test_status_toggle_keeps_flushed_views(self):
+        manager = User.objects.create_user(
+            username='manager', email='manager@example.com', password='pass'
+        )
+        manager.user_permissions.add(Permission.objects.get(codename='can_publish_blog_post'))
+        self.client.force_login(manager)
+        post = BlogPost.objects.get(pk=self.post.pk)
+        self.client.get(reverse('blog:post_detail', kwargs={'post_id': post.pk}))
+        flush_view_counts()
+
+        # Загруженный до переноса просмотров объект сохраняется целиком
+        post.title = 'Новый заголовок'
+        post.save()
+        self.client.post(reverse('blog:toggle_post_status', kwargs={'post_id': post.pk}))
+
+        post.refresh_from_db()
+        self.assertEqual(post.view_count, 1)
+        self.assertEqual(post.title, 'Новый заголовок')
+        self.assertFalse(post.is_published)
+
+    def test_failed_flush_does_not_break_page_view(self):
+        url = reverse('blog:post_detail', kwargs={'post_id': self.post.pk})
+        failing_update = mock.patch(
+            'django.db.models.query.QuerySet.update', side_effect=DatabaseError
+        )
+        with self.settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0), failing_update:
+            with self.assertLogs('blog.counters'):
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # Приращения остались в буфере и переносятся следующим сбросом
+        self.assertEqual(counters.pending_views(self.post.pk), 1)
+        self.assertEqual(flush_view_counts(), (1, 1))
+
+    def test_flush_command_requires_redis(self):
+        with self.assertRaisesMessage(CommandError, 'Redis'):
+            call_command('flush_blog_views', stdout=StringIO())
+
+    def test_unpublished_post_not_counted(self):
+        response = self.client.get(reverse('blog:post_detail', kwargs={'post_id': self.draft.pk}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(flush_view_counts(), (0, 0))
+
+
+class BlogPostListCacheTests(TestCase):
+    """Страница списка записей кэшируется и сбрасывается при изменении записей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = BlogPost.objects.create(
+            title='Запись', content='Текст записи', is_published=True
+        )
+
+    def setUp(self):
+        invalidate_blog_list()
+
+    def test_cached_page_skips_queries(self):
+        url = reverse('blog:post_list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(count_selects(queries.captured_queries, BlogPost._meta.db_table), 0)
+        self.assertContains(response, 'Текст записи')
+
+    def test_list_does_not_load_content(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('blog:post_list'))
+        page_query = next(
+            query['sql'] for query in queries.captured_queries
+            if '"blog_blogpost"."excerpt"' in query['sql']
+        )
+        self.assertNotIn('"blog_blogpost"."content"', page_query)
+
+    def test_saving_post_invalidates_list(self):
+        url = reverse('blog:post_list')
+        self.client.get(url)
+        self.post.title = 'Новый заголовок'
+        self.post.save()
+        self.assertContains(self.client.get(url), 'Новый заголовок')
+
+    def test_list_is_invalidated_again_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Новый заголовок'
+            self.post.save()
+            # Ключ, под которым параллельный запрос мог закэшировать страницу до фиксации
+            during = blog_list_page_key(False, 1)
+        self.assertNotEqual(blog_list_page_key(False, 1), during)
+
+
+class BlogPostTextMetadataTests(TestCase):
+    """Начало записи, количество слов и время чтения вычисляются при сохранении"""
+
+    def test_metadata_populated_on_save(self):
+        post = BlogPost.objects.create(title='Запись', content='слово ' * 400)
+        self.assertEqual(post.word_count, 400)
+        self.assertEqual(post.reading_time, 3)
+        self.assertEqual(len(post.excerpt.split()), BlogPost.EXCERPT_WORDS)
+
+    def test_update_fields_content_refreshes_metadata(self):
+        post = BlogPost.objects.create(title='Запись', content='Короткий текст')
+        post.content = 'Совсем другой и более длинный текст'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'Совсем другой и более длинный текст')
+        self.assertEqual(post.word_count, 6)
+
+
+class BlogPostSearchTests(TestCase):
+    """Поиск по блогу использует полнотекстовый индекс и скрывает черновики от читателей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = BlogPost.objects.create(
+            title='Кофе', content='Как заварить <b>эспрессо</b> дома', is_published=True
+        )
+        cls.draft = BlogPost.objects.create(
+            title='Черновик', content='Эспрессо без кофемашины', is_published=False
+        )
+
+    def test_search_returns_published_posts_with_highlighted_snippet(self):
+        response = self.client.get(reverse('blog:post_search_api'), {'q': 'эспрессо'})
+        results = response.json()['results']
+        self.assertEqual([result['id'] for result in results], [self.post.pk])
+        self.assertIn('<mark>эспрессо</mark>', results[0]['snippet'])
+        self.assertIn('&lt;b&gt;', results[0]['snippet'])
+
+    def test_index_follows_updates(self):
+        self.post.content = 'Теперь про капучино'
+        self.post.save()
+        response = self.client.get(reverse('blog:post_search'), {'q': 'капучино'})
+        self.assertEqual(list(response.context['posts']), [self.post])
+
+    def test_index_follows_deletes(self):
+        self.post.delete()
+        response = self.client.get(reverse('blog:post_search_api'), {'q': 'эспрессо'})
+        self.assertEqual(response.json()['count'], 0)
+
+
+@override_settings(BLOG_ANNOUNCEMENT_RATE=0)
+class BlogPostAnnouncementTests(TestCase):
+    """Уведомления о новых записях рассылаются один раз, порциями из пула потоков"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            User.objects.create_user(
+                username=f'reader{index}', email=f'reader{index}@example.com', password='pass'
+            )
+        User.objects.create_user(
+            username='inactive', email='inactive@example.com', password='pass', is_active=False
+        )
+
+    def announce(self, *args):
+        call_command(
+            'announce_blog_posts', '--chunk-size', '2', '--workers', '2', *args, stdout=StringIO()
+        )
+
+    def test_published_post_is_announced_once(self):
+        draft = BlogPost.objects.create(title='Черновик', content='Текст')
+        post = BlogPost.objects.create(
+            title='Новая запись', content='Текст записи', is_published=True
+        )
+
+        self.announce()
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f'reader{index}@example.com' for index in range(5)],
+        )
+        self.assertIn(post.get_absolute_url(), mail.outbox[0].body)
+        post.refresh_from_db()
+        draft.refresh_from_db()
+        self.assertIsNotNone(post.announced_at)
+        self.assertIsNone(draft.announced_at)
+
+        # Повторная публикация не рассылает запись снова
+        mail.outbox = []
+        post.is_published = False
+        post.save()
+        post.is_published = True
+        post.save()
+        self.announce()
+        self.assertEqual(mail.outbox, [])
+
+        self.announce('--post', str(post.pk))
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_failed_recipients_go_to_outbox(self):
+        BlogPost.objects.create(title='Новая запись', content='Текст', is_published=True)
+        original_send = EmailMultiAlternatives.send
+
+        def send(message, *args, **kwargs):
+            if message.to == ['reader3@example.com']:
+                raise SMTPRecipientsRefused({'reader3@example.com': (550, b'No such user')})
+            return original_send(message, *args, **kwargs)
+
+        with mock.patch.object(EmailMultiAlternatives, 'send', send):
+            self.announce()
+
+        self.assertEqual(len(mail.outbox), 4)
+        queued = OutboxEmail.objects.get()
+        self.assertEqual(queued.to, ['reader3@example.com'])
+        self.assertEqual(queued.subject, mail.outbox[0].subject)
+
+    def test_interrupted_announcement_is_resumed(self):
+        post = BlogPost.objects.create(title='Новая запись', content='Текст', is_published=True)
+        original_send_chunk = AnnouncementMailer.send_chunk
+
+        def send_chunk(mailer, emails):
+            if 'reader4@example.com' in emails:
+                raise RuntimeError('процесс остановлен')
+            sent, failed = original_send_chunk(mailer, emails)
+            # Адрес отклонен сервером
+            if 'reader1@example.com' in emails:
+                return sent - 1, failed + ['reader1@example.com']
+            return sent, failed
+
+        with mock.patch.object(AnnouncementMailer, 'send_chunk', send_chunk):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    'announce_blog_posts', '--chunk-size', '2', '--workers', '1', stdout=StringIO()
+                )
+
+        # Обработанные порции сохранены: недоставленные — в очереди, продолжение — после reader3
+        post.refresh_from_db()
+        self.assertEqual(post.announcement_cursor, User.objects.get(username='reader3').pk)
+        self.assertEqual(OutboxEmail.objects.get().to, ['reader1@example.com'])
+        self.assertNotIn(post, pending_posts())
+
+        mail.outbox = []
+        with self.settings(BLOG_ANNOUNCEMENT_STALE_AFTER=0):
+            self.announce()
+        self.assertEqual([message.to for message in mail.outbox], [['reader4@example.com']])
+        post.refresh_from_db()
+        self.assertIsNone(post.announcement_cursor)
+        self.assertNotIn(post, pending_posts())
@@ -5,6 +5,8 @@ app_name = 'blog'
 
 urlpatterns = [
     path('', views.BlogPostListView.as_view(), name='post_list'),
+    path('search/', views.BlogPostSearchView.as_view(), name='post_search'),
+    path('api/search/', views.blog_search_api, name='post_search_api'),
     path('<int:post_id>/', views.BlogPostDetailView.as_view(), name='post_detail'),
     path('create/', views.BlogPostCreateView.as_view(), name='post_create'),
     path('<int:post_id>/edit/', views.BlogPostUpdateView.as_view(), name='post_update'),
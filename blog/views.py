@@ -5,7 +5,14 @@ from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from django.utils.functional import SimpleLazyObject
+from catalog.mixins import CachedPageMixin, RequestObjectCacheMixin
+from catalog import trending
+from catalog.search import highlight_snippet, search_blog_posts
+from .cache import BLOG_LIST_CACHE_TIMEOUT, blog_list_page_key
+from .counters import get_popular_posts, pending_views, record_view
 from .models import BlogPost
 from .mixins import (
     ContentManagerRequiredMixin,
@@ -15,16 +22,18 @@ from .mixins import (
 )
 
 
-class BlogPostListView(ListView):
-    """Представление для отображения списка записей блога"""
+class BlogPostListView(CachedPageMixin, ListView):
+    """Представление для отображения списка записей блога (страницы кэшируются: blog/cache.py)"""
     model = BlogPost
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     paginate_by = 6
     ordering = ['-created_at']
+    page_cache_timeout = BLOG_LIST_CACHE_TIMEOUT
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # Карточки выводят сохраненное начало записи — полный текст не загружаем
+        queryset = super().get_queryset().defer('content')
 
         # Обычные пользователи видят только опубликованные записи
         if not self.request.user.has_perm('blog.can_manage_blog'):
@@ -32,13 +41,81 @@ class BlogPostListView(ListView):
 
         return queryset
 
+    def get_page_cache_key(self, page_number):
+        return blog_list_page_key(self.request.user.has_perm('blog.can_manage_blog'), page_number)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Блог - Skystore'
+        # Ленивый объект: рейтинг читается, только если шаблон выводит блок
+        context['popular_posts'] = SimpleLazyObject(get_popular_posts)
         context['can_manage_blog'] = self.request.user.has_perm('blog.can_manage_blog')
         return context
 
 
+class BlogPostSearchView(ListView):
+    """Полнотекстовый поиск по записям блога с выделением совпадений"""
+    template_name = 'blog/post_search.html'
+    context_object_name = 'posts'
+    paginate_by = 10
+
+    def get_search_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self):
+        return search_blog_posts(
+            _get_searchable_posts(self.request.user), self.get_search_query(), snippets=True
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.get_search_query()
+        context.update({
+            'title': f'Поиск в блоге: {query}' if query else 'Поиск в блоге',
+            'query': query,
+        })
+        return context
+
+
+def _get_searchable_posts(user):
+    """Записи, доступные пользователю для поиска (без полного текста)"""
+    queryset = BlogPost.objects.defer('content')
+    # Читатели ищут только среди опубликованных записей
+    if not user.has_perm('blog.can_manage_blog'):
+        queryset = queryset.filter(is_published=True)
+    return queryset
+
+
+def blog_search_api(request):
+    """JSON-эндпоинт поиска по блогу: ?q=<запрос>&page=<номер>"""
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(
+        search_blog_posts(_get_searchable_posts(request.user), query, snippets=True),
+        BlogPostSearchView.paginate_by,
+    )
+    page = paginator.get_page(request.GET.get('page'))
+
+    return JsonResponse({
+        'query': query,
+        'count': paginator.count,
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'has_next': page.has_next(),
+        'results': [
+            {
+                'id': post.pk,
+                'title': post.title,
+                'snippet': highlight_snippet(post.search_snippet),
+                'created_at': post.created_at.isoformat(),
+                'reading_time': post.reading_time,
+                'url': post.get_absolute_url(),
+                'rank': post.search_rank,
+            }
+            for post in page.object_list
+        ],
+    })
+
+
 class BlogPostDetailView(DetailView):
     """Представление для отображения детальной информации о записи блога"""
     model = BlogPost
@@ -49,20 +126,23 @@ class BlogPostDetailView(DetailView):
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
 
-        # Увеличиваем счетчик просмотров
-        obj.view_count += 1
-        obj.save(update_fields=['view_count'])
-
         # Проверяем права доступа к неопубликованным записям
         if not obj.is_published and not self.request.user.has_perm('blog.can_manage_blog'):
-            from django.http import Http404
             raise Http404("Запись блога не найдена")
 
+        # Просмотр попадает в буфер и переносится в базу пакетно (blog/counters.py)
+        record_view(obj.pk)
+        obj.view_count += pending_views(obj.pk)
+        # Уникальные посетители и рейтинг популярности
+        if obj.is_published:
+            trending.record_view(trending.POST, obj.pk, trending.visitor_id(self.request))
+
         return obj
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = f'{self.object.title} - Блог'
+        context['unique_visitors'] = trending.unique_visitors(trending.POST, self.object.pk)
         context['can_manage_blog'] = self.request.user.has_perm('blog.can_manage_blog')
         context['can_edit'] = self.request.user.has_perm('blog.can_edit_any_blog_post')
         context['can_delete'] = self.request.user.has_perm('blog.can_delete_any_blog_post')
@@ -94,7 +174,9 @@ class BlogPostCreateView(LoginRequiredMixin, ContentManagerRequiredMixin, Create
         return context
 
 
-class BlogPostUpdateView(LoginRequiredMixin, BlogEditAnyRequiredMixin, UpdateView):
+class BlogPostUpdateView(
+    LoginRequiredMixin, BlogEditAnyRequiredMixin, RequestObjectCacheMixin, UpdateView
+):
     """Представление для редактирования записи блога"""
     model = BlogPost
     fields = ['title', 'content', 'preview', 'is_published']
@@ -122,7 +204,9 @@ class BlogPostUpdateView(LoginRequiredMixin, BlogEditAnyRequiredMixin, UpdateVie
         return context
 
 
-class BlogPostDeleteView(LoginRequiredMixin, BlogDeleteAnyRequiredMixin, DeleteView):
+class BlogPostDeleteView(
+    LoginRequiredMixin, BlogDeleteAnyRequiredMixin, RequestObjectCacheMixin, DeleteView
+):
     """Представление для удаления записи блога"""
     model = BlogPost
     template_name = 'blog/post_confirm_delete.html'
@@ -130,13 +214,15 @@ class BlogPostDeleteView(LoginRequiredMixin, BlogDeleteAnyRequiredMixin, DeleteV
     pk_url_kwarg = 'post_id'
     success_url = reverse_lazy('blog:post_list')
 
-    def delete(self, request, *args, **kwargs):
-        post_title = self.get_object().title
+    def form_valid(self, form):
+        # DeleteView обрабатывает POST через form_valid; объект уже загружен в post()
+        post_title = self.object.title
+        response = super().form_valid(form)
         messages.success(
             self.request,
             f'Запись блога "{post_title}" успешно удалена!'
         )
-        return super().delete(request, *args, **kwargs)
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -153,7 +239,7 @@ def toggle_blog_post_status(request, post_id):
 
         # Переключаем статус публикации
         post.is_published = not post.is_published
-        post.save()
+        post.save(update_fields=['is_published'])
 
         status_text = 'опубликована' if post.is_published else 'снята с публикации'
 
@@ -167,4 +253,4 @@ def toggle_blog_post_status(request, post_id):
         return JsonResponse({
             'success': False,
             'message': f'Ошибка: {str(e)}'
-        })
\ No newline at end of file
+        })
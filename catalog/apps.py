@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "catalog"
+
+    def ready(self):
+        # Подключаем обработчики сигналов для инвалидации кэша каталога
+        from . import signals  # noqa: F401
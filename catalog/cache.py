@@ -0,0 +1,159 @@
+"""
+Кэш-слой каталога с версионированием пространств имён.
+
+Каждому пространству имён (весь каталог, категория) соответствует
+счетчик версии, который хранится в кэше. Версии входят в ключи закэшированных
+списков, поэтому для инвалидации достаточно увеличить счетчик: старые записи
+перестают читаться и вытесняются по TTL, а списки могут жить часами.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+
+GLOBAL_NAMESPACE = 'global'
+VERSION_KEY_PREFIX = 'catalog_ns_version'
+
+# Время жизни закэшированных списков товаров (по умолчанию 6 часов)
+LISTING_CACHE_TIMEOUT = getattr(settings, 'CATALOG_LISTING_CACHE_TIMEOUT', 60 * 60 * 6)
+
+# Время жизни фрагмента страницы товара (ключ включает updated_at и уровень доступа)
+PRODUCT_DETAIL_CACHE_TIMEOUT = getattr(settings, 'CATALOG_PRODUCT_DETAIL_CACHE_TIMEOUT', 60 * 60)
+
+# Сколько похожих товаров показывать на странице товара
+RELATED_PRODUCTS_LIMIT = 4
+RELATED_KEY_PREFIX = 'catalog_related_ids'
+
+
+def get_redis_client():
+    """
+    Клиент Redis из кэша Django для операций, которых нет в API кэша
+    (хэши, HyperLogLog, сортированные множества). None, если кэш не на Redis.
+    """
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        return backend._cache.get_client(write=True)
+    return None
+
+
+def category_namespace(category_id):
+    """Пространство имён списков конкретной категории"""
+    return f'category:{category_id}'
+
+
+def _version_key(namespace):
+    return f'{VERSION_KEY_PREFIX}:{namespace}'
+
+
+def _initial_version():
+    # Версия на основе времени: если счетчик вытеснен из кэша, новая версия
+    # не совпадет ни с одной из тех, что уже встречаются в ключах
+    return time.time_ns()
+
+
+def get_namespace_versions(*namespaces):
+    """
+    Возвращает словарь {пространство имён: версия} одним обращением к кэшу.
+    Отсутствующие счетчики инициализируются.
+    """
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    stored = cache.get_many(list(keys))
+
+    versions = {}
+    for key, namespace in keys.items():
+        version = stored.get(key)
+        if version is None:
+            version = _initial_version()
+            # add не перезапишет значение, установленное параллельным запросом
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[namespace] = version
+    return versions
+
+
+def bump_namespaces(*namespaces):
+    """Увеличивает версии пространств имён, делая их закэшированные данные устаревшими"""
+    for namespace in set(namespaces):
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Счетчика нет в кэше — начинаем с новой версии
+            cache.set(key, _initial_version(), None)
+
+
+def invalidate_namespaces(*namespaces):
+    """
+    Инвалидирует пространства имён сейчас и еще раз после фиксации транзакции.
+
+    Изменения, сделанные в транзакции, до фиксации не видны другим запросам:
+    параллельный запрос может прочитать старые строки уже после первого
+    увеличения версии и закэшировать их под новой версией. Повторное
+    увеличение после фиксации делает такие записи устаревшими. Вне транзакции
+    on_commit выполняется сразу.
+    """
+    bump_namespaces(*namespaces)
+    transaction.on_commit(lambda: bump_namespaces(*namespaces))
+
+
+def make_versioned_key(prefix, *parts, namespaces=(GLOBAL_NAMESPACE,)):
+    """
+    Строит ключ кэша, включающий текущие версии перечисленных пространств имён.
+
+    :param prefix: префикс ключа, например 'index_page'
+    :param parts: дополнительные части ключа (пользователь, фильтры и т.п.)
+    :param namespaces: пространства имён, от которых зависят данные
+    :return: str
+    """
+    versions = get_namespace_versions(*namespaces)
+    version_part = '.'.join(str(versions[namespace]) for namespace in namespaces)
+    return '_'.join([prefix, *map(str, parts), f'v{version_part}'])
+
+
+def invalidate_products(category_ids=()):
+    """
+    Инвалидирует закэшированные списки после изменения товаров:
+    весь каталог и затронутые категории. Списки с неопубликованными
+    товарами пользователя тоже зависят от версии всего каталога.
+    """
+    invalidate_namespaces(
+        GLOBAL_NAMESPACE,
+        *(category_namespace(category_id) for category_id in category_ids if category_id),
+    )
+
+
+def invalidate_category(category_id):
+    """Инвалидирует списки после изменения или удаления категории"""
+    invalidate_namespaces(GLOBAL_NAMESPACE, category_namespace(category_id))
+
+
+def _related_key(category_id):
+    return f'{RELATED_KEY_PREFIX}:{category_id}'
+
+
+def refresh_related_product_ids(category_id):
+    """
+    Пересчитывает список похожих товаров категории: id новейших опубликованных товаров.
+
+    Хранится на один товар больше, чем выводится, чтобы после исключения
+    текущего товара на странице оставалось RELATED_PRODUCTS_LIMIT карточек.
+    """
+    from .models import Product
+
+    product_ids = list(
+        Product.objects.filter(category_id=category_id, publish='published')
+        .order_by('-created_at', '-id')
+        .values_list('id', flat=True)[:RELATED_PRODUCTS_LIMIT + 1]
+    )
+    cache.set(_related_key(category_id), product_ids, LISTING_CACHE_TIMEOUT)
+    return product_ids
+
+
+def get_related_product_ids(category_id):
+    """Возвращает предрасчитанный список похожих товаров категории (одно обращение к кэшу)"""
+    product_ids = cache.get(_related_key(category_id))
+    if product_ids is None:
+        product_ids = refresh_related_product_ids(category_id)
+    return product_ids
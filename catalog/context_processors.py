@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from catalog.services import CategoryService
+
+
+def category_navigation(request):
+    """Навигация по категориям для всех шаблонов (вычисляется только при использовании)"""
+    return {
+        'category_nav': SimpleLazyObject(CategoryService.get_navigation),
+    }
@@ -1,6 +1,6 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from django.core.files.images import get_image_dimensions
+from PIL import Image, UnidentifiedImageError
 from .models import Product
 import os
 
@@ -12,10 +12,72 @@ FORBIDDEN_WORDS = [
     'взлом', 'hack', 'крипта', 'crypto', 'ставки', 'betting'
 ]
 
+# Допустимый диапазон цены товара (в рублях)
+MIN_PRODUCT_PRICE = 0
+MAX_PRODUCT_PRICE = 1000000
+
 # Константы для валидации изображений
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 МБ в байтах
 ALLOWED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png']
 ALLOWED_CONTENT_TYPES = ['image/jpeg', 'image/png']
+ALLOWED_IMAGE_FORMATS = ['JPEG', 'PNG']
+MIN_IMAGE_SIDE = 100
+MAX_IMAGE_SIDE = 5000
+
+
+def read_image_header(image):
+    """
+    Определяет формат и размеры изображения по заголовку файла.
+    Пиксели не декодируются: Pillow читает только начало файла.
+
+    :return: (формат, (ширина, высота))
+    """
+    image.seek(0)
+    try:
+        with Image.open(image) as img:
+            return img.format, img.size
+    except Image.DecompressionBombError:
+        raise ValidationError(
+            'Изображение слишком большое. '
+            f'Максимальный размер: {MAX_IMAGE_SIDE}x{MAX_IMAGE_SIDE} пикселей'
+        )
+    except (UnidentifiedImageError, OSError, ValueError):
+        raise ValidationError(
+            'Не удается обработать загруженное изображение. '
+            'Убедитесь, что файл не поврежден'
+        )
+    finally:
+        image.seek(0)
+
+
+def validate_forbidden_words(value, subject):
+    """
+    Проверяет текст на запрещенные слова.
+    Используется формой продукта и командой импорта товаров.
+
+    :param value: проверяемый текст
+    :param subject: что проверяется, для сообщения об ошибке ("Название продукта")
+    """
+    value_lower = value.lower()
+
+    for word in FORBIDDEN_WORDS:
+        if word in value_lower:
+            raise ValidationError(
+                f'{subject} не может содержать запрещенное слово: "{word}"'
+            )
+
+
+def validate_product_price(price):
+    """Проверяет, что цена продукта находится в допустимом диапазоне"""
+    if price < MIN_PRODUCT_PRICE:
+        raise ValidationError(
+            'Цена продукта не может быть отрицательной'
+        )
+
+    if price > MAX_PRODUCT_PRICE:
+        raise ValidationError(
+            'Цена продукта не может превышать 1 000 000 рублей'
+        )
 
 
 def validate_image_file(image):
@@ -51,36 +113,45 @@ def validate_image_file(image):
                 'Файл должен быть изображением в формате JPEG или PNG'
             )
 
-    # Дополнительная проверка, что файл действительно является изображением
-    try:
-        # Попытка получить размеры изображения
-        width, height = get_image_dimensions(image)
-        if width is None or height is None:
-            raise ValidationError(
-                'Загруженный файл не является корректным изображением'
-            )
-
-        # Проверка минимальных размеров (опционально)
-        if width < 100 or height < 100:
-            raise ValidationError(
-                'Изображение слишком маленькое. '
-                'Минимальный размер: 100x100 пикселей'
-            )
+    # Формат и размеры берутся из заголовка файла, без полного декодирования
+    image_format, (width, height) = read_image_header(image)
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise ValidationError(
+            'Файл должен быть изображением в формате JPEG или PNG'
+        )
 
-        # Проверка максимальных размеров (опционально)
-        if width > 5000 or height > 5000:
-            raise ValidationError(
-                'Изображение слишком большое. '
-                'Максимальный размер: 5000x5000 пикселей'
-            )
+    if width < MIN_IMAGE_SIDE or height < MIN_IMAGE_SIDE:
+        raise ValidationError(
+            'Изображение слишком маленькое. '
+            f'Минимальный размер: {MIN_IMAGE_SIDE}x{MIN_IMAGE_SIDE} пикселей'
+        )
 
-    except Exception:
+    if width > MAX_IMAGE_SIDE or height > MAX_IMAGE_SIDE:
         raise ValidationError(
-            'Не удается обработать загруженное изображение. '
-            'Убедитесь, что файл не поврежден'
+            'Изображение слишком большое. '
+            f'Максимальный размер: {MAX_IMAGE_SIDE}x{MAX_IMAGE_SIDE} пикселей'
         )
 
 
+class HeaderOnlyImageField(forms.ImageField):
+    """
+    Поле изображения без полной проверки файла.
+
+    Стандартный forms.ImageField вызывает Image.verify(), который читает весь
+    файл. Здесь формат определяется только по заголовку, а размеры и формат
+    проверяет validate_image_file.
+    """
+
+    def to_python(self, data):
+        f = forms.FileField.to_python(self, data)
+        if f is None:
+            return None
+
+        image_format, _ = read_image_header(f)
+        f.content_type = Image.MIME.get(image_format)
+        return f
+
+
 class ProductForm(forms.ModelForm):
     """Форма для создания и редактирования продуктов"""
 
@@ -88,6 +159,9 @@ class ProductForm(forms.ModelForm):
         model = Product
         # Исключаем поле owner из формы - оно будет заполняться автоматически
         fields = ['name', 'description', 'price', 'category', 'image']  # Убрали publish из обязательных полей
+        field_classes = {
+            'image': HeaderOnlyImageField,
+        }
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -173,13 +247,7 @@ class ProductForm(forms.ModelForm):
         if not name:
             raise ValidationError('Название продукта обязательно для заполнения')
 
-        name_lower = name.lower()
-
-        for word in FORBIDDEN_WORDS:
-            if word in name_lower:
-                raise ValidationError(
-                    f'Название продукта не может содержать запрещенное слово: "{word}"'
-                )
+        validate_forbidden_words(name, 'Название продукта')
 
         return name
 
@@ -187,13 +255,7 @@ class ProductForm(forms.ModelForm):
         """Валидация описания продукта на запрещенные слова"""
         description = self.cleaned_data.get('description', '')
         if description:  # Описание не обязательное
-            description_lower = description.lower()
-
-            for word in FORBIDDEN_WORDS:
-                if word in description_lower:
-                    raise ValidationError(
-                        f'Описание продукта не может содержать запрещенное слово: "{word}"'
-                    )
+            validate_forbidden_words(description, 'Описание продукта')
 
         return description
 
@@ -215,15 +277,7 @@ class ProductForm(forms.ModelForm):
         if price is None:
             raise ValidationError('Цена обязательна для заполнения')
 
-        if price < 0:
-            raise ValidationError(
-                'Цена продукта не может быть отрицательной'
-            )
-
-        if price > 1000000:
-            raise ValidationError(
-                'Цена продукта не может превышать 1 000 000 рублей'
-            )
+        validate_product_price(price)
 
         return price
 
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.cache import invalidate_blog_list
+from blog.models import BlogPost
+from catalog.cache import invalidate_products
+from catalog.models import Product
+from catalog.text import backfill_in_batches
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет краткие описания товаров, а также начало, количество слов и '
+        'время чтения записей блога для уже существующих строк'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--models',
+            nargs='+',
+            choices=('products', 'posts'),
+            default=['products', 'posts'],
+            help='Какие данные пересчитывать',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000, help='Строк в одной пачке обновления'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должно быть положительным')
+
+        if 'products' in options['models']:
+            updated = backfill_in_batches(
+                Product.objects.only('pk', 'description', 'excerpt'),
+                lambda product: product.refresh_excerpt(),
+                ['excerpt'],
+                options['batch_size'],
+            )
+            # bulk_update не отправляет сигналы — сбрасываем списки каталога сами
+            invalidate_products()
+            self.stdout.write(self.style.SUCCESS(f'✅ Товаров обновлено: {updated}'))
+
+        if 'posts' in options['models']:
+            updated = backfill_in_batches(
+                BlogPost.objects.only('pk', 'content', *BlogPost.TEXT_METADATA_FIELDS),
+                lambda post: post.refresh_text_metadata(),
+                list(BlogPost.TEXT_METADATA_FIELDS),
+                options['batch_size'],
+            )
+            invalidate_blog_list()
+            self.stdout.write(self.style.SUCCESS(f'✅ Записей блога обновлено: {updated}'))
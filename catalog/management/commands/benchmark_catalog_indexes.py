@@ -0,0 +1,167 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from catalog.models import Category, Product
+from catalog.services import CatalogQueryService
+
+
+class BenchmarkRollback(Exception):
+    """Используется для отката транзакции с тестовыми данными"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет каталог тестовыми данными и сравнивает планы EXPLAIN и время '
+        'выполнения основных запросов каталога без индексов и с индексами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Количество товаров')
+        parser.add_argument('--categories', type=int, default=50, help='Количество категорий')
+        parser.add_argument('--owners', type=int, default=500, help='Количество владельцев')
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов каждого запроса')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument(
+            '--no-explain',
+            action='store_true',
+            help='Не выводить планы EXPLAIN, только время выполнения',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        results = {}
+
+        # Все изменения (данные и DDL) выполняются в транзакции и откатываются в конце
+        try:
+            with transaction.atomic():
+                self.seed(options)
+                self.analyze()
+                sample = self.pick_sample()
+
+                self.drop_indexes()
+                self.analyze()
+                results['before'] = self.run_queries(sample, 'без индексов')
+
+                self.create_indexes()
+                self.analyze()
+                results['after'] = self.run_queries(sample, 'с индексами')
+
+                raise BenchmarkRollback
+        except BenchmarkRollback:
+            pass
+
+        self.report(results)
+
+    def seed(self, options):
+        """Создает категории, владельцев и товары пачками через bulk_create"""
+        self.stdout.write(f'📦 Создание {options["products"]} тестовых товаров...')
+        started = time.perf_counter()
+        user_model = get_user_model()
+
+        categories = Category.objects.bulk_create(
+            Category(name=f'bench-category-{i}') for i in range(options['categories'])
+        )
+        owners = user_model.objects.bulk_create(
+            user_model(
+                username=f'bench-owner-{i}', email=f'bench-owner-{i}@example.com', password='!'
+            )
+            for i in range(options['owners'])
+        )
+
+        statuses = ['published'] * 8 + ['pending', 'rejected', 'unpublished']
+        batch = []
+        for i in range(options['products']):
+            batch.append(Product(
+                name=f'Товар {i}',
+                description='Описание тестового товара',
+                price=random.randint(1, 100000),
+                publish=random.choice(statuses),
+                category=random.choice(categories),
+                owner=random.choice(owners),
+            ))
+            if len(batch) >= options['batch_size']:
+                Product.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_create(batch)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'✅ Данные созданы за {elapsed:.1f} с'))
+
+    def pick_sample(self):
+        """Выбирает категорию, владельца и товар, для которых выполняются запросы"""
+        product = Product.objects.filter(
+            publish='published', category__name__startswith='bench-'
+        ).order_by('?').first()
+        return {
+            'category_id': product.category_id,
+            'owner_id': product.owner_id,
+            'product_id': product.pk,
+        }
+
+    def get_queries(self, sample):
+        """Запросы в том же виде, в каком их выполняют представления каталога"""
+        return {
+            'IndexView': CatalogQueryService.get_products()[:6],
+            'CategoryProductsView': CatalogQueryService.get_products(
+                category_id=sample['category_id'], select_related=()
+            )[:12],
+            'user_unpublished_count': Product.objects.filter(
+                owner_id=sample['owner_id']
+            ).exclude(publish='published'),
+            'ProductDetailView (похожие товары)': Product.objects.filter(
+                category_id=sample['category_id'], publish='published'
+            ).exclude(id=sample['product_id']).order_by('-created_at')[:4],
+        }
+
+    def run_queries(self, sample, label):
+        self.stdout.write(f'\n⏱  Замеры ({label})')
+        timings = {}
+        for name, queryset in self.get_queries(sample).items():
+            is_count = name == 'user_unpublished_count'
+
+            if not self.options['no_explain']:
+                self.stdout.write(f'\n--- {name} ---')
+                self.stdout.write(queryset.explain())
+
+            durations = []
+            for _ in range(self.options['repeat']):
+                started = time.perf_counter()
+                if is_count:
+                    queryset.count()
+                else:
+                    list(queryset.all())
+                durations.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(durations)
+        return timings
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for index in Product._meta.indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def create_indexes(self):
+        # SQL строится без входа в контекст schema_editor: в SQLite его нельзя
+        # открыть внутри транзакции при включенной проверке внешних ключей
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for index in Product._meta.indexes:
+                cursor.execute(str(index.create_sql(Product, editor)))
+
+    def analyze(self):
+        """Обновляет статистику планировщика после изменения данных или индексов"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Product._meta.db_table}')
+
+    def report(self, results):
+        self.stdout.write('\n📊 Медианное время выполнения, мс')
+        self.stdout.write(f'{"Запрос":<40}{"без индексов":>15}{"с индексами":>15}{"ускорение":>12}')
+        for name, before in results['before'].items():
+            after = results['after'][name]
+            speedup = before / after if after else float('inf')
+            self.stdout.write(f'{name:<40}{before:>15.2f}{after:>15.2f}{speedup:>11.1f}x')
+        self.stdout.write(self.style.SUCCESS('\n✅ Тестовые данные удалены (транзакция откатана)'))
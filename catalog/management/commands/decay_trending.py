@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from catalog.trending import decay_rankings, get_half_life
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет затухание к рейтингам «В тренде» и «Популярное» и удаляет '
+        'устаревшие записи (для запуска по расписанию)'
+    )
+
+    def handle(self, *args, **options):
+        decay_rankings()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Рейтинги обновлены (период полураспада {get_half_life() / 3600:g} ч)'
+        ))
@@ -0,0 +1,231 @@
+import bz2
+import csv
+import gzip
+import lzma
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Max, Min
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Выгружаемые таблицы: имя в командной строке -> модель
+TABLES = {
+    'category': 'catalog.Category',
+    'product': 'catalog.Product',
+    'blogpost': 'blog.BlogPost',
+}
+
+# Условия отбора опубликованных записей для --published-only
+PUBLISHED_FILTERS = {
+    'product': {'publish': 'published'},
+    'blogpost': {'is_published': True},
+}
+
+COMPRESSIONS = {
+    'gzip': ('.gz', gzip.open),
+    'bz2': ('.bz2', bz2.open),
+    'xz': ('.xz', lzma.open),
+    'none': ('', open),
+}
+
+
+def get_queryset(table, published_only=False):
+    """Выгружаемые записи таблицы (при published_only — только опубликованные)"""
+    model = apps.get_model(TABLES[table])
+    queryset = model._default_manager.all()
+    if published_only:
+        queryset = queryset.filter(**PUBLISHED_FILTERS.get(table, {}))
+    return queryset
+
+
+def get_columns(model):
+    """Все хранимые колонки модели (для внешних ключей — id связанной записи)"""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def peak_rss_mb():
+    """Пиковое потребление памяти текущим процессом, МБ"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # Linux возвращает килобайты, macOS — байты
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return usage.ru_maxrss / divisor
+
+
+def export_part(task):
+    """
+    Выгружает диапазон первичных ключей одной таблицы в файл.
+
+    Строки читаются серверным курсором (iterator) порциями по chunk_size и
+    сразу пишутся в сжатый поток, поэтому память не зависит от объема данных.
+    Функция вызывается как в основном процессе, так и в пуле процессов.
+
+    :return: (таблица, путь, количество строк, секунды, пиковая память МБ)
+    """
+    queryset = get_queryset(task['table'], task['published_only'])
+    columns = get_columns(queryset.model)
+    queryset = queryset.order_by('pk').values_list(*columns)
+    if task['pk_range'] is not None:
+        queryset = queryset.filter(pk__gte=task['pk_range'][0], pk__lte=task['pk_range'][1])
+
+    _, opener = COMPRESSIONS[task['compression']]
+    started = time.perf_counter()
+    rows = 0
+
+    with opener(task['path'], 'wt', encoding='utf-8', newline='') as file:
+        if task['format'] == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for row in queryset.iterator(chunk_size=task['chunk_size']):
+                writer.writerow(row)
+                rows += 1
+        else:
+            encoder = DjangoJSONEncoder(ensure_ascii=False)
+            for row in queryset.iterator(chunk_size=task['chunk_size']):
+                file.write(encoder.encode(dict(zip(columns, row))))
+                file.write('\n')
+                rows += 1
+
+    return task['table'], task['path'], rows, time.perf_counter() - started, peak_rss_mb()
+
+
+def _init_worker():
+    # При запуске через spawn Django в дочернем процессе еще не настроен
+    if not apps.ready:
+        import django
+        django.setup()
+    # Соединения родительского процесса нельзя использовать после fork
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает товары, категории и записи блога в сжатые CSV или NDJSON '
+        'порциями по первичному ключу с постоянным потреблением памяти'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tables',
+            nargs='+',
+            choices=list(TABLES),
+            default=list(TABLES),
+            help='Какие таблицы выгружать',
+        )
+        parser.add_argument('--output-dir', default='exports', help='Каталог для файлов выгрузки')
+        parser.add_argument(
+            '--format', choices=('csv', 'ndjson'), default='ndjson', help='Формат файлов'
+        )
+        parser.add_argument(
+            '--compression', choices=list(COMPRESSIONS), default='gzip', help='Сжатие'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000, help='Строк за одно чтение курсора'
+        )
+        parser.add_argument(
+            '--published-only',
+            action='store_true',
+            help='Выгружать только опубликованные товары и записи блога',
+        )
+        parser.add_argument(
+            '--parts',
+            type=int,
+            default=1,
+            help='На сколько диапазонов первичного ключа делить каждую таблицу',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество процессов (больше 1 — таблицы и диапазоны выгружаются параллельно)',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['parts'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size, --parts и --workers должны быть положительными')
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        tasks = self.build_tasks(options)
+
+        self.stdout.write(f'📤 Выгрузка {len(tasks)} файлов в {options["output_dir"]}...')
+        started = time.perf_counter()
+
+        if options['workers'] > 1 and len(tasks) > 1:
+            # Дочерние процессы открывают собственные соединения с базой
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'], initializer=_init_worker
+            )
+            with executor:
+                results = list(executor.map(export_part, tasks))
+        else:
+            results = [export_part(task) for task in tasks]
+
+        self.report(results, time.perf_counter() - started)
+
+    def build_tasks(self, options):
+        extension = '.csv' if options['format'] == 'csv' else '.ndjson'
+        extension += COMPRESSIONS[options['compression']][0]
+        tasks = []
+
+        for table in options['tables']:
+            queryset = get_queryset(table, options['published_only'])
+            ranges = self.split_pk_range(queryset, options['parts'])
+            for number, pk_range in enumerate(ranges, start=1):
+                name = table if len(ranges) == 1 else f'{table}.part{number:03d}'
+                tasks.append({
+                    'table': table,
+                    'pk_range': pk_range,
+                    'published_only': options['published_only'],
+                    'path': os.path.join(options['output_dir'], name + extension),
+                    'format': options['format'],
+                    'compression': options['compression'],
+                    'chunk_size': options['chunk_size'],
+                })
+        return tasks
+
+    def split_pk_range(self, queryset, parts):
+        """Делит диапазон первичных ключей выборки на равные по ширине части"""
+        if parts == 1:
+            return [None]
+        bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return [None]
+
+        low, high = bounds['low'], bounds['high']
+        step = max((high - low + 1) // parts, 1)
+        ranges = []
+        start = low
+        while start <= high:
+            end = high if len(ranges) == parts - 1 else min(start + step - 1, high)
+            ranges.append((start, end))
+            start = end + 1
+        return ranges
+
+    def report(self, results, elapsed):
+        total_rows = 0
+        for table, path, rows, seconds, _ in results:
+            total_rows += rows
+            rate = rows / seconds if seconds else 0
+            self.stdout.write(f'   {table:<10} {rows:>10} строк  {rate:>10.0f} строк/с  {path}')
+
+        rate = total_rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Выгружено строк: {total_rows} за {elapsed:.1f} с ({rate:.0f} строк/с)'
+        ))
+
+        # В параллельном режиме каждый файл выгружает свой процесс — берем максимум
+        peaks = [peak for *_, peak in results if peak is not None]
+        if peaks:
+            self.stdout.write(f'📈 Пиковая память процесса: {max(peaks):.1f} МБ')
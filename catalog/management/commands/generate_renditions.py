@@ -0,0 +1,108 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.renditions import (
+    RENDITION_FIELDS,
+    RENDITION_SCALES,
+    build_jobs,
+    fallback_extension,
+    render_renditions,
+    rendition_name,
+    save_renditions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает уменьшенные копии и WebP-варианты для уже загруженных изображений '
+        'товаров, записей блога и аватаров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--models',
+            nargs='+',
+            choices=list(RENDITION_FIELDS),
+            default=list(RENDITION_FIELDS),
+            help='Модели, изображения которых обрабатываются',
+        )
+        parser.add_argument('--workers', type=int, default=4, help='Количество процессов Pillow')
+        parser.add_argument(
+            '--force', action='store_true', help='Пересоздать уже существующие копии'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должно быть положительным')
+
+        started = time.perf_counter()
+        self.generated = self.skipped = self.failed = 0
+
+        # Одновременно в обработке не больше нескольких изображений на процесс,
+        # чтобы не держать в памяти все файлы сразу
+        self.max_in_flight = options['workers'] * 4
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for label in options['models']:
+                self.process_model(executor, label, options['force'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Обработано изображений: {self.generated}, пропущено: {self.skipped}, '
+            f'ошибок: {self.failed} ({elapsed:.1f} с)'
+        ))
+
+    def process_model(self, executor, label, force):
+        model = apps.get_model(label)
+        field_name, specs = RENDITION_FIELDS[label]
+        jobs = build_jobs(specs)
+        self.stdout.write(f'🖼  {model._meta.verbose_name_plural}...')
+
+        in_flight = {}
+        manager = model._default_manager
+        queryset = manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        for instance in queryset.only('pk', field_name).iterator(chunk_size=500):
+            field_file = getattr(instance, field_name)
+            if not force and self.has_renditions(field_file, specs):
+                self.skipped += 1
+                continue
+
+            try:
+                with field_file.storage.open(field_file.name, 'rb') as file:
+                    data = file.read()
+            except OSError as e:
+                self.report_failure(field_file.name, e)
+                continue
+
+            future = executor.submit(
+                render_renditions, data, jobs, fallback_extension(field_file.name)
+            )
+            in_flight[future] = field_file
+            if len(in_flight) >= self.max_in_flight:
+                self.collect(in_flight, return_when=FIRST_COMPLETED)
+
+        self.collect(in_flight)
+
+    def collect(self, in_flight, return_when='ALL_COMPLETED'):
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            field_file = in_flight.pop(future)
+            try:
+                save_renditions(field_file.storage, field_file.name, future.result())
+                self.generated += 1
+            except Exception as e:
+                self.report_failure(field_file.name, e)
+
+    def has_renditions(self, field_file, specs):
+        # Копии 2x создаются не для всех изображений, поэтому проверяем масштаб 1x
+        scale = RENDITION_SCALES[0]
+        return all(
+            field_file.storage.exists(rendition_name(field_file.name, spec, scale, 'webp'))
+            for spec in specs
+        )
+
+    def report_failure(self, name, error):
+        self.failed += 1
+        self.stdout.write(self.style.ERROR(f'❌ {name}: {error}'))
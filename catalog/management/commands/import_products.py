@@ -0,0 +1,431 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from catalog.cache import invalidate_products, refresh_related_product_ids
+from catalog.forms import validate_forbidden_words, validate_product_price
+from catalog.models import Category, ImportCheckpoint, Product
+from catalog.services import UnpublishedCounterService
+
+FORMATS = ('csv', 'json', 'ndjson')
+
+# Размер порции, которой читается JSON-файл
+JSON_READ_SIZE = 64 * 1024
+_JSON_SEPARATORS_RE = re.compile(r'[\s,]*')
+
+# Колонки, которые заполняются при загрузке через COPY
+COPY_COLUMNS = (
+    'name', 'description', 'excerpt', 'image', 'price', 'publish',
+    'category_id', 'owner_id', 'created_at', 'updated_at',
+)
+
+
+def copy_csv_line(values):
+    """
+    Строка CSV для COPY FROM STDIN WITH (FORMAT csv).
+
+    В этом формате NULL — пустое поле без кавычек, а пустая строка — пустое
+    поле в кавычках. csv.writer записывает None как пустую строку, поэтому
+    строка собирается вручную: None — без кавычек, числа — как есть,
+    остальные значения — в кавычках.
+    """
+    fields = []
+    for value in values:
+        if value is None:
+            fields.append('')
+        elif isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            fields.append(str(value))
+        else:
+            fields.append('"' + str(value).replace('"', '""') + '"')
+    return ','.join(fields) + '\n'
+
+
+def read_csv(path):
+    """Построчное чтение CSV с заголовком"""
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        yield from csv.DictReader(file)
+
+
+def read_ndjson(path):
+    """Построчное чтение NDJSON (один объект на строку)"""
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_json_array(path):
+    """
+    Потоковое чтение JSON-массива объектов.
+
+    Файл читается порциями, объекты раскодируются по одному, поэтому
+    в памяти находится только текущая порция, а не весь файл.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as file:
+        buffer = file.read(JSON_READ_SIZE).lstrip()
+        if not buffer.startswith('['):
+            raise CommandError('JSON-файл должен содержать массив объектов')
+        position = 1
+
+        while True:
+            position = _JSON_SEPARATORS_RE.match(buffer, position).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Объект не поместился в буфер целиком — дочитываем файл
+                chunk = file.read(JSON_READ_SIZE)
+                if not chunk:
+                    raise CommandError('Некорректный JSON: файл поврежден или оборван')
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield obj
+
+
+def unwrap_fixture_rows(rows):
+    """Поддержка фикстур Django: берутся только поля записей catalog.product"""
+    for row in rows:
+        if isinstance(row, dict) and 'model' in row and 'fields' in row:
+            if row['model'] == 'catalog.product':
+                yield row['fields']
+        else:
+            yield row
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт товаров из CSV, JSON или NDJSON с проверкой по правилам '
+        'ProductForm, пакетной записью (bulk_create или COPY на PostgreSQL) и '
+        'возобновлением с контрольной точки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с товарами')
+        parser.add_argument(
+            '--format', choices=FORMATS, help='Формат файла (по умолчанию — по расширению)'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000, help='Размер пачки записи')
+        parser.add_argument(
+            '--method',
+            choices=('auto', 'bulk', 'copy'),
+            default='auto',
+            help=(
+                'Способ записи: bulk_create или COPY (только PostgreSQL); '
+                'auto — COPY, если доступен'
+            ),
+        )
+        parser.add_argument('--owner', help='Владелец по умолчанию (id, username или email)')
+        parser.add_argument(
+            '--publish',
+            choices=[choice for choice, _ in Product.PUBLISH_CHOICES],
+            default='pending',
+            help='Статус публикации для строк без поля publish',
+        )
+        parser.add_argument(
+            '--create-categories',
+            action='store_true',
+            help='Создавать отсутствующие категории по названию',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Ключ контрольной точки в базе (по умолчанию — абсолютный путь к файлу)',
+        )
+        parser.add_argument(
+            '--resume', action='store_true', help='Продолжить с контрольной точки'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Только проверить строки, без записи'
+        )
+        parser.add_argument(
+            '--show-errors', type=int, default=20, help='Сколько ошибок строк выводить'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл не найден: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+
+        self.method = self.get_method(options['method'])
+        self.checkpoint_key = options['checkpoint'] or os.path.abspath(path)
+        self.fields = {
+            name: Product._meta.get_field(name)
+            for name in ('name', 'description', 'price', 'publish')
+        }
+        self.image_max_length = Product._meta.get_field('image').max_length
+
+        self.load_lookups()
+        self.default_owner_id = None
+        if options['owner']:
+            self.default_owner_id = self.owners.get(str(options['owner']).strip().casefold())
+            if self.default_owner_id is None:
+                raise CommandError(f'Пользователь не найден: {options["owner"]}')
+
+        skip = self.read_checkpoint(path) if options['resume'] else 0
+        if skip:
+            self.stdout.write(f'⏩ Продолжение с контрольной точки: пропуск {skip} строк')
+
+        self.stdout.write(f'📦 Импорт товаров из {path} (запись: {self.method})...')
+        self.run_import(path, skip)
+
+    def get_method(self, method):
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('COPY поддерживается только на PostgreSQL')
+        if method == 'auto':
+            return 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        return method
+
+    def load_lookups(self):
+        """Таблицы соответствия категорий и владельцев загружаются в память один раз"""
+        self.categories = {}
+        for category_id, name in Category.objects.values_list('id', 'name').iterator():
+            self.categories[str(category_id)] = category_id
+            self.categories.setdefault(name.strip().casefold(), category_id)
+
+        self.owners = {}
+        users = get_user_model().objects.values_list('id', 'username', 'email').iterator()
+        for user_id, username, email in users:
+            self.owners[str(user_id)] = user_id
+            self.owners.setdefault(username.casefold(), user_id)
+            if email:
+                self.owners.setdefault(email.casefold(), user_id)
+
+    def read_rows(self, path):
+        file_format = self.options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format == 'csv':
+            return read_csv(path)
+        if file_format in ('ndjson', 'jsonl'):
+            return unwrap_fixture_rows(read_ndjson(path))
+        if file_format == 'json':
+            return unwrap_fixture_rows(read_json_array(path))
+        raise CommandError('Не удалось определить формат файла, укажите --format')
+
+    def run_import(self, path, skip):
+        started = time.perf_counter()
+        self.touched_categories = set()
+        processed = imported = invalid = 0
+        batch = []
+
+        try:
+            for processed, row in enumerate(self.read_rows(path), start=1):
+                if processed <= skip:
+                    continue
+                try:
+                    batch.append(self.build_product(row))
+                except ValidationError as e:
+                    invalid += 1
+                    if invalid <= self.options['show_errors']:
+                        self.stdout.write(self.style.WARNING(
+                            f'⚠️  Строка {processed}: {"; ".join(e.messages)}'
+                        ))
+
+                if len(batch) >= self.options['batch_size']:
+                    imported += self.write_batch(batch, path, processed)
+                    batch = []
+                    self.report_progress(started, processed - skip, imported)
+
+            if batch:
+                imported += self.write_batch(batch, path, processed)
+        except (json.JSONDecodeError, csv.Error, UnicodeDecodeError) as e:
+            raise CommandError(f'Ошибка чтения строки {processed + 1}: {e}')
+        finally:
+            self.invalidate_caches()
+
+        if not self.options['dry_run']:
+            ImportCheckpoint.objects.filter(key=self.checkpoint_key).delete()
+
+        elapsed = time.perf_counter() - started
+        read = max(processed - skip, 0)
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Прочитано строк: {read}, импортировано: {imported}, с ошибками: {invalid}'
+        ))
+        self.stdout.write(f'⏱  {elapsed:.1f} с, {rate:.0f} строк/с')
+
+    def build_product(self, row):
+        """
+        Проверяет строку по правилам ProductForm и возвращает несохраненный товар.
+
+        :raises ValidationError: со списком ошибок строки
+        """
+        if not isinstance(row, dict):
+            raise ValidationError('Строка должна быть объектом с полями товара')
+
+        errors = []
+        values = {}
+
+        for name, field in self.fields.items():
+            raw = row.get(name)
+            if name == 'publish' and not raw:
+                raw = self.options['publish']
+            if isinstance(raw, str):
+                raw = raw.strip()
+                if name == 'price':
+                    raw = raw.replace(',', '.')
+            if raw == '' and field.null:
+                raw = None
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as e:
+                errors.extend(f'{field.verbose_name}: {message}' for message in e.messages)
+
+        subjects = (('name', 'Название продукта'), ('description', 'Описание продукта'))
+        for name, subject in subjects:
+            if values.get(name):
+                try:
+                    validate_forbidden_words(values[name], subject)
+                except ValidationError as e:
+                    errors.extend(e.messages)
+        if values.get('price') is not None:
+            try:
+                validate_product_price(values['price'])
+            except ValidationError as e:
+                errors.extend(e.messages)
+
+        image = str(row.get('image') or '').strip()
+        if len(image) > self.image_max_length:
+            errors.append(f'Путь к изображению длиннее {self.image_max_length} символов')
+
+        category_id = self.resolve_category(row.get('category'))
+        if category_id is None:
+            errors.append(f'Категория не найдена: {row.get("category")}')
+
+        owner_value = row.get('owner')
+        if owner_value:
+            owner_id = self.owners.get(str(owner_value).strip().casefold())
+        else:
+            owner_id = self.default_owner_id
+        if owner_id is None and owner_value:
+            errors.append(f'Владелец не найден: {owner_value}')
+        elif owner_id is None:
+            errors.append('Не указан владелец (--owner)')
+
+        if errors:
+            raise ValidationError(errors)
+
+        product = Product(image=image, category_id=category_id, owner_id=owner_id, **values)
+        # bulk_create и COPY не вызывают save(), поэтому краткое описание заполняем здесь
+        product.refresh_excerpt()
+        return product
+
+    def resolve_category(self, value):
+        if value is None or str(value).strip() == '':
+            return None
+        key = str(value).strip()
+        category_id = self.categories.get(key) or self.categories.get(key.casefold())
+        if category_id is None and self.options['create_categories'] and not key.isdigit():
+            if self.options['dry_run']:
+                return 0
+            category_id = Category.objects.create(name=key).pk
+            self.categories[str(category_id)] = category_id
+            self.categories[key.casefold()] = category_id
+        return category_id
+
+    def write_batch(self, products, path, processed):
+        """
+        Записывает пачку и контрольную точку в одной транзакции: после сбоя
+        пачка либо записана вместе с точкой, либо не записана вовсе.
+        """
+        if self.options['dry_run']:
+            return len(products)
+
+        with transaction.atomic():
+            if self.method == 'copy':
+                self.copy_products(products)
+            else:
+                Product.objects.bulk_create(products, batch_size=len(products))
+
+            # bulk_create и COPY не отправляют сигналы — счетчики обновляем сами
+            unpublished = Counter(
+                product.owner_id for product in products if product.publish != 'published'
+            )
+            for owner_id, count in unpublished.items():
+                UnpublishedCounterService.adjust(owner_id, count)
+
+            self.write_checkpoint(path, processed)
+
+        self.touched_categories.update(product.category_id for product in products)
+        return len(products)
+
+    def copy_products(self, products):
+        """Загрузка пачки через COPY FROM STDIN (psycopg 3 или psycopg2)"""
+        now = timezone.now()
+        rows = [
+            [
+                product.name,
+                product.description,
+                product.excerpt,
+                product.image.name or '',
+                product.price,
+                product.publish,
+                product.category_id,
+                product.owner_id,
+                now,
+                now,
+            ]
+            for product in products
+        ]
+        table = connection.ops.quote_name(Product._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(column) for column in COPY_COLUMNS)
+
+        with connection.cursor() as cursor:
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy'):
+                with raw_cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                # NULL передается пустым полем без кавычек, как и в bulk_create
+                buffer = io.StringIO(''.join(copy_csv_line(row) for row in rows))
+                sql = f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)'
+                raw_cursor.copy_expert(sql, buffer)
+
+    def invalidate_caches(self):
+        """Сбрасывает кэш списков и похожих товаров затронутых категорий"""
+        if not self.touched_categories:
+            return
+        invalidate_products(category_ids=self.touched_categories)
+        for category_id in self.touched_categories:
+            refresh_related_product_ids(category_id)
+
+    def read_checkpoint(self, path):
+        checkpoint = ImportCheckpoint.objects.filter(key=self.checkpoint_key).first()
+        if checkpoint is None:
+            return 0
+        if checkpoint.source != os.path.abspath(path) or checkpoint.size != os.path.getsize(path):
+            raise CommandError('Контрольная точка относится к другому файлу или файл изменился')
+        return checkpoint.rows
+
+    def write_checkpoint(self, path, processed):
+        ImportCheckpoint.objects.update_or_create(
+            key=self.checkpoint_key,
+            defaults={
+                'source': os.path.abspath(path),
+                'size': os.path.getsize(path),
+                'rows': processed,
+            },
+        )
+
+    def report_progress(self, started, read, imported):
+        if self.options['verbosity'] < 2:
+            return
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(f'   … прочитано {read}, импортировано {imported} ({rate:.0f} строк/с)')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from catalog.services import UnpublishedCounterService
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики неопубликованных товаров пользователей'
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Пересчет счетчиков неопубликованных товаров...')
+        updated = UnpublishedCounterService.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Обновлено пользователей: {updated}')
+        )
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0002_alter_product_options_product_owner_product_publish"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("publish", "published")),
+                fields=["-created_at", "-id"],
+                name="product_published_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "publish", "-created_at"],
+                name="product_cat_pub_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("publish", "published"), _negated=True),
+                fields=["owner", "publish"],
+                name="product_owner_unpub_idx",
+            ),
+        ),
+    ]
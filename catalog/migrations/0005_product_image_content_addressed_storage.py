@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:02
+
+import catalog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0004_product_search_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                storage=catalog.storage.product_image_storage,
+                upload_to="products/",
+                verbose_name="Изображение",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0005_product_image_content_addressed_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="excerpt",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=255,
+                verbose_name="Краткое описание",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:10
+
+from django.db import migrations
+
+from catalog.text import backfill_in_batches, make_excerpt
+
+# Значение Product.EXCERPT_WORDS на момент миграции
+EXCERPT_WORDS = 15
+
+
+def fill_excerpts(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    max_length = Product._meta.get_field("excerpt").max_length
+
+    def refresh(product):
+        product.excerpt = make_excerpt(product.description, EXCERPT_WORDS, max_length)
+
+    backfill_in_batches(
+        Product.objects.only("pk", "description", "excerpt"), refresh, ["excerpt"]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0006_product_excerpt"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0007_backfill_product_excerpt"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        max_length=500, unique=True, verbose_name="Ключ импорта"
+                    ),
+                ),
+                ("source", models.CharField(max_length=500, verbose_name="Файл")),
+                ("size", models.BigIntegerField(verbose_name="Размер файла")),
+                (
+                    "rows",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Обработано строк"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+            ],
+            options={
+                "verbose_name": "Контрольная точка импорта",
+                "verbose_name_plural": "Контрольные точки импорта",
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.core.cache import cache
+
+from .cache import LISTING_CACHE_TIMEOUT
+
+
+class RequestObjectCacheMixin:
+    """
+    Миксин для представлений с одним объектом (DetailView, UpdateView, DeleteView).
+
+    Кэширует результат get_object() на время запроса: проверки прав в
+    test_func, обработчики GET/POST и удаление используют один и тот же
+    объект, и строка загружается из базы один раз.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+
+        if not hasattr(self, '_request_object'):
+            self._request_object = super().get_object()
+        return self._request_object
+
+
+class CachedPageMixin:
+    """
+    Миксин для ListView: страница списка (товары страницы и общее количество)
+    берется из кэша, поэтому при попадании не выполняются ни COUNT, ни выборка.
+
+    В кэш попадает только одна страница, а не весь список. Ключ страницы
+    возвращает get_page_cache_key(page_number); None отключает кэширование
+    (например, в курсорном режиме пагинации).
+    """
+
+    page_cache_timeout = LISTING_CACHE_TIMEOUT
+
+    def get_page_cache_key(self, page_number):
+        raise NotImplementedError
+
+    def paginate_queryset(self, queryset, page_size):
+        page_number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page_number = int(page_number)
+        except (TypeError, ValueError):
+            # 'last' и некорректные значения обрабатываются без кэша
+            return super().paginate_queryset(queryset, page_size)
+
+        cache_key = self.get_page_cache_key(page_number)
+        if cache_key is None:
+            return super().paginate_queryset(queryset, page_size)
+
+        cached = cache.get(cache_key)
+        if cached is None:
+            paginator, page, object_list, is_paginated = super().paginate_queryset(
+                queryset, page_size
+            )
+            cache.set(cache_key, (paginator.count, list(object_list)), self.page_cache_timeout)
+            return paginator, page, object_list, is_paginated
+
+        count, objects = cached
+        paginator = self.get_paginator(
+            queryset, page_size, orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        paginator.count = count
+        page = paginator.page(page_number)
+        page.object_list = objects
+        return paginator, page, objects, page.has_other_pages()
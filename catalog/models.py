@@ -1,5 +1,8 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+
+from catalog.storage import product_image_storage
+from catalog.text import make_excerpt
 
 import users.admin
 
@@ -45,7 +48,15 @@ class Product(models.Model):
             - 'unpublished': Снят с публикации
         category (ForeignKey): Связь с категорией товара.
         owner (ForeignKey): Владелец продукта - пользователь, создавший товар.
-            Автоматически заполняется при создании товара."""
+            Автоматически заполняется при создании товара.
+        excerpt (str): Начало описания для карточек списков. Заполняется
+            автоматически при сохранении."""
+
+    # Сколько слов описания выводится в карточке товара
+    EXCERPT_WORDS = 15
+
+    # Поля, от которых зависят кэш списков и счетчик неопубликованных товаров владельца
+    STATE_FIELDS = ('category_id', 'owner_id', 'publish')
 
     PUBLISH_CHOICES = [
         ('pending', 'На модерации'),
@@ -56,7 +67,15 @@ class Product(models.Model):
     
     name = models.CharField(max_length=100, verbose_name="Наименование")
     description = models.TextField(verbose_name="Описание", blank=True, null=True)
-    image = models.ImageField(upload_to='products/', blank=True, verbose_name="Изображение")
+    excerpt = models.CharField(
+        max_length=255, blank=True, default='', editable=False, verbose_name="Краткое описание"
+    )
+    image = models.ImageField(
+        upload_to='products/',
+        storage=product_image_storage,
+        blank=True,
+        verbose_name="Изображение",
+    )
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
@@ -78,12 +97,98 @@ class Product(models.Model):
         Returns: str: Название категории."""
         return self.name
 
+    def refresh_excerpt(self):
+        """ Пересчитывает краткое описание из полного."""
+        self.excerpt = make_excerpt(
+            self.description, self.EXCERPT_WORDS, self._meta.get_field('excerpt').max_length
+        )
+
+    @classmethod
+    def get_locked_state(cls, product_id, using=None):
+        """ Текущие категория, владелец и статус товара (None, если строки нет).
+        Внутри транзакции строка блокируется до ее завершения (SELECT ... FOR UPDATE)."""
+        queryset = cls.objects.using(using).filter(pk=product_id)
+        if transaction.get_connection(using).in_atomic_block:
+            queryset = queryset.select_for_update()
+        return queryset.values(*cls.STATE_FIELDS).first()
+
+    def save(self, *args, **kwargs):
+        """ Сохраняет товар в транзакции вместе с обработчиками сигналов
+        (счетчик неопубликованных товаров владельца обновляется атомарно)."""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'description' in update_fields:
+            self.refresh_excerpt()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """ Удаляет товар в транзакции вместе с обработчиками сигналов.
+        Категория, владелец и статус перечитываются с блокировкой строки,
+        чтобы обработчики post_delete работали с актуальными значениями;
+        если товар уже удален параллельным запросом, ничего не происходит."""
+        using = kwargs.get('using')
+        with transaction.atomic(using=using):
+            current = Product.get_locked_state(self.pk, using)
+            if current is None:
+                return 0, {}
+            for field, value in current.items():
+                setattr(self, field, value)
+            return super().delete(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Продукт'
         verbose_name_plural = 'Продукты'
         permissions = [
             ('can_unpublish_product', 'Can unpublish product')
         ]
+        indexes = [
+            # Главная страница: опубликованные товары, новые сверху
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='product_published_date_idx',
+                condition=models.Q(publish='published'),
+            ),
+            # Страница категории и похожие товары: категория + статус, новые сверху
+            models.Index(
+                fields=['category', 'publish', '-created_at'],
+                name='product_cat_pub_date_idx',
+            ),
+            # Счетчик неопубликованных товаров пользователя
+            models.Index(
+                fields=['owner', 'publish'],
+                name='product_owner_unpub_idx',
+                condition=~models.Q(publish='published'),
+            ),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """ Контрольная точка команды import_products.
+    Обновляется в той же транзакции, что и записанная пачка товаров, поэтому
+    после сбоя импорт продолжается ровно с первой незафиксированной строки.
+
+    Attributes:
+        key (str): Ключ импорта (по умолчанию — абсолютный путь к файлу).
+        source (str): Абсолютный путь к файлу импорта.
+        size (int): Размер файла, по которому проверяется, что он не изменился.
+        rows (int): Сколько строк файла уже обработано и зафиксировано.
+        updated_at (DateTime): Время последней зафиксированной пачки."""
+
+    key = models.CharField(max_length=500, unique=True, verbose_name="Ключ импорта")
+    source = models.CharField(max_length=500, verbose_name="Файл")
+    size = models.BigIntegerField(verbose_name="Размер файла")
+    rows = models.PositiveBigIntegerField(default=0, verbose_name="Обработано строк")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    def __str__(self):
+        return f"{self.source}: {self.rows}"
+
+    class Meta:
+        verbose_name = 'Контрольная точка импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
+
 
 class ContactInfo(models.Model):
     """Модель для хранения контактной информации компании.
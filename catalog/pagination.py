@@ -0,0 +1,207 @@
+"""
+Курсорная (keyset) пагинация списков товаров.
+
+В отличие от стандартного Paginator не выполняет COUNT(*) и OFFSET: каждая
+страница выбирается условием по ключу (created_at, id) относительно
+последней записи предыдущей страницы, поэтому глубокие страницы открываются
+так же быстро, как первая. Курсоры непрозрачны для клиента и подходят как для
+HTML-страниц, так и для JSON-эндпоинтов.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    """Курсор поврежден или сформирован не этим пагинатором"""
+
+
+def encode_cursor(direction, created_at, pk):
+    """Кодирует позицию в списке в непрозрачный URL-безопасный токен"""
+    payload = json.dumps(
+        {'d': direction, 'c': created_at.isoformat(), 'i': pk}, separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Раскодирует токен курсора.
+
+    :return: кортеж (direction, created_at, pk)
+    :raises InvalidCursor: если токен некорректен
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        created_at = parse_datetime(payload['c'])
+        pk = int(payload['i'])
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursor('Некорректный курсор пагинации')
+
+    if direction not in (NEXT, PREVIOUS) or created_at is None:
+        raise InvalidCursor('Некорректный курсор пагинации')
+
+    return direction, created_at, pk
+
+
+def approximate_count(queryset):
+    """
+    Приблизительное количество записей в выборке.
+
+    На PostgreSQL берется оценка планировщика из EXPLAIN (без сканирования
+    таблицы), на остальных СУБД выполняется обычный COUNT(*).
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPage:
+    """Страница курсорной пагинации"""
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if not self.has_next_page or not self.object_list:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(NEXT, last.created_at, last.pk)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous_page or not self.object_list:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(PREVIOUS, first.created_at, first.pk)
+
+    @property
+    def approximate_total(self):
+        return self.paginator.approximate_total
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по ключу (created_at, id) в порядке убывания.
+
+    :param queryset: выборка товаров (сортировка будет заменена на -created_at, -id)
+    :param per_page: размер страницы
+    :param with_total: вычислять ли приблизительное общее количество записей
+    """
+
+    def __init__(self, queryset, per_page, with_total=False):
+        self.queryset = queryset.order_by('-created_at', '-id')
+        self.per_page = int(per_page)
+        self.with_total = with_total
+        self._approximate_total = None
+
+    @property
+    def approximate_total(self):
+        if not self.with_total:
+            return None
+        if self._approximate_total is None:
+            self._approximate_total = approximate_count(self.queryset)
+        return self._approximate_total
+
+    def page(self, cursor=None):
+        """
+        Возвращает страницу, следующую за курсором (или первую страницу).
+
+        :raises InvalidCursor: если курсор некорректен
+        """
+        if not cursor:
+            rows = list(self.queryset[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        direction, created_at, pk = decode_cursor(cursor)
+
+        if direction == NEXT:
+            queryset = self.queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+            rows = list(queryset[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+
+        # Идем назад: выбираем в обратном порядке и разворачиваем результат
+        queryset = self.queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        ).order_by('created_at', 'id')
+        rows = list(queryset[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return KeysetPage(rows, self, True, has_previous)
+
+    def get_page(self, cursor=None):
+        """Как page(), но при некорректном курсоре возвращает первую страницу"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class KeysetPaginationMixin:
+    """
+    Миксин для ListView, добавляющий курсорный режим пагинации.
+
+    Режим задается атрибутом pagination_mode ('offset' или 'keyset'),
+    по умолчанию берется из настройки CATALOG_PAGINATION_MODE.
+    """
+
+    pagination_mode = None
+    cursor_query_param = 'cursor'
+    keyset_with_total = False
+
+    def get_pagination_mode(self):
+        return self.pagination_mode or getattr(settings, 'CATALOG_PAGINATION_MODE', 'offset')
+
+    def uses_keyset_pagination(self):
+        return self.get_pagination_mode() == 'keyset'
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, with_total=self.keyset_with_total)
+        page = paginator.get_page(self.request.GET.get(self.cursor_query_param))
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,292 @@
+"""
+Предварительно сгенерированные уменьшенные копии (renditions) изображений.
+
+Для каждого загруженного изображения товара, превью записи блога и аватара
+создаются копии фиксированных размеров в масштабах 1x и 2x — в исходном
+формате (JPEG или PNG) и в WebP. Копии сохраняются рядом с оригиналом:
+products/photo.jpg -> products/photo.card-1x.webp, products/photo.card-2x.jpg.
+
+Копии нового изображения создаются Pillow после фиксации транзакции в том
+же запросе. С RENDITIONS_ASYNC=True работа передается в пул процессов
+внутри веб-процесса и загрузка не ждет генерации, но задачи из очереди пула
+теряются при перезапуске процесса. Пока копий нет, шаблонные теги отдают
+оригинал; недостающие копии (в том числе потерянные) создает команда
+generate_renditions.
+"""
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+
+logger = logging.getLogger(__name__)
+
+RenditionSpec = namedtuple('RenditionSpec', ['width', 'height', 'crop'])
+
+# Размеры копий в масштабе 1x. crop=True — обрезка до точного размера,
+# иначе изображение вписывается в рамку с сохранением пропорций
+RENDITION_SPECS = {
+    'card': RenditionSpec(400, 300, crop=True),
+    'thumb': RenditionSpec(240, 180, crop=True),
+    'detail': RenditionSpec(1200, 900, crop=False),
+    'avatar': RenditionSpec(150, 150, crop=True),
+    'avatar_thumb': RenditionSpec(32, 32, crop=True),
+}
+RENDITION_SCALES = (1, 2)
+
+# Поля моделей, для которых генерируются копии, и нужные им размеры
+RENDITION_FIELDS = {
+    'catalog.Product': ('image', ('card', 'thumb', 'detail')),
+    'blog.BlogPost': ('preview', ('card', 'detail')),
+    'users.CustomUser': ('avatar', ('avatar', 'avatar_thumb')),
+}
+
+WEBP = 'webp'
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+_executor = None
+# Результаты проверки наличия копий, чтобы не обращаться к хранилищу на каждой
+# карточке: имя копии -> True (копия есть) или момент по time.monotonic(), до
+# которого отсутствующая копия повторно не проверяется. Копии, созданные в этом
+# процессе, отмечаются сразу, созданные командой generate_renditions — становятся
+# видны по истечении срока. Размер ограничен, давно не нужные имена вытесняются
+_rendition_lookups = OrderedDict()
+_lookups_lock = threading.Lock()
+
+
+def get_miss_ttl():
+    """Сколько секунд помнить, что копии нет"""
+    return getattr(settings, 'RENDITION_MISS_TTL', 60)
+
+
+def get_lookup_cache_size():
+    """Сколько результатов проверки наличия копий хранится в памяти процесса"""
+    return getattr(settings, 'RENDITION_LOOKUP_CACHE_SIZE', 10000)
+
+
+def remember_lookup(name, value):
+    with _lookups_lock:
+        _rendition_lookups[name] = value
+        _rendition_lookups.move_to_end(name)
+        while len(_rendition_lookups) > get_lookup_cache_size():
+            _rendition_lookups.popitem(last=False)
+
+
+def recall_lookup(name):
+    with _lookups_lock:
+        value = _rendition_lookups.get(name)
+        if value is not None:
+            _rendition_lookups.move_to_end(name)
+        return value
+
+
+def fallback_extension(name):
+    """Формат копии для браузеров без WebP: PNG остается PNG, остальное — JPEG"""
+    return 'png' if os.path.splitext(name)[1].lower() == '.png' else 'jpg'
+
+
+def rendition_name(name, spec, scale, extension):
+    """Имя файла копии рядом с оригиналом"""
+    root = os.path.splitext(name)[0]
+    return f'{root}.{spec}-{scale}x.{extension}'
+
+
+def render_renditions(data, jobs, extension):
+    """
+    Создает копии одного изображения (выполняется в пуле процессов).
+
+    Изображение раскодируется один раз. Копии в масштабе 2x, которые были бы
+    больше оригинала, пропускаются — увеличение не дает выигрыша в качестве.
+
+    :param data: байты оригинала
+    :param jobs: список (имя размера, ширина, высота, crop, масштаб)
+    :param extension: формат копии для браузеров без WebP ('jpg' или 'png')
+    :return: список (имя размера, масштаб, расширение, байты)
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        source.load()
+
+    if extension == 'png':
+        source = source.convert('RGBA')
+    else:
+        source = source.convert('RGB')
+
+    results = []
+    for spec, width, height, crop, scale in jobs:
+        width, height = width * scale, height * scale
+        if scale > 1 and (source.width < width or source.height < height):
+            continue
+
+        if crop:
+            image = ImageOps.fit(source, (width, height), Image.Resampling.LANCZOS)
+        else:
+            image = source.copy()
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+        for output in (WEBP, extension):
+            buffer = io.BytesIO()
+            if output == WEBP:
+                image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+            elif output == 'png':
+                image.save(buffer, 'PNG', optimize=True)
+            else:
+                image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            results.append((spec, scale, output, buffer.getvalue()))
+    return results
+
+
+def build_jobs(specs):
+    jobs = []
+    for spec in specs:
+        size = RENDITION_SPECS[spec]
+        jobs.extend((spec, size.width, size.height, size.crop, scale) for scale in RENDITION_SCALES)
+    return jobs
+
+
+def save_renditions(storage, name, results):
+    """Сохраняет готовые копии в хранилище, заменяя прежние"""
+    for spec, scale, extension, content in results:
+        target = rendition_name(name, spec, scale, extension)
+        if storage.exists(target):
+            storage.delete(target)
+        # Хранилище с адресацией по содержимому сохраняет копии под заданным именем через save_as
+        save = getattr(storage, 'save_as', storage.save)
+        save(target, ContentFile(content))
+        remember_lookup(target, True)
+
+
+def get_executor():
+    """Пул процессов для генерации копий (создается при первом использовании)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=getattr(settings, 'RENDITION_WORKERS', 2))
+    return _executor
+
+
+def generate_renditions(field_file, specs, wait=False):
+    """
+    Генерирует копии изображения поля модели.
+
+    По умолчанию генерация синхронная. С RENDITIONS_ASYNC=True (и без wait)
+    работа передается в пул процессов, а копии сохраняются по готовности.
+
+    :param field_file: значение ImageField (FieldFile)
+    :param specs: имена размеров из RENDITION_SPECS
+    """
+    storage, name = field_file.storage, field_file.name
+    # Повторная загрузка того же файла (общий файл по хэшу) — копии уже есть
+    if rendition_exists(storage, rendition_name(name, specs[0], RENDITION_SCALES[0], WEBP)):
+        return
+
+    with storage.open(name, 'rb') as file:
+        data = file.read()
+
+    jobs = build_jobs(specs)
+    extension = fallback_extension(name)
+
+    if wait or not getattr(settings, 'RENDITIONS_ASYNC', False):
+        save_renditions(storage, name, render_renditions(data, jobs, extension))
+        return
+
+    def on_done(future):
+        try:
+            save_renditions(storage, name, future.result())
+        except Exception:
+            logger.exception('Не удалось создать копии изображения %s', name)
+
+    get_executor().submit(render_renditions, data, jobs, extension).add_done_callback(on_done)
+
+
+def rendition_exists(storage, name):
+    known = recall_lookup(name)
+    if known is True:
+        return True
+    if known is not None and known > time.monotonic():
+        return False
+    exists = storage.exists(name)
+    remember_lookup(name, True if exists else time.monotonic() + get_miss_ttl())
+    return exists
+
+
+def rendition_url(field_file, spec, scale=1, webp=False):
+    """
+    URL копии изображения или оригинала, если копия еще не создана.
+
+    :param field_file: значение ImageField
+    :param spec: имя размера из RENDITION_SPECS
+    :param scale: масштаб (1 или 2)
+    :param webp: вернуть WebP-вариант вместо исходного формата
+    """
+    if not field_file:
+        return ''
+    extension = WEBP if webp else fallback_extension(field_file.name)
+    name = rendition_name(field_file.name, spec, scale, extension)
+    if rendition_exists(field_file.storage, name):
+        return field_file.storage.url(name)
+    return field_file.url
+
+
+def rendition_srcset(field_file, spec, webp=False):
+    """
+    Значение атрибута srcset с копиями всех масштабов ("url 400w, url 800w").
+    Пустая строка, если копий нет.
+    """
+    if not field_file:
+        return ''
+    extension = WEBP if webp else fallback_extension(field_file.name)
+    candidates = []
+    for scale in RENDITION_SCALES:
+        name = rendition_name(field_file.name, spec, scale, extension)
+        if rendition_exists(field_file.storage, name):
+            candidates.append(
+                f'{field_file.storage.url(name)} {RENDITION_SPECS[spec].width * scale}w'
+            )
+    return ', '.join(candidates)
+
+
+def remember_pending_renditions(sender, instance, **kwargs):
+    """Перед сохранением отмечаем, что в поле загружен новый файл"""
+    field_name, _ = RENDITION_FIELDS[sender._meta.label]
+    field_file = getattr(instance, field_name)
+    instance._renditions_pending = bool(field_file) and not field_file._committed
+
+
+def schedule_renditions(sender, instance, **kwargs):
+    """После фиксации транзакции отправляем новый файл на генерацию копий"""
+    if not getattr(instance, '_renditions_pending', False):
+        return
+    instance._renditions_pending = False
+    field_name, specs = RENDITION_FIELDS[sender._meta.label]
+    field_file = getattr(instance, field_name)
+
+    def run():
+        try:
+            generate_renditions(field_file, specs)
+        except Exception:
+            logger.exception('Не удалось создать копии изображения %s', field_file.name)
+
+    transaction.on_commit(run)
+
+
+def connect_signals():
+    """Подключает генерацию копий к моделям из RENDITION_FIELDS"""
+    for label in RENDITION_FIELDS:
+        model = apps.get_model(label)
+        pre_save.connect(
+            remember_pending_renditions, sender=model, dispatch_uid=f'renditions_pre_save_{label}'
+        )
+        post_save.connect(
+            schedule_renditions, sender=model, dispatch_uid=f'renditions_post_save_{label}'
+        )
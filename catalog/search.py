@@ -0,0 +1,328 @@
+"""
+Полнотекстовый поиск по товарам и записям блога.
+
+На PostgreSQL используется хранимая (generated) колонка search_vector типа
+tsvector по текстовым полям с русской и английской конфигурациями и
+GIN-индекс по ней. На SQLite — теневая таблица FTS5, которая поддерживается
+в актуальном состоянии триггерами. Колонки и таблицы поиска создаются
+миграцией и не описаны в модели, поэтому запросы строятся через RawSQL.
+
+Индекс описывается экземпляром FullTextIndex: PRODUCT_INDEX (название и
+описание товара) и BLOG_POST_INDEX (заголовок и текст записи).
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, CharField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+POSTGRES_SEARCH_CONFIGS = ('russian', 'english')
+
+# Границы совпадений во фрагментах (символы из области частного использования
+# Unicode не встречаются в тексте, поэтому фрагмент можно безопасно экранировать)
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_STOP = '\ue001'
+SNIPPET_ELLIPSIS = '…'
+SNIPPET_WORDS = 24
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _postgres_query_sql():
+    return ' || '.join(
+        f"websearch_to_tsquery('{config}'::regconfig, %s)" for config in POSTGRES_SEARCH_CONFIGS
+    )
+
+
+def _sqlite_match_expression(query):
+    """Преобразует пользовательский ввод в безопасное выражение FTS5 (все слова, по префиксу)"""
+    tokens = _TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def highlight_snippet(snippet):
+    """Экранирует фрагмент и выделяет совпадения тегом <mark>"""
+    if not snippet:
+        return ''
+    html = escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+    return mark_safe(html)
+
+
+class FullTextIndex:
+    """
+    Поисковый индекс по текстовым колонкам одной таблицы.
+
+    :param table: таблица модели
+    :param columns: колонки и их веса в ранжировании PostgreSQL, например (('name', 'A'),)
+    :param gin_index: имя GIN-индекса на PostgreSQL
+    :param fallback_fields: поля для icontains на прочих СУБД
+    """
+
+    def __init__(self, table, columns, gin_index, fallback_fields):
+        self.table = table
+        self.columns = columns
+        self.gin_index = gin_index
+        self.fallback_fields = fallback_fields
+        self.fts_table = f'{table}_fts'
+
+    @property
+    def column_names(self):
+        return [column for column, _ in self.columns]
+
+    # PostgreSQL
+
+    def postgres_document_sql(self):
+        parts = []
+        for config in POSTGRES_SEARCH_CONFIGS:
+            for column, weight in self.columns:
+                document = f"to_tsvector('{config}'::regconfig, coalesce({column}, ''))"
+                parts.append(f"setweight({document}, '{weight}')")
+        return ' || '.join(parts)
+
+    def postgres_install_sql(self):
+        return [
+            f'ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+            f'GENERATED ALWAYS AS ({self.postgres_document_sql()}) STORED',
+            f'CREATE INDEX IF NOT EXISTS {self.gin_index} '
+            f'ON {self.table} USING gin (search_vector)',
+        ]
+
+    def postgres_uninstall_sql(self):
+        return [
+            f'DROP INDEX IF EXISTS {self.gin_index}',
+            f'ALTER TABLE {self.table} DROP COLUMN IF EXISTS search_vector',
+        ]
+
+    # SQLite
+
+    def sqlite_table_sql(self):
+        return (
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5('
+            f"{', '.join(self.column_names)}, content='{self.table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def sqlite_triggers_sql(self):
+        fts = self.fts_table
+        columns = ', '.join(self.column_names)
+        new_values = ', '.join(f'new.{column}' for column in self.column_names)
+        old_values = ', '.join(f'old.{column}' for column in self.column_names)
+        return [
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {self.table} BEGIN '
+            f'INSERT INTO {fts}(rowid, {columns}) '
+            f'VALUES (new.id, {new_values}); END',
+
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {self.table} BEGIN '
+            f'INSERT INTO {fts}({fts}, rowid, {columns}) '
+            f"VALUES ('delete', old.id, {old_values}); END",
+
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} '
+            f'ON {self.table} BEGIN '
+            f'INSERT INTO {fts}({fts}, rowid, {columns}) '
+            f"VALUES ('delete', old.id, {old_values}); "
+            f'INSERT INTO {fts}(rowid, {columns}) '
+            f'VALUES (new.id, {new_values}); END',
+        ]
+
+    def sqlite_rebuild_sql(self):
+        return f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')"
+
+    def sqlite_uninstall_sql(self):
+        return [
+            f'DROP TRIGGER IF EXISTS {self.fts_table}_ai',
+            f'DROP TRIGGER IF EXISTS {self.fts_table}_ad',
+            f'DROP TRIGGER IF EXISTS {self.fts_table}_au',
+            f'DROP TABLE IF EXISTS {self.fts_table}',
+        ]
+
+    # Установка
+
+    def install(self, connection):
+        """Создает поисковый индекс для текущей СУБД (вызывается из миграции)"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                for sql in self.postgres_install_sql():
+                    cursor.execute(sql)
+            elif connection.vendor == 'sqlite':
+                cursor.execute(self.sqlite_table_sql())
+                for sql in self.sqlite_triggers_sql():
+                    cursor.execute(sql)
+                cursor.execute(self.sqlite_rebuild_sql())
+
+    def uninstall(self, connection):
+        """Удаляет поисковый индекс (обратная миграция)"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                for sql in self.postgres_uninstall_sql():
+                    cursor.execute(sql)
+            elif connection.vendor == 'sqlite':
+                for sql in self.sqlite_uninstall_sql():
+                    cursor.execute(sql)
+
+    def ensure_sqlite_triggers(self, connection):
+        """
+        Восстанавливает триггеры FTS5 на SQLite.
+
+        SQLite-бэкенд Django пересоздает таблицу при изменении ее схемы, и
+        триггеры удаляются вместе со старой таблицей, поэтому после миграций
+        их нужно проверить.
+        """
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [self.fts_table]
+            )
+            if cursor.fetchone() is None:
+                return
+            for sql in self.sqlite_triggers_sql():
+                cursor.execute(sql)
+
+    # Поиск
+
+    def search(self, queryset, query, snippet_column=None, ordering=('-created_at',)):
+        """
+        Фильтрует выборку по поисковому запросу и сортирует по релевантности.
+
+        Добавляет аннотацию search_rank (чем больше, тем релевантнее), а если
+        передан snippet_column — еще и search_snippet: фрагмент колонки вокруг
+        совпадений, размеченный для highlight_snippet.
+
+        :param queryset: исходная выборка (с уже примененными правилами видимости)
+        :param query: строка поиска
+        :param snippet_column: колонка, из которой строится фрагмент
+        :param ordering: сортировка при равной релевантности
+        :return: QuerySet
+        """
+        query = (query or '').strip()
+        if not query:
+            return queryset.none()
+
+        vendor = connections[queryset.db].vendor
+
+        if vendor == 'postgresql':
+            tsquery = _postgres_query_sql()
+            params = [query] * len(POSTGRES_SEARCH_CONFIGS)
+            queryset = queryset.filter(
+                RawSQL(
+                    f'{self.table}.search_vector @@ ({tsquery})',
+                    params,
+                    output_field=BooleanField(),
+                )
+            ).annotate(
+                search_rank=RawSQL(
+                    f'ts_rank_cd({self.table}.search_vector, {tsquery})',
+                    params,
+                    output_field=FloatField(),
+                ),
+            )
+            if snippet_column:
+                # ts_headline дорогой, но PostgreSQL вычисляет его только для строк после LIMIT
+                options = (
+                    f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, '
+                    f'MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}, '
+                    f'MaxFragments=2, FragmentDelimiter=" {SNIPPET_ELLIPSIS} "'
+                )
+                queryset = queryset.annotate(
+                    search_snippet=RawSQL(
+                        f"ts_headline('{POSTGRES_SEARCH_CONFIGS[0]}'::regconfig, "
+                        f"coalesce({self.table}.{snippet_column}, ''), ({tsquery}), %s)",
+                        [*params, options],
+                        output_field=CharField(),
+                    ),
+                )
+            return queryset.order_by('-search_rank', *ordering)
+
+        if vendor == 'sqlite':
+            match = _sqlite_match_expression(query)
+            if not match:
+                return queryset.none()
+            # bm25 возвращает отрицательные значения: чем меньше, тем релевантнее
+            queryset = queryset.filter(
+                id__in=RawSQL(
+                    f'SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH %s', [match]
+                )
+            ).annotate(
+                search_rank=RawSQL(
+                    f'(SELECT -bm25({self.fts_table}) FROM {self.fts_table} '
+                    f'WHERE {self.fts_table} MATCH %s AND rowid = {self.table}.id)',
+                    [match],
+                    output_field=FloatField(),
+                ),
+            )
+            if snippet_column:
+                column_index = self.column_names.index(snippet_column)
+                queryset = queryset.annotate(
+                    search_snippet=RawSQL(
+                        f'(SELECT snippet({self.fts_table}, {column_index}, %s, %s, %s, '
+                        f'{SNIPPET_WORDS}) FROM {self.fts_table} '
+                        f'WHERE {self.fts_table} MATCH %s AND rowid = {self.table}.id)',
+                        [HIGHLIGHT_START, HIGHLIGHT_STOP, SNIPPET_ELLIPSIS, match],
+                        output_field=CharField(),
+                    ),
+                )
+            return queryset.order_by('-search_rank', *ordering)
+
+        # Прочие СУБД: без индекса, простое вхождение подстроки
+        condition = Q()
+        for field in self.fallback_fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition).order_by(*ordering)
+
+
+PRODUCT_INDEX = FullTextIndex(
+    table='catalog_product',
+    columns=(('name', 'A'), ('description', 'B')),
+    gin_index='product_search_vector_gin',
+    fallback_fields=('name', 'description'),
+)
+
+BLOG_POST_INDEX = FullTextIndex(
+    table='blog_blogpost',
+    columns=(('title', 'A'), ('content', 'B')),
+    gin_index='blogpost_search_vector_gin',
+    fallback_fields=('title', 'content'),
+)
+
+
+def install_search_index(connection):
+    """Создает поисковый индекс товаров (вызывается из миграции)"""
+    PRODUCT_INDEX.install(connection)
+
+
+def uninstall_search_index(connection):
+    """Удаляет поисковый индекс товаров (обратная миграция)"""
+    PRODUCT_INDEX.uninstall(connection)
+
+
+def ensure_sqlite_triggers(connection):
+    """Восстанавливает триггеры FTS5 всех поисковых индексов на SQLite"""
+    for index in (PRODUCT_INDEX, BLOG_POST_INDEX):
+        index.ensure_sqlite_triggers(connection)
+
+
+def search_products(queryset, query):
+    """
+    Фильтрует выборку товаров по поисковому запросу и сортирует по релевантности.
+
+    Добавляет к товарам аннотацию search_rank (чем больше, тем релевантнее).
+
+    :param queryset: исходная выборка (с уже примененными правилами видимости)
+    :param query: строка поиска
+    :return: QuerySet<Product>
+    """
+    return PRODUCT_INDEX.search(queryset, query)
+
+
+def search_blog_posts(queryset, query, snippets=False):
+    """
+    Фильтрует выборку записей блога по поисковому запросу и сортирует по релевантности.
+
+    :param queryset: исходная выборка (с уже примененными правилами видимости)
+    :param query: строка поиска
+    :param snippets: добавить фрагменты текста с совпадениями (search_snippet)
+    :return: QuerySet<BlogPost>
+    """
+    return BLOG_POST_INDEX.search(queryset, query, snippet_column='content' if snippets else None)
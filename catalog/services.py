@@ -1,18 +1,320 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from catalog.cache import (
+    GLOBAL_NAMESPACE,
+    LISTING_CACHE_TIMEOUT,
+    RELATED_PRODUCTS_LIMIT,
+    get_namespace_versions,
+    get_related_product_ids,
+)
+from catalog import trending
 from catalog.models import Product, Category
 
+# Локальная (в памяти процесса) копия навигации по категориям: (версия каталога, данные)
+_category_navigation_local = {'version': None, 'items': None}
+
+
 class CategoryService:
+    @staticmethod
+    def get_navigation():
+        """
+        Возвращает список категорий с количеством опубликованных товаров.
+
+        Данные считаются одним агрегирующим запросом и хранятся в общем кэше
+        и в памяти процесса с привязкой к версии каталога: любое изменение
+        товара или категории увеличивает версию, и список пересчитывается.
+        Пока версия не изменилась, обращений к базе нет.
+
+        :return: list<dict> с ключами id, name, description, published_count
+        """
+        version = get_namespace_versions(GLOBAL_NAMESPACE)[GLOBAL_NAMESPACE]
+        if _category_navigation_local['version'] == version:
+            return _category_navigation_local['items']
+
+        cache_key = f'catalog_category_nav_v{version}'
+        items = cache.get(cache_key)
+        if items is None:
+            items = list(
+                Category.objects.annotate(
+                    published_count=Count('product', filter=Q(product__publish='published'))
+                ).order_by('name').values('id', 'name', 'description', 'published_count')
+            )
+            cache.set(cache_key, items, LISTING_CACHE_TIMEOUT)
+
+        _category_navigation_local.update(version=version, items=items)
+        return items
+
+    @staticmethod
+    def get_category(category_id):
+        """
+        Возвращает данные категории из навигации (без запроса к базе).
+
+        :param category_id: ID категории
+        :return: dict или None, если категории нет
+        """
+        for item in CategoryService.get_navigation():
+            if item['id'] == category_id:
+                return item
+        return None
+
     @staticmethod
     def get_products_by_category(category_id, raise_exception=False):
         """
-        Возвращает список продуктов по ID категории.
+        Возвращает опубликованные товары категории (проекция для списков, от новых к старым).
 
         :param category_id: ID категории
         :param raise_exception: если True — выбрасывает исключение, если категории нет
         :return: QuerySet<Product>
         """
-        qs = Product.objects.filter(category_id=category_id)
+        qs = CatalogQueryService.get_products(category_id=category_id)
 
         if raise_exception and not Category.objects.filter(id=category_id).exists():
             raise Category.DoesNotExist(f"Category with id={category_id} does not exist")
 
         return qs
+
+
+class CatalogQueryService:
+    """
+    Построение выборок товаров каталога в одном месте: правила видимости,
+    порядок сортировки и проекции — какие колонки загружаются для списков
+    и для страницы товара.
+    """
+
+    LIST = 'list'
+    DETAIL = 'detail'
+
+    ORDERING = ('-created_at', '-id')
+
+    # Колонки товара, которые выводятся в карточках списков. Полное описание
+    # не загружается: карточке достаточно сохраненного краткого описания (excerpt)
+    LIST_FIELDS = (
+        'id', 'name', 'excerpt', 'price', 'image', 'publish', 'created_at', 'category', 'owner',
+    )
+
+    # Колонки связанных моделей для подсказок select_related в списках
+    LIST_RELATED_FIELDS = {
+        'category': ('category__id', 'category__name'),
+        'owner': ('owner__id', 'owner__username', 'owner__first_name', 'owner__last_name'),
+    }
+
+    @staticmethod
+    def apply_visibility(queryset, user=None, show_unpublished=False):
+        """
+        Применяет правила видимости товаров.
+
+        Без фильтра видны только опубликованные товары. С фильтром модератор видит
+        все неопубликованные, обычный пользователь — опубликованные и свои
+        неопубликованные, гость — только опубликованные.
+
+        :param queryset: исходная выборка
+        :param user: текущий пользователь (None — гость)
+        :param show_unpublished: включен ли фильтр неопубликованных товаров
+        :return: QuerySet<Product>
+        """
+        if show_unpublished and user is not None and user.is_authenticated:
+            if user.has_perm('catalog.can_unpublish_product'):
+                return queryset.filter(publish__in=['pending', 'rejected', 'unpublished'])
+            return queryset.filter(Q(publish='published') | Q(owner=user))
+
+        return queryset.filter(publish='published')
+
+    @staticmethod
+    def get_visibility_tier(user=None, show_unpublished=False):
+        """
+        Уровень видимости для ключей кэша списков.
+
+        Списки различаются только правилами видимости, поэтому все, кто видит
+        одно и то же, используют общий ключ: без фильтра — опубликованные
+        товары (модератору — с владельцем в карточках), с фильтром —
+        модераторский уровень или конкретный пользователь (его неопубликованные).
+
+        :return: str
+        """
+        is_moderator = user is not None and user.has_perm('catalog.can_unpublish_product')
+        if show_unpublished and user is not None and user.is_authenticated:
+            return 'moderator' if is_moderator else f'user:{user.pk}'
+        return 'published_owner' if is_moderator else 'published'
+
+    @classmethod
+    def apply_projection(cls, queryset, projection=LIST, select_related=(), prefetch_related=()):
+        """
+        Ограничивает загружаемые колонки и добавляет связанные объекты.
+
+        :param queryset: исходная выборка
+        :param projection: LIST — только поля карточки, DETAIL — все поля товара
+        :param select_related: связи для загрузки в том же запросе
+        :param prefetch_related: связи для загрузки отдельными запросами
+        :return: QuerySet<Product>
+        """
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        if projection == cls.LIST:
+            fields = list(cls.LIST_FIELDS)
+            for relation in select_related:
+                fields.extend(cls.LIST_RELATED_FIELDS.get(relation, ()))
+            queryset = queryset.only(*fields)
+        elif projection != cls.DETAIL:
+            raise ValueError(f'Unknown projection: {projection}')
+
+        return queryset
+
+    @classmethod
+    def get_products(
+        cls,
+        user=None,
+        show_unpublished=False,
+        category_id=None,
+        projection=LIST,
+        select_related=('category',),
+        prefetch_related=(),
+        queryset=None,
+        limit=None,
+        cache_key=None,
+        cache_timeout=LISTING_CACHE_TIMEOUT,
+    ):
+        """
+        Возвращает видимые пользователю товары в порядке от новых к старым.
+
+        Если передан cache_key, выборка выполняется и в кэш попадает список
+        товаров (cache-aside): повторный вызов с тем же ключом не обращается
+        к базе. Ключ должен учитывать уровень видимости (get_visibility_tier)
+        и версии пространств имён кэша; выборку стоит ограничить limit.
+
+        :param user: текущий пользователь (None — гость)
+        :param show_unpublished: включен ли фильтр неопубликованных товаров
+        :param category_id: ограничить выборку категорией
+        :param projection: LIST или DETAIL
+        :param select_related: подсказки select_related
+        :param prefetch_related: подсказки prefetch_related
+        :param queryset: исходная выборка (по умолчанию все товары)
+        :param limit: максимальное количество товаров
+        :param cache_key: ключ кэша для cache-aside
+        :param cache_timeout: время жизни записи в кэше
+        :return: QuerySet<Product>, а с cache_key — list<Product>
+        """
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if queryset is None:
+            queryset = Product.objects.all()
+        if category_id is not None:
+            queryset = queryset.filter(category_id=category_id)
+
+        queryset = cls.apply_visibility(queryset, user, show_unpublished)
+        queryset = cls.apply_projection(queryset, projection, select_related, prefetch_related)
+        queryset = queryset.order_by(*cls.ORDERING)
+        if limit is not None:
+            queryset = queryset[:limit]
+
+        if cache_key is not None:
+            products = list(queryset)
+            cache.set(cache_key, products, cache_timeout)
+            return products
+
+        return queryset
+
+
+class TrendingService:
+    # Сколько товаров выводится в блоке «В тренде» и сколько живет закэшированный список
+    LIMIT = 4
+    CACHE_TIMEOUT = 60 * 5
+
+    @classmethod
+    def get_trending_products(cls, category_id=None, limit=LIMIT):
+        """
+        Товары с наибольшим затухающим рейтингом уникальных просмотров.
+
+        Порядок берется из сортированного множества рейтинга (catalog/trending.py),
+        карточки загружаются одним запросом pk__in; результат кэшируется на
+        несколько минут.
+
+        :param category_id: рейтинг категории (None — по всему каталогу)
+        :param limit: максимальное количество товаров
+        :return: list<Product> по убыванию рейтинга
+        """
+        cache_key = f'catalog_trending_products:{category_id or "all"}:{limit}'
+        products = cache.get(cache_key)
+        if products is not None:
+            return products
+
+        # Берем с запасом: часть товаров могла быть снята с публикации или перемещена
+        product_ids = trending.top_ids(trending.PRODUCT, limit * 2, category_id)
+        products = []
+        if product_ids:
+            queryset = CatalogQueryService.get_products(
+                category_id=category_id, queryset=Product.objects.filter(pk__in=product_ids)
+            )
+            position = {pk: index for index, pk in enumerate(product_ids)}
+            products = sorted(queryset, key=lambda product: position[product.pk])[:limit]
+
+        cache.set(cache_key, products, cls.CACHE_TIMEOUT)
+        return products
+
+
+class ProductService:
+    @staticmethod
+    def get_related_products(product, limit=RELATED_PRODUCTS_LIMIT):
+        """
+        Возвращает похожие товары из той же категории по предрасчитанному списку.
+
+        Одно обращение к кэшу за списком id и один запрос pk__in за карточками.
+
+        :param product: текущий товар (исключается из результата)
+        :param limit: максимальное количество товаров
+        :return: list<Product> в порядке от новых к старым
+        """
+        product_ids = [
+            pk for pk in get_related_product_ids(product.category_id) if pk != product.pk
+        ][:limit]
+        if not product_ids:
+            return []
+
+        products = CatalogQueryService.apply_projection(Product.objects.all()).in_bulk(product_ids)
+        return [products[pk] for pk in product_ids if pk in products]
+
+
+class UnpublishedCounterService:
+    """Денормализованный счетчик неопубликованных товаров пользователя
+    (CustomUser.unpublished_products_count)"""
+
+    @staticmethod
+    def adjust(owner_id, delta):
+        """
+        Атомарно изменяет счетчик владельца на delta (не опускаясь ниже нуля).
+
+        :param owner_id: ID владельца товаров
+        :param delta: изменение счетчика
+        """
+        if not owner_id or not delta:
+            return
+        get_user_model().objects.filter(pk=owner_id).update(
+            unpublished_products_count=Greatest(F('unpublished_products_count') + delta, 0)
+        )
+
+    @staticmethod
+    def rebuild():
+        """
+        Пересчитывает счетчики всех пользователей одним запросом UPDATE.
+
+        :return: количество обновленных пользователей
+        """
+        counts = (
+            Product.objects.filter(owner=OuterRef('pk'))
+            .exclude(publish='published')
+            .order_by()
+            .values('owner')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return get_user_model().objects.update(
+            unpublished_products_count=Coalesce(Subquery(counts), 0)
+        )
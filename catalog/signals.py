@@ -0,0 +1,90 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_category, invalidate_products, refresh_related_product_ids
+from .models import Category, Product
+from .renditions import connect_signals as connect_rendition_signals
+from .search import ensure_sqlite_triggers
+from .services import UnpublishedCounterService
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_product_state(sender, instance, using=None, **kwargs):
+    """Запоминаем категорию, владельца и статус товара до сохранения.
+    Строка перечитывается с блокировкой: параллельное сохранение того же товара
+    ждет фиксации транзакции и не изменит счетчик владельца повторно"""
+    instance._catalog_previous = None
+    if not instance.pk:
+        return
+    instance._catalog_previous = Product.get_locked_state(instance.pk, using)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_on_product_save(sender, instance, **kwargs):
+    """Сбрасываем кэш списков при создании, редактировании и модерации товара"""
+    category_ids = {instance.category_id}
+
+    # Товар мог сменить категорию — списки прежней категории тоже устарели
+    previous = getattr(instance, '_catalog_previous', None)
+    if previous:
+        category_ids.add(previous['category_id'])
+
+    invalidate_products(category_ids=category_ids)
+    schedule_related_refresh(category_ids)
+
+
+@receiver(post_save, sender=Product)
+def update_unpublished_counter_on_save(sender, instance, created, **kwargs):
+    """Обновляем счетчик неопубликованных товаров владельца (в транзакции Product.save)"""
+    is_unpublished = instance.publish != 'published'
+    previous = getattr(instance, '_catalog_previous', None)
+
+    if created or not previous:
+        UnpublishedCounterService.adjust(instance.owner_id, int(is_unpublished))
+        return
+
+    was_unpublished = previous['publish'] != 'published'
+    if previous['owner_id'] == instance.owner_id:
+        UnpublishedCounterService.adjust(
+            instance.owner_id, int(is_unpublished) - int(was_unpublished)
+        )
+    else:
+        UnpublishedCounterService.adjust(previous['owner_id'], -int(was_unpublished))
+        UnpublishedCounterService.adjust(instance.owner_id, int(is_unpublished))
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_on_product_delete(sender, instance, **kwargs):
+    """Сбрасываем кэш списков при удалении товара"""
+    invalidate_products(category_ids=[instance.category_id])
+    schedule_related_refresh([instance.category_id])
+
+    if instance.publish != 'published':
+        UnpublishedCounterService.adjust(instance.owner_id, -1)
+
+
+def schedule_related_refresh(category_ids):
+    """Пересчитываем похожие товары категорий после фиксации транзакции"""
+    for category_id in set(category_ids):
+        transaction.on_commit(
+            lambda category_id=category_id: refresh_related_product_ids(category_id)
+        )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_on_category_change(sender, instance, **kwargs):
+    """Название категории выводится в карточках товаров, поэтому сбрасываем и общий кэш"""
+    invalidate_category(instance.pk)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    """SQLite теряет триггеры FTS5 при пересоздании таблиц товаров и записей блога в миграциях"""
+    if sender.name in ('catalog', 'blog'):
+        ensure_sqlite_triggers(connections[using])
+
+
+# Генерация уменьшенных копий изображений товаров, записей блога и аватаров
+connect_rendition_signals()
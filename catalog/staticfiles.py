@@ -0,0 +1,140 @@
+"""
+Статические файлы для продакшена без отдельного CDN.
+
+CompressedManifestStaticFilesStorage — ManifestStaticFilesStorage (имена с
+хэшем содержимого: bootstrap.min.3f1a….css), который при collectstatic
+дополнительно сохраняет рядом gzip-копии текстовых файлов.
+
+serve_static отдает собранную статику из STATIC_ROOT: выбирает gzip-копию,
+если клиент ее принимает, и для файлов с хэшем в имени отправляет
+Cache-Control: immutable — их содержимое по этому адресу никогда не меняется.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+# Какие файлы имеет смысл сжимать (изображения и шрифты уже сжаты)
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+# Сжатая копия сохраняется, только если она заметно меньше оригинала
+MIN_COMPRESSION_RATIO = 0.95
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+# Имена файлов с хэшем из манифеста и время изменения манифеста, из которого
+# они прочитаны: после нового collectstatic манифест перечитывается без перезапуска
+_manifest = {'mtime': None, 'names': frozenset()}
+
+_GZIP_RE = re.compile(r'(?:^|,)\s*gzip\s*(?:;\s*q=(?P<q>[0-9.]+))?\s*(?:,|$)')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэшированные имена файлов плюс gzip-копии, создаваемые при collectstatic"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                processed_names.add(name)
+                if hashed_name:
+                    processed_names.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+
+        for name in processed_names:
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                self.write_gzip(name)
+
+    def write_gzip(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            content = file.read()
+
+        # mtime=0 — одинаковый результат при повторной сборке
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) < len(content) * MIN_COMPRESSION_RATIO:
+            with open(f'{path}.gz', 'wb') as file:
+                file.write(compressed)
+
+
+def accepts_gzip(request):
+    """Принимает ли клиент gzip по заголовку Accept-Encoding (с учетом q=0)"""
+    match = _GZIP_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', '').lower())
+    if not match:
+        return False
+    quality = match.group('q')
+    try:
+        return quality is None or float(quality) > 0
+    except ValueError:
+        return False
+
+
+def get_hashed_names():
+    """
+    Имена файлов с хэшем из манифеста collectstatic.
+
+    Манифест перечитывается, только если изменилось время его модификации,
+    поэтому на запрос приходится один stat, а не чтение JSON.
+    """
+    manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest_name is None:
+        return frozenset()
+    try:
+        mtime = os.path.getmtime(staticfiles_storage.manifest_storage.path(manifest_name))
+    except OSError:
+        mtime = None
+
+    if mtime != _manifest['mtime']:
+        hashed_files = staticfiles_storage.load_manifest()[0] if mtime is not None else {}
+        _manifest.update(mtime=mtime, names=frozenset(hashed_files.values()))
+    return _manifest['names']
+
+
+def is_immutable(path):
+    """Файл с хэшем в имени (есть среди значений манифеста)"""
+    return path in get_hashed_names()
+
+
+@require_safe
+def serve_static(request, path):
+    """Отдает файл из STATIC_ROOT, предпочитая предварительно сжатую копию"""
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    serve_path, encoding = full_path, None
+    if accepts_gzip(request) and os.path.isfile(f'{full_path}.gz'):
+        serve_path, encoding = f'{full_path}.gz', 'gzip'
+
+    stat = os.stat(serve_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            open(serve_path, 'rb'), content_type=content_type or 'application/octet-stream'
+        )
+        response['Content-Length'] = stat.st_size
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if is_immutable(path) else DEFAULT_CACHE_CONTROL
+    )
+    return response
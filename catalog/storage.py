@@ -0,0 +1,74 @@
+"""
+Хранилище загруженных файлов с адресацией по содержимому.
+
+Имя файла — SHA-256 его содержимого: products/3f/3fa1…c9.jpg. Хэш считается
+в том же проходе, в котором загрузка пишется на диск, поэтому файл читается
+один раз. Если такой файл уже есть, временная копия удаляется и запись
+ссылается на существующий файл: одинаковые изображения хранятся один раз.
+
+Один файл может принадлежать нескольким записям, поэтому удалять его
+при удалении записи нельзя.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, сохраняющий загрузки под именем по хэшу содержимого"""
+
+    hash_prefix_length = 2
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+
+        upload_dir = self.path(directory)
+        os.makedirs(upload_dir, exist_ok=True)
+
+        # Пишем во временный файл в той же директории и одновременно считаем хэш
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=upload_dir, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            content_hash = digest.hexdigest()
+            final_name = posixpath.join(
+                directory, content_hash[:self.hash_prefix_length], content_hash + extension
+            )
+            final_path = self.path(final_name)
+
+            if os.path.exists(final_path):
+                # Такой файл уже загружен — используем его
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return final_name
+
+    def save_as(self, name, content):
+        """Сохраняет файл точно под указанным именем (для производных файлов, например копий
+        изображений)"""
+        return super()._save(name, content)
+
+
+def product_image_storage():
+    """Хранилище изображений товаров (вызываемый объект, чтобы настройки не попадали в миграции)"""
+    return ContentAddressedStorage()
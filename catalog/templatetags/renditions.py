@@ -0,0 +1,51 @@
+from django import template
+from django.utils.html import format_html
+
+from catalog.renditions import RENDITION_SPECS, rendition_srcset, rendition_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def rendition(field_file, spec, scale=1, webp=False):
+    """URL уменьшенной копии изображения: {% rendition product.image 'card' %}"""
+    return rendition_url(field_file, spec, scale, webp)
+
+
+@register.simple_tag
+def srcset(field_file, spec, webp=False):
+    """Атрибут srcset с копиями 1x и 2x: {% srcset product.image 'card' webp=True %}"""
+    return rendition_srcset(field_file, spec, webp)
+
+
+@register.simple_tag
+def picture(field_file, spec, alt='', css_class='', style='', sizes=None, loading='lazy'):
+    """
+    Элемент <picture> с WebP-копиями и запасным вариантом в исходном формате.
+
+    {% picture product.image 'card' alt=product.name css_class='card-img-top' style='...' %}
+
+    Если копии еще не созданы, выводится обычный <img> с оригиналом.
+    """
+    if not field_file:
+        return ''
+
+    sizes = sizes or f'{RENDITION_SPECS[spec].width}px'
+    webp_srcset = rendition_srcset(field_file, spec, webp=True)
+    fallback_srcset = rendition_srcset(field_file, spec)
+
+    if not fallback_srcset:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="{}" decoding="async">',
+            field_file.url, alt, css_class, style, loading,
+        )
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" '
+        'loading="{}" decoding="async">'
+        '</picture>',
+        webp_srcset, sizes,
+        rendition_url(field_file, spec), fallback_srcset, sizes, alt, css_class, style, loading,
+    )
@@ -0,0 +1,11 @@
+from django import template
+
+from catalog.search import highlight_snippet
+
+register = template.Library()
+
+
+@register.filter
+def highlight(snippet):
+    """Фрагмент найденного текста с выделенными совпадениями: {{ post.search_snippet|highlight }}"""
+    return highlight_snippet(snippet)
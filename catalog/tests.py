@@ -1,3 +1,1174 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import renditions, services, staticfiles, trending
+from .cache import category_namespace, get_namespace_versions, make_versioned_key
+from .management.commands.import_products import copy_csv_line
+from .models import Category, ImportCheckpoint, Product
+from .pagination import KeysetPaginator
+from .search import search_products
+from .services import CatalogQueryService, CategoryService, ProductService, TrendingService
+from .storage import ContentAddressedStorage
+
+User = get_user_model()
+
+
+def count_selects(queries, table):
+    """Количество SELECT-запросов к таблице среди перехваченных запросов"""
+    return sum(
+        1 for query in queries
+        if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+    )
+
+
+class ProductObjectLoadingTests(TestCase):
+    """Товар загружается один раз за запрос: проверка прав, представление и сохранение/удаление"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.other = User.objects.create_user(
+            username='other', email='other@example.com', password='pass'
+        )
+        cls.moderator = User.objects.create_user(
+            username='moderator', email='moderator@example.com', password='pass'
+        )
+        cls.moderator.user_permissions.add(Permission.objects.get(codename='can_unpublish_product'))
+        cls.category = Category.objects.create(name='Плагины')
+        cls.product = Product.objects.create(
+            name='Плагин', description='Описание', price=100, category=cls.category,
+            owner=cls.owner, publish='published',
+        )
+
+    def assertProductLoadedOnce(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = method(url, data) if data is not None else method(url)
+        # Сохранение и удаление дополнительно перечитывают с блокировкой только
+        # категорию, владельца и статус (Product.get_locked_state)
+        state_columns = ', '.join(
+            f'"{Product._meta.db_table}"."{field}" AS "{field}"' for field in Product.STATE_FIELDS
+        )
+        loads = [
+            query
+            for query in queries.captured_queries
+            if f'SELECT {state_columns} FROM' not in query['sql']
+        ]
+        self.assertEqual(count_selects(loads, Product._meta.db_table), 1)
+        return response
+
+    def test_edit_get_loads_product_once(self):
+        self.client.force_login(self.owner)
+        url = reverse('catalog:edit_product', kwargs={'product_id': self.product.pk})
+        response = self.assertProductLoadedOnce(self.client.get, url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_edit_post_loads_product_once(self):
+        self.client.force_login(self.owner)
+        url = reverse('catalog:edit_product', kwargs={'product_id': self.product.pk})
+        data = {
+            'name': 'Новое имя',
+            'description': 'Описание',
+            'price': '150',
+            'category': self.category.pk,
+        }
+        response = self.assertProductLoadedOnce(self.client.post, url, data)
+        self.assertEqual(response.status_code, 302)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, 'Новое имя')
+
+    def test_edit_by_non_owner_is_forbidden(self):
+        self.client.force_login(self.other)
+        url = reverse('catalog:edit_product', kwargs={'product_id': self.product.pk})
+        response = self.assertProductLoadedOnce(self.client.get, url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_delete_get_by_moderator_loads_product_once(self):
+        self.client.force_login(self.moderator)
+        url = reverse('catalog:delete_product', kwargs={'product_id': self.product.pk})
+        response = self.assertProductLoadedOnce(self.client.get, url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_post_loads_product_once(self):
+        self.client.force_login(self.owner)
+        url = reverse('catalog:delete_product', kwargs={'product_id': self.product.pk})
+        response = self.assertProductLoadedOnce(self.client.post, url, {})
+        self.assertRedirects(response, reverse('catalog:index'), fetch_redirect_response=False)
+        self.assertFalse(Product.objects.filter(pk=self.product.pk).exists())
+
+    def test_missing_product_returns_404(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('catalog:edit_product', kwargs={'product_id': 999999}))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductDetailCacheTests(TestCase):
+    """Страница товара: 304 по ETag и фрагмент, закэшированный по уровню доступа"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Плагины')
+        cls.product = Product.objects.create(
+            name='Плагин', description='Описание', price=100, category=cls.category,
+            owner=cls.owner, publish='published',
+        )
+        cls.url = reverse('catalog:product_detail', kwargs={'product_id': cls.product.pk})
+        cls.edit_url = reverse('catalog:edit_product', kwargs={'product_id': cls.product.pk})
+
+    def setUp(self):
+        cache.clear()
+
+    def fragment_key(self, tier):
+        namespace = category_namespace(self.category.pk)
+        version = get_namespace_versions(namespace)[namespace]
+        return make_template_fragment_key(
+            'product_detail', [self.product.pk, self.product.updated_at.timestamp(), tier, version]
+        )
+
+    def test_repeated_visit_gets_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_category_navigation_change_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        # Новая категория появляется в навигации в шапке страницы
+        Category.objects.create(name='Темы')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_fragment_is_cached_per_access_tier(self):
+        response = self.client.get(self.url)
+        self.assertNotContains(response, self.edit_url)
+        self.assertIsNotNone(cache.get(self.fragment_key('anonymous')))
+        self.assertIsNone(cache.get(self.fragment_key('owner')))
+
+        # Владелец не получает фрагмент гостя и видит кнопку редактирования
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+        self.assertContains(response, self.edit_url)
+        self.assertIsNotNone(cache.get(self.fragment_key('owner')))
+
+
+class KeysetPaginationTests(TestCase):
+    """Курсорная пагинация: переходы вперед и назад по ключу (created_at, id)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        category = Category.objects.create(name='Плагины')
+        for number in range(7):
+            Product.objects.create(
+                name=f'Товар {number}', description='Описание', price=100, category=category,
+                owner=owner, publish='published',
+            )
+        # Одинаковое время создания у нескольких товаров: порядок определяет id
+        Product.objects.filter(name__in=['Товар 2', 'Товар 3', 'Товар 4']).update(
+            created_at=Product.objects.get(name='Товар 3').created_at
+        )
+        cls.expected = list(Product.objects.order_by('-created_at', '-id'))
+
+    def test_forward_and_backward(self):
+        paginator = KeysetPaginator(Product.objects.all(), 3)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([product for page in pages for product in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+        previous = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[1]))
+        previous = paginator.page(previous.previous_cursor)
+        self.assertEqual(list(previous), list(pages[0]))
+        self.assertFalse(previous.has_previous())
+
+    def test_api_rejects_bad_cursor(self):
+        response = self.client.get(reverse('catalog:product_list_api'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+    def test_api_pages_follow_cursor(self):
+        url = reverse('catalog:product_list_api')
+        first = self.client.get(url, {'limit': 4}).json()
+        second = self.client.get(url, {'limit': 4, 'cursor': first['next_cursor']}).json()
+        names = [item['name'] for item in first['results'] + second['results']]
+        self.assertEqual(names, [product.name for product in self.expected])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_html_view_falls_back_to_first_page_on_bad_cursor(self):
+        with self.settings(CATALOG_PAGINATION_MODE='keyset'):
+            response = self.client.get(reverse('catalog:index'), {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['products']), self.expected[:6])
+
+
+class ProductIndexTests(TestCase):
+    """Составные индексы товаров соответствуют запросам каталога"""
+
+    INDEXES = ('product_published_date_idx', 'product_cat_pub_date_idx', 'product_owner_unpub_idx')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Плагины')
+        for publish in ('published', 'published', 'pending'):
+            Product.objects.create(
+                name='Плагин', description='Описание', price=100, category=cls.category,
+                owner=cls.owner, publish=publish,
+            )
+
+    def get_index_names(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, Product._meta.db_table))
+
+    def test_indexes_are_created(self):
+        self.assertTrue(set(self.INDEXES) <= self.get_index_names())
+
+    def test_listing_queries_use_indexes(self):
+        # Индекс счетчика неопубликованных на маленькой таблице планировщик может
+        # заменить индексом внешнего ключа, поэтому проверяются только списки
+        queries = {
+            'product_published_date_idx': CatalogQueryService.get_products()[:6],
+            'product_cat_pub_date_idx': CatalogQueryService.get_products(
+                category_id=self.category.pk
+            )[:12],
+        }
+        for index, queryset in queries.items():
+            with self.subTest(index=index):
+                self.assertIn(index, queryset.explain())
+
+    def test_benchmark_rolls_back(self):
+        output = StringIO()
+        call_command(
+            'benchmark_catalog_indexes', '--products', '50', '--categories', '2', '--owners', '2',
+            '--repeat', '1', '--no-explain', stdout=output,
+        )
+        self.assertIn('IndexView', output.getvalue())
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertFalse(Category.objects.filter(name__startswith='bench-').exists())
+        self.assertTrue(set(self.INDEXES) <= self.get_index_names())
+
+
+class UnpublishedCounterTests(TestCase):
+    """Счетчик неопубликованных товаров владельца: сигналы и пересчет командой"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.other = User.objects.create_user(
+            username='other', email='other@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Плагины')
+
+    def assertCounters(self, owner, other):
+        counts = dict(User.objects.filter(pk__in=[self.owner.pk, self.other.pk]).values_list(
+            'pk', 'unpublished_products_count'
+        ))
+        self.assertEqual((counts[self.owner.pk], counts[self.other.pk]), (owner, other))
+
+    def test_counter_follows_product_changes(self):
+        product = Product.objects.create(
+            name='Плагин', description='Описание', price=100, category=self.category,
+            owner=self.owner, publish='pending',
+        )
+        self.assertCounters(1, 0)
+
+        product.publish = 'published'
+        product.save()
+        self.assertCounters(0, 0)
+
+        product.publish = 'unpublished'
+        product.save()
+        self.assertCounters(1, 0)
+
+        product.owner = self.other
+        product.save()
+        self.assertCounters(0, 1)
+
+        # Объект загружен заново: прежнее состояние читается из базы
+        product = Product.objects.get(pk=product.pk)
+        product.owner = self.owner
+        product.publish = 'published'
+        product.save()
+        self.assertCounters(0, 0)
+
+        product.publish = 'rejected'
+        product.save()
+        product.delete()
+        self.assertCounters(0, 0)
+
+    def test_stale_copies_do_not_adjust_counter_twice(self):
+        for name in ['Первый', 'Второй']:
+            Product.objects.create(
+                name=name, description='Описание', price=100, category=self.category,
+                owner=self.owner, publish='pending',
+            )
+        self.assertCounters(2, 0)
+
+        # Два запроса загрузили один и тот же товар до изменения статуса
+        first = Product.objects.get(name='Первый')
+        second = Product.objects.get(name='Первый')
+        first.publish = 'published'
+        first.save()
+        second.publish = 'published'
+        second.save()
+        self.assertCounters(1, 0)
+
+        # Устаревшая копия удаляется после публикации, затем удаляется повторно
+        second = Product.objects.get(name='Второй')
+        stale = Product.objects.get(name='Второй')
+        second.publish = 'published'
+        second.save()
+        stale.delete()
+        self.assertCounters(0, 0)
+        first.publish = 'pending'
+        first.save()
+        self.assertEqual(Product.objects.get(name='Первый').delete(), (1, {'catalog.Product': 1}))
+        self.assertEqual(first.delete(), (0, {}))
+        self.assertCounters(0, 0)
+
+    def test_rebuild_command(self):
+        Product.objects.create(
+            name='Плагин', description='Описание', price=100, category=self.category,
+            owner=self.owner, publish='pending',
+        )
+        User.objects.filter(pk__in=[self.owner.pk, self.other.pk]).update(
+            unpublished_products_count=5
+        )
+        call_command('rebuild_unpublished_counters', stdout=StringIO())
+        self.assertCounters(1, 0)
+
+
+class CatalogQueryServiceTests(TestCase):
+    """Выборки каталога: правила видимости, проекция списков и cache-aside"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Плагины')
+        cls.published = Product.objects.create(
+            name='Плагин', description='Описание', price=100, category=cls.category,
+            owner=cls.owner, publish='published',
+        )
+        cls.draft = Product.objects.create(
+            name='Черновик', description='Описание', price=100, category=cls.category,
+            owner=cls.owner, publish='pending',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_visibility(self):
+        self.assertEqual(list(CatalogQueryService.get_products()), [self.published])
+        self.assertEqual(
+            list(CatalogQueryService.get_products(user=self.owner, show_unpublished=True)),
+            [self.draft, self.published],
+        )
+
+    def test_list_projection_defers_description(self):
+        product = CatalogQueryService.get_products().get()
+        self.assertIn('description', product.get_deferred_fields())
+
+    def test_cached_products_are_read_without_queries(self):
+        cache_key = make_versioned_key('products_test', 'published')
+        with self.assertNumQueries(1):
+            products = CatalogQueryService.get_products(cache_key=cache_key, limit=10)
+        self.assertEqual(products, [self.published])
+
+        with self.assertNumQueries(0):
+            products = CatalogQueryService.get_products(cache_key=cache_key, limit=10)
+        self.assertEqual(products, [self.published])
+
+
+class CatalogCacheInvalidationTests(TestCase):
+    """Версии кэша каталога увеличиваются и при изменении товара, и после фиксации транзакции"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Плагины')
+        cls.product = Product.objects.create(
+            name='Плагин', description='Описание', price=100, category=cls.category,
+            owner=cls.owner, publish='published',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_versions_are_bumped_again_after_commit(self):
+        before = make_versioned_key('index_page', 'published', 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Новое имя'
+            self.product.save()
+            # Ключ, под которым параллельный запрос мог закэшировать строки до фиксации
+            during = make_versioned_key('index_page', 'published', 1)
+        after = make_versioned_key('index_page', 'published', 1)
+        self.assertNotEqual(before, during)
+        self.assertNotEqual(during, after)
+
+    def test_listing_pages_are_shared_between_users(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='pass'
+        )
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('catalog:index'))
+        self.assertEqual(list(response.context['products']), [self.product])
+
+        # Без фильтра неопубликованных все пользователи видят одну и ту же страницу
+        self.client.force_login(other)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('catalog:index'))
+        self.assertEqual(count_selects(queries.captured_queries, Product._meta.db_table), 0)
+        self.assertEqual(list(response.context['products']), [self.product])
+
+        # В кэше — количество и товары страницы, а не QuerySet всего каталога
+        self.assertEqual(
+            cache.get(make_versioned_key('index_page', 'published', 1)), (1, [self.product])
+        )
+
+    def test_own_unpublished_page_is_per_user(self):
+        draft = Product.objects.create(
+            name='Черновик', description='Описание', price=100, category=self.category,
+            owner=self.owner, publish='pending',
+        )
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('catalog:index'), {'show_unpublished': 'true'})
+        self.assertIn(draft, response.context['products'])
+
+        self.client.force_login(
+            User.objects.create_user(username='other', email='other@example.com', password='pass')
+        )
+        response = self.client.get(reverse('catalog:index'), {'show_unpublished': 'true'})
+        self.assertNotIn(draft, response.context['products'])
+
+
+class RelatedProductsTests(TestCase):
+    """Похожие товары читаются из предрасчитанного списка категории"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Плагины')
+        cls.other_category = Category.objects.create(name='Темы')
+        cls.products = [cls.create_product(f'Плагин {number}') for number in range(6)]
+        cls.draft = cls.create_product('Черновик', publish='pending')
+        # Новые сверху, как на странице товара
+        cls.products.reverse()
+
+    @classmethod
+    def create_product(cls, name, publish='published'):
+        return Product.objects.create(
+            name=name, description='Описание', price=100, category=cls.category,
+            owner=cls.owner, publish=publish,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def related(self, product):
+        return ProductService.get_related_products(product)
+
+    def test_newest_published_without_current_product(self):
+        self.assertEqual(self.related(self.products[0]), self.products[1:5])
+        self.assertEqual(self.related(self.products[5]), self.products[:4])
+
+    def test_cached_list_is_read_with_one_query(self):
+        self.related(self.products[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.related(self.products[1]), [self.products[0], *self.products[2:5]]
+            )
+
+    def test_list_follows_publish_edit_and_delete(self):
+        current = self.products[-1]
+        self.related(current)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.publish = 'published'
+            self.draft.save()
+        self.assertEqual(self.related(current)[0], self.draft)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.category = self.other_category
+            self.draft.save()
+        self.assertEqual(self.related(current), self.products[:4])
+        self.assertEqual(self.related(Product(category=self.other_category)), [self.draft])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].publish = 'unpublished'
+            self.products[0].save()
+        self.assertEqual(self.related(current), self.products[1:5])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[1].delete()
+        self.assertEqual(self.related(current), self.products[2:5])
+
+
+class CategoryNavigationTests(TestCase):
+    """Навигация по категориям: один агрегирующий запрос, кэш и инвалидация"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.plugins = Category.objects.create(name='Плагины')
+        cls.themes = Category.objects.create(name='Темы')
+        for publish in ('published', 'published', 'pending'):
+            Product.objects.create(
+                name='Плагин', description='Описание', price=100, category=cls.plugins,
+                owner=cls.owner, publish=publish,
+            )
+
+    def setUp(self):
+        cache.clear()
+        services._category_navigation_local.update(version=None, items=None)
+
+    def get_counts(self):
+        return [
+            (item['name'], item['published_count']) for item in CategoryService.get_navigation()
+        ]
+
+    def test_published_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_counts(), [('Плагины', 2), ('Темы', 0)])
+        with self.assertNumQueries(0):
+            self.assertEqual(CategoryService.get_category(self.themes.pk)['name'], 'Темы')
+
+        # Другой процесс берет готовый список из общего кэша
+        services._category_navigation_local.update(version=None, items=None)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_counts(), [('Плагины', 2), ('Темы', 0)])
+
+    def test_invalidated_on_product_and_category_changes(self):
+        self.get_counts()
+        Product.objects.create(
+            name='Тема', description='Описание', price=100, category=self.themes,
+            owner=self.owner, publish='published',
+        )
+        self.assertEqual(self.get_counts(), [('Плагины', 2), ('Темы', 1)])
+
+        self.plugins.name = 'Расширения'
+        self.plugins.save()
+        self.assertEqual(self.get_counts(), [('Расширения', 2), ('Темы', 1)])
+
+    def test_header_and_category_page(self):
+        url = reverse('catalog:category_products', kwargs={'category_id': self.themes.pk})
+        response = self.client.get(reverse('catalog:contacts'))
+        self.assertContains(response, url)
+
+        response = self.client.get(url)
+        self.assertEqual(response.context['category']['name'], 'Темы')
+        response = self.client.get(
+            reverse('catalog:category_products', kwargs={'category_id': 999999})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductSearchTests(TestCase):
+    """Поисковый индекс товаров следует за изменениями и ранжирует совпадения"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Техника')
+        cls.laptop = cls.create_product('Ноутбук', 'Ноутбук для работы и учебы')
+        cls.bag = cls.create_product(
+            'Сумка', 'Сумка подходит под ноутбук, планшет и зарядные устройства'
+        )
+
+    @classmethod
+    def create_product(cls, name, description):
+        return Product.objects.create(
+            name=name, description=description, price=100, category=cls.category,
+            owner=cls.owner, publish='published',
+        )
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query))
+
+    def test_index_follows_insert_update_and_delete(self):
+        product = self.create_product('Кофемолка', 'Ручная')
+        self.assertEqual(self.search('кофемолка'), [product])
+        # Поиск по префиксу слова
+        self.assertEqual(self.search('кофемол'), [product])
+
+        product.name = 'Чайник'
+        product.save()
+        self.assertEqual(self.search('кофемолка'), [])
+        self.assertEqual(self.search('чайник'), [product])
+
+        product.delete()
+        self.assertEqual(self.search('чайник'), [])
+
+    def test_results_are_ranked(self):
+        results = self.search('ноутбук')
+        self.assertEqual(results, [self.laptop, self.bag])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search('ноутбук планшет'), [self.bag])
+        self.assertEqual(self.search('  '), [])
+
+    def test_operators_in_query_are_escaped(self):
+        self.assertEqual(self.search('-ноутбук "планшет*" ('), [self.bag])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_icontains_fallback_on_other_databases(self):
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], 'vendor', 'mysql'):
+            queryset = search_products(Product.objects.all(), 'планшет')
+            self.assertNotIn('search_rank', queryset.query.annotations)
+            self.assertEqual(list(queryset), [self.bag])
+
+    def test_search_api(self):
+        response = self.client.get(reverse('catalog:product_search_api'), {'q': 'ноутбук'})
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(
+            [result['id'] for result in data['results']], [self.laptop.pk, self.bag.pk]
+        )
+
+        self.bag.publish = 'pending'
+        self.bag.save()
+        response = self.client.get(reverse('catalog:product_search'), {'q': 'ноутбук'})
+        self.assertEqual(list(response.context['products']), [self.laptop])
+
+
+class ProductApiTests(TestCase):
+    """JSON API каталога: правила видимости главной страницы, курсоры и потоковая выгрузка"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.plugins = Category.objects.create(name='Плагины')
+        cls.themes = Category.objects.create(name='Темы')
+        cls.published = [
+            Product.objects.create(
+                name=f'Плагин {number}',
+                description='Описание',
+                price=100,
+                category=cls.themes if number == 2 else cls.plugins,
+                owner=cls.owner,
+                publish='published',
+            )
+            for number in range(3)
+        ]
+        cls.draft = Product.objects.create(
+            name='Черновик', description='Описание', price=100, category=cls.plugins,
+            owner=cls.owner, publish='pending',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_ids(self, results):
+        return [result['id'] for result in results]
+
+    def test_list_pages_by_cursor(self):
+        url = reverse('catalog:product_list_api')
+        data = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual(
+            self.get_ids(data['results']), [self.published[2].pk, self.published[1].pk]
+        )
+        self.assertEqual(data['results'][0]['category'], 'Темы')
+
+        data = self.client.get(url, {'limit': 2, 'cursor': data['next_cursor']}).json()
+        self.assertEqual(self.get_ids(data['results']), [self.published[0].pk])
+        self.assertIsNone(data['next_cursor'])
+
+        response = self.client.get(url, {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_visibility_and_category(self):
+        url = reverse('catalog:product_list_api')
+        data = self.client.get(url, {'show_unpublished': 'true'}).json()
+        self.assertNotIn(self.draft.pk, self.get_ids(data['results']))
+
+        self.client.force_login(self.owner)
+        data = self.client.get(
+            url, {'show_unpublished': 'true', 'category': self.plugins.pk}
+        ).json()
+        self.assertEqual(
+            self.get_ids(data['results']),
+            [self.draft.pk, self.published[1].pk, self.published[0].pk],
+        )
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get(reverse('catalog:product_export_api'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [
+            json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(self.get_ids(rows), [product.pk for product in self.published])
+        self.assertEqual(rows[0]['name'], 'Плагин 0')
+
+    def test_categories_with_counts(self):
+        data = self.client.get(reverse('catalog:category_list_api')).json()
+        self.assertEqual(
+            [(item['name'], item['published_count']) for item in data['results']],
+            [('Плагины', 2), ('Темы', 1)],
+        )
+
+    def test_read_only(self):
+        response = self.client.post(reverse('catalog:product_list_api'))
+        self.assertEqual(response.status_code, 405)
+
+
+class ImportProductsTests(TestCase):
+    """Импорт товаров: проверка строк, NULL в bulk_create и COPY, продолжение с контрольной точки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Плагины')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_csv(self, rows):
+        path = os.path.join(self.directory, 'products.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=['name', 'description', 'price', 'category'])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def row(self, name, price='100', category='Плагины', description='Описание'):
+        return {'name': name, 'description': description, 'price': price, 'category': category}
+
+    def import_products(self, path, *args, stdout=None):
+        call_command(
+            'import_products', path, '--owner', 'owner', '--method', 'bulk', *args,
+            stdout=stdout or StringIO(),
+        )
+
+    def test_empty_description_is_null(self):
+        path = self.write_csv([self.row('Плагин', description='')])
+        self.import_products(path)
+        product = Product.objects.get()
+        self.assertIsNone(product.description)
+
+        # В строке COPY тот же NULL — пустое поле без кавычек, пустая строка — в кавычках
+        line = copy_csv_line(
+            [product.name, product.description, '', product.price, product.category_id]
+        )
+        self.assertEqual(line, f'"Плагин",,"",100.00,{self.category.pk}\n')
+        self.assertEqual(copy_csv_line(['say "hi"']), '"say ""hi"""\n')
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        path = self.write_csv([
+            self.row('Плагин'),
+            self.row('Казино онлайн'),
+            self.row('Без цены', price='abc'),
+            self.row('Нет категории', category='Неизвестная'),
+        ])
+        output = StringIO()
+        self.import_products(path, stdout=output)
+
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['Плагин'])
+        output = output.getvalue()
+        self.assertIn('Строка 2: ', output)
+        self.assertIn('запрещенное слово', output)
+        self.assertIn('Строка 3: ', output)
+        self.assertIn('Категория не найдена: Неизвестная', output)
+        self.assertIn('импортировано: 1, с ошибками: 3', output)
+
+    def test_resume_from_checkpoint(self):
+        path = self.write_csv([self.row(f'Товар {number}') for number in range(5)])
+        original_bulk_create = Product.objects.bulk_create
+        calls = []
+
+        def failing_bulk_create(products, **kwargs):
+            calls.append(len(products))
+            if len(calls) == 2:
+                raise RuntimeError('соединение потеряно')
+            return original_bulk_create(products, **kwargs)
+
+        with mock.patch.object(Product.objects, 'bulk_create', side_effect=failing_bulk_create):
+            with self.assertRaises(RuntimeError):
+                self.import_products(path, '--batch-size', '2')
+        # Первая пачка зафиксирована вместе с контрольной точкой, вторая — откатилась
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get(key=os.path.abspath(path)).rows, 2)
+
+        self.import_products(path, '--batch-size', '2', '--resume')
+        self.assertEqual(
+            sorted(Product.objects.values_list('name', flat=True)),
+            [f'Товар {number}' for number in range(5)],
+        )
+        self.assertFalse(ImportCheckpoint.objects.exists())
+        self.owner.refresh_from_db()
+        self.assertEqual(self.owner.unpublished_products_count, 5)
+
+    def test_checkpoint_of_changed_file_is_rejected(self):
+        path = self.write_csv([self.row('Плагин')])
+        ImportCheckpoint.objects.create(
+            key=os.path.abspath(path), source=os.path.abspath(path), size=1, rows=1
+        )
+        with self.assertRaisesMessage(CommandError, 'файл изменился'):
+            self.import_products(path, '--resume')
+
+    def test_non_object_json_rows_are_invalid(self):
+        path = os.path.join(self.directory, 'products.json')
+        rows = [
+            self.row('Плагин'),
+            ['Плагин', 100],
+            'Плагин',
+            42,
+        ]
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(rows, file)
+        output = StringIO()
+        self.import_products(path, stdout=output)
+
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(output.getvalue().count('Строка должна быть объектом'), 3)
+        self.assertIn('импортировано: 1, с ошибками: 3', output.getvalue())
+
+
+class ExportCatalogTests(TestCase):
+    """Выгрузка каталога: форматы, сжатие, диапазоны ключей и фильтр опубликованных"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Плагины')
+        cls.products = [
+            Product.objects.create(
+                name=f'Товар {number}', description='Описание', price=100, category=cls.category,
+                owner=cls.owner, publish='published' if number % 2 else 'pending',
+            )
+            for number in range(1, 6)
+        ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def export(self, *args):
+        output = StringIO()
+        call_command(
+            'export_catalog', '--tables', 'product', '--output-dir', self.directory, *args,
+            stdout=output,
+        )
+        return output.getvalue()
+
+    def read(self, name, opener=open):
+        with opener(os.path.join(self.directory, name), 'rt', encoding='utf-8', newline='') as file:
+            return file.read()
+
+    def test_ndjson_gzip_by_default(self):
+        output = self.export()
+        rows = [json.loads(line) for line in self.read('product.ndjson.gz', gzip.open).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [product.pk for product in self.products])
+        self.assertEqual(rows[0]['name'], 'Товар 1')
+        self.assertEqual(rows[0]['category_id'], self.category.pk)
+        self.assertIn('Выгружено строк: 5', output)
+
+    def test_csv_published_only(self):
+        self.export('--format', 'csv', '--compression', 'none', '--published-only')
+        header, *rows = list(csv.reader(StringIO(self.read('product.csv'))))
+        self.assertEqual(header, [field.attname for field in Product._meta.concrete_fields])
+        self.assertEqual(
+            [int(row[header.index('id')]) for row in rows],
+            [product.pk for product in self.products if product.publish == 'published'],
+        )
+        self.assertEqual({row[header.index('publish')] for row in rows}, {'published'})
+
+    def test_parts_cover_all_rows(self):
+        output = self.export('--parts', '2')
+        names = sorted(os.listdir(self.directory))
+        self.assertEqual(names, ['product.part001.ndjson.gz', 'product.part002.ndjson.gz'])
+        ids = []
+        for name in names:
+            ids.extend(json.loads(line)['id'] for line in self.read(name, gzip.open).splitlines())
+        self.assertEqual(ids, [product.pk for product in self.products])
+        self.assertIn('Выгружено строк: 5', output)
+
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            self.export('--parts', '0')
+
+
+class RenditionLookupTests(TestCase):
+    """Отсутствие копии изображения запоминается, чтобы не проверять хранилище на каждой карточке"""
+
+    def setUp(self):
+        renditions._rendition_lookups.clear()
+        self.storage = mock.Mock()
+        self.storage.exists.return_value = False
+
+    def test_missing_rendition_is_checked_once_per_ttl(self):
+        name = renditions.rendition_name('products/a.png', 'card', 1, 'webp')
+        self.assertFalse(renditions.rendition_exists(self.storage, name))
+        self.assertFalse(renditions.rendition_exists(self.storage, name))
+        self.assertEqual(self.storage.exists.call_count, 1)
+
+        # По истечении срока хранилище проверяется снова
+        with self.settings(RENDITION_MISS_TTL=0):
+            renditions._rendition_lookups.clear()
+            renditions.rendition_exists(self.storage, name)
+            self.storage.exists.return_value = True
+            self.assertTrue(renditions.rendition_exists(self.storage, name))
+        self.assertEqual(self.storage.exists.call_count, 3)
+
+    def test_saved_rendition_clears_cached_miss(self):
+        name = renditions.rendition_name('products/a.png', 'card', 1, 'webp')
+        renditions.rendition_exists(self.storage, name)
+        renditions.save_renditions(self.storage, 'products/a.png', [('card', 1, 'webp', b'data')])
+        self.assertTrue(renditions.rendition_exists(self.storage, name))
+
+    def test_lookup_cache_is_bounded(self):
+        names = [
+            renditions.rendition_name(f'products/{number}.png', 'card', 1, 'webp')
+            for number in range(3)
+        ]
+        with self.settings(RENDITION_LOOKUP_CACHE_SIZE=2):
+            for name in names:
+                renditions.rendition_exists(self.storage, name)
+            self.assertEqual(list(renditions._rendition_lookups), names[1:])
+
+            # Недавно проверенное имя не вытесняется
+            renditions.rendition_exists(self.storage, names[1])
+            renditions.rendition_exists(self.storage, names[0])
+            self.assertEqual(list(renditions._rendition_lookups), [names[1], names[0]])
+        self.assertEqual(self.storage.exists.call_count, 4)
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Загрузки сохраняются под хэшем содержимого, одинаковые файлы хранятся один раз"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.storage.location)
+            for root, _, names in os.walk(self.storage.location)
+            for name in names
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.storage.save('products/first.PNG', ContentFile(b'image data'))
+        second = self.storage.save('products/second.png', ContentFile(b'image data'))
+
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^products/([0-9a-f]{2})/\1[0-9a-f]{62}\.png$')
+        # Временная копия второй загрузки удалена
+        self.assertEqual(self.stored_files(), [os.path.normpath(first)])
+        with self.storage.open(first) as file:
+            self.assertEqual(file.read(), b'image data')
+
+    def test_different_content_gets_different_name(self):
+        first = self.storage.save('products/image.png', ContentFile(b'first'))
+        second = self.storage.save('products/image.png', ContentFile(b'second'))
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(self.stored_files()), 2)
+
+
+class ServeStaticTests(TestCase):
+    """Отдача собранной статики: gzip-копии и долгое кэширование файлов с хэшем"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        os.makedirs(os.path.join(directory.name, 'css'))
+        for name, content in [
+            ('css/style.css', b'body {}'),
+            ('css/style.3f1a2b4c5d6e.css', b'body {}'),
+            ('css/style.3f1a2b4c5d6e.css.gz', b'gzipped'),
+            ('css/style.9a8b7c6d5e4f.css', b'body {}'),
+        ]:
+            with open(os.path.join(directory.name, name), 'wb') as file:
+                file.write(content)
+        self.directory = directory.name
+        self.write_manifest({'css/style.css': 'css/style.3f1a2b4c5d6e.css'})
+
+        storages = {
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'catalog.staticfiles.CompressedManifestStaticFilesStorage'},
+        }
+        settings_override = self.settings(STATIC_ROOT=directory.name, STORAGES=storages)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.dict(staticfiles._manifest, mtime=None, names=frozenset())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def write_manifest(self, paths, mtime=None):
+        path = os.path.join(self.directory, 'staticfiles.json')
+        with open(path, 'w') as file:
+            json.dump({'paths': paths, 'version': '1.1'}, file)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def serve(self, path, **headers):
+        response = staticfiles.serve_static(self.factory.get(f'/static/{path}', **headers), path)
+        self.addCleanup(response.close)
+        return response
+
+    def test_gzip_copy_is_served_when_accepted(self):
+        response = self.serve('css/style.3f1a2b4c5d6e.css', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(b''.join(response.streaming_content), b'gzipped')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_original_is_served_without_gzip(self):
+        for accept_encoding in ['', 'br', 'gzip;q=0']:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.serve(
+                    'css/style.3f1a2b4c5d6e.css', HTTP_ACCEPT_ENCODING=accept_encoding
+                )
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(b''.join(response.streaming_content), b'body {}')
+
+    def test_immutable_cache_only_for_hashed_names(self):
+        response = self.serve('css/style.3f1a2b4c5d6e.css')
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE_CACHE_CONTROL)
+
+        response = self.serve('css/style.css')
+        self.assertEqual(response['Cache-Control'], staticfiles.DEFAULT_CACHE_CONTROL)
+
+    def test_manifest_is_reloaded_after_collectstatic(self):
+        response = self.serve('css/style.9a8b7c6d5e4f.css')
+        self.assertEqual(response['Cache-Control'], staticfiles.DEFAULT_CACHE_CONTROL)
+
+        self.write_manifest({'css/style.css': 'css/style.9a8b7c6d5e4f.css'}, mtime=time.time() + 60)
+        response = self.serve('css/style.9a8b7c6d5e4f.css')
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE_CACHE_CONTROL)
+
+
+class TrendingTests(TestCase):
+    """Уникальные просмотры и рейтинг «В тренде» без сортировки таблицы по счетчику"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        cls.category = Category.objects.create(name='Категория')
+        cls.other_category = Category.objects.create(name='Другая')
+        cls.popular = cls.create_product('Популярный', cls.category)
+        cls.quiet = cls.create_product('Тихий', cls.category)
+        cls.elsewhere = cls.create_product('В другой категории', cls.other_category)
+
+    @classmethod
+    def create_product(cls, name, category):
+        return Product.objects.create(
+            name=name, description='Описание', price=100, category=category,
+            owner=cls.owner, publish='published',
+        )
+
+    def setUp(self):
+        trending._local_store = None
+        cache.clear()
+
+    def test_hyperloglog_estimate(self):
+        sketch = trending.HyperLogLog()
+        for number in range(5000):
+            sketch.add(f'visitor-{number}')
+        self.assertAlmostEqual(sketch.count(), 5000, delta=5000 * 0.1)
+
+    def test_repeated_views_count_once(self):
+        for _ in range(3):
+            trending.record_view(
+                trending.PRODUCT, self.quiet.pk, 'u1', category_id=self.category.pk
+            )
+        self.assertEqual(trending.unique_visitors(trending.PRODUCT, self.quiet.pk), 1)
+
+    def test_trending_products_by_unique_visitors(self):
+        for visitor in ('u1', 'u2', 'u3'):
+            trending.record_view(
+                trending.PRODUCT, self.popular.pk, visitor, category_id=self.category.pk
+            )
+        trending.record_view(trending.PRODUCT, self.quiet.pk, 'u1', category_id=self.category.pk)
+        trending.record_view(
+            trending.PRODUCT, self.elsewhere.pk, 'u1', category_id=self.other_category.pk
+        )
+
+        self.assertEqual(
+            TrendingService.get_trending_products(category_id=self.category.pk),
+            [self.popular, self.quiet],
+        )
+        self.assertEqual(TrendingService.get_trending_products()[0], self.popular)
+
+    def test_detail_view_records_visit(self):
+        self.client.get(reverse('catalog:product_detail', kwargs={'product_id': self.popular.pk}))
+        self.assertEqual(trending.top_ids(trending.PRODUCT, 5, self.category.pk), [self.popular.pk])
+
+    def test_local_sketches_are_bounded(self):
+        store = trending.get_store()
+        with self.settings(TRENDING_LOCAL_MAX_SKETCHES=2):
+            for product in (self.popular, self.quiet, self.elsewhere):
+                trending.record_view(trending.PRODUCT, product.pk, 'u1')
+        self.assertEqual(
+            list(store.sketches),
+            [
+                (trending.PRODUCT, product.pk, trending.current_window())
+                for product in (self.quiet, self.elsewhere)
+            ],
+        )
+
+        # Скетчи прошедших окон удаляются при смене окна
+        with mock.patch.object(
+            trending, 'current_window', return_value=trending.current_window() + 2
+        ):
+            trending.record_view(trending.PRODUCT, self.popular.pk, 'u1')
+        self.assertEqual(len(store.sketches), 1)
@@ -0,0 +1,79 @@
+"""
+Предварительно вычисляемые фрагменты текста для карточек списков.
+
+Краткое описание товара и начало записи блога сохраняются в отдельных
+колонках при сохранении, поэтому списки не загружают полный текст и не
+обрезают его при каждом выводе шаблона.
+"""
+import math
+import re
+
+from django.db import transaction
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# Средняя скорость чтения, слов в минуту
+READING_SPEED_WPM = 180
+
+_WORD_RE = re.compile(r'\w+(?:[-\'’]\w+)*')
+
+
+def make_excerpt(text, words, max_length):
+    """
+    Начало текста не длиннее words слов и max_length символов (с многоточием).
+
+    :param text: исходный текст (может быть None)
+    :param words: максимальное количество слов
+    :param max_length: длина колонки, в которой хранится фрагмент
+    :return: str
+    """
+    if not text:
+        return ''
+    text = ' '.join(strip_tags(text).split())
+    return Truncator(Truncator(text).words(words)).chars(max_length)
+
+
+def count_words(text):
+    """Количество слов в тексте"""
+    return len(_WORD_RE.findall(strip_tags(text or '')))
+
+
+def reading_time_minutes(word_count):
+    """Время чтения в минутах (не меньше одной минуты для непустого текста)"""
+    if not word_count:
+        return 0
+    return max(1, math.ceil(word_count / READING_SPEED_WPM))
+
+
+def backfill_in_batches(queryset, refresh, fields, batch_size=1000):
+    """
+    Пересчитывает вычисляемые поля уже существующих строк порциями.
+
+    Используется командой backfill_excerpts и миграциями данных: строки
+    читаются через iterator(), записываются только изменившиеся (bulk_update
+    в отдельной транзакции на порцию).
+
+    :param queryset: выборка (достаточно pk, исходного текста и полей fields)
+    :param refresh: функция, пересчитывающая поля объекта
+    :param fields: имена пересчитываемых полей
+    :param batch_size: строк в одной пачке обновления
+    :return: количество обновленных строк
+    """
+    def write(batch):
+        with transaction.atomic():
+            queryset.model._default_manager.bulk_update(batch, fields)
+        return len(batch)
+
+    updated = 0
+    batch = []
+    for instance in queryset.order_by('pk').iterator(chunk_size=batch_size):
+        before = [getattr(instance, field) for field in fields]
+        refresh(instance)
+        if [getattr(instance, field) for field in fields] != before:
+            batch.append(instance)
+        if len(batch) >= batch_size:
+            updated += write(batch)
+            batch = []
+    if batch:
+        updated += write(batch)
+    return updated
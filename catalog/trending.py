@@ -0,0 +1,287 @@
+"""
+Популярные товары и записи блога: уникальные посетители и затухающий рейтинг.
+
+Для каждого товара и записи уникальные посетители за окно (по умолчанию
+сутки) оцениваются HyperLogLog-скетчем: в Redis — командами PFADD/PFCOUNT,
+без Redis — компактной структурой в памяти процесса (1 КБ на объект и окно).
+
+Первое посещение объекта посетителем в окне увеличивает его рейтинг в
+сортированном множестве (общем и по категории). Рейтинги периодически
+умножаются на коэффициент затухания с периодом полураспада
+TRENDING_HALF_LIFE_HOURS, поэтому новые всплески интереса быстро поднимают
+объект наверх, а старые постепенно забываются. Списки «в тренде» берутся
+из этих множеств (ZREVRANGE), а не сортировкой всей таблицы.
+
+Затухание рейтингов в Redis выполняет команда decay_trending (cron), а не
+просмотр страницы. Рейтинги в памяти процесса команде недоступны, поэтому
+там затухание применяется при учете просмотра раз в TRENDING_DECAY_INTERVAL;
+объем этой работы ограничен размером рейтингов и числом скетчей.
+"""
+import hashlib
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_redis_client
+
+PRODUCT = 'product'
+POST = 'post'
+
+# 2^10 регистров: стандартная погрешность оценки около 3%
+HLL_PRECISION = 10
+
+# Записи с рейтингом ниже порога удаляются при затухании
+MIN_SCORE = 0.01
+
+_lock = threading.Lock()
+_local_store = None
+
+
+def get_half_life():
+    """Период полураспада рейтинга, секунды"""
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24) * 3600
+
+
+def get_unique_window():
+    """Окно подсчета уникальных посетителей, секунды"""
+    return getattr(settings, 'TRENDING_UNIQUE_WINDOW', 24 * 3600)
+
+
+def get_decay_interval():
+    """Как часто применяется затухание рейтингов, секунды"""
+    return getattr(settings, 'TRENDING_DECAY_INTERVAL', 3600)
+
+
+def get_max_items():
+    """Сколько объектов хранится в одном рейтинге"""
+    return getattr(settings, 'TRENDING_MAX_ITEMS', 1000)
+
+
+def get_local_max_sketches():
+    """Сколько скетчей посетителей хранится в памяти процесса (1 КБ каждый)"""
+    return getattr(settings, 'TRENDING_LOCAL_MAX_SKETCHES', 10000)
+
+
+def current_window():
+    return int(time.time() // get_unique_window())
+
+
+def ranking_key(kind, category_id=None):
+    """Ключ сортированного множества рейтинга (общего или категории)"""
+    if category_id is None:
+        return f'trending:z:{kind}'
+    return f'trending:z:{kind}:category:{category_id}'
+
+
+def visitors_key(kind, object_id, window):
+    return f'trending:uv:{kind}:{object_id}:{window}'
+
+
+def visitor_id(request):
+    """
+    Идентификатор посетителя для подсчета уникальных просмотров:
+    пользователь, сессия или хэш адреса и браузера для гостей без сессии.
+    """
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    session_key = getattr(getattr(request, 'session', None), 'session_key', None)
+    if session_key:
+        return f's{session_key}'
+    raw = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return 'a' + hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+class HyperLogLog:
+    """Оценка количества различных значений в фиксированном объеме памяти"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+        """Добавляет значение; True, если оценка могла измениться (значение, вероятно, новое)"""
+        digest = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+        index = digest >> (64 - self.precision)
+        rest = digest & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        harmonic_sum = sum(2.0 ** -register for register in self.registers)
+        estimate = alpha * self.size * self.size / harmonic_sum
+        zeros = self.registers.count(0)
+        # Для малых значений точнее линейный подсчет по пустым регистрам
+        if estimate <= 2.5 * self.size and zeros:
+            return round(self.size * math.log(self.size / zeros))
+        return round(estimate)
+
+
+class RedisTrendingStore:
+    """Скетчи и рейтинги в Redis (общие для всех процессов приложения)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def add_visitor(self, kind, object_id, visitor, window):
+        key = cache.make_key(visitors_key(kind, object_id, window))
+        pipeline = self.client.pipeline()
+        pipeline.pfadd(key, visitor)
+        pipeline.expire(key, get_unique_window() * 2)
+        added, _ = pipeline.execute()
+        return bool(added)
+
+    def count_visitors(self, kind, object_id, window):
+        return self.client.pfcount(cache.make_key(visitors_key(kind, object_id, window)))
+
+    def increment(self, keys, object_id, amount):
+        pipeline = self.client.pipeline()
+        for key in keys:
+            pipeline.zincrby(cache.make_key(key), amount, object_id)
+        pipeline.execute()
+
+    def top(self, key, limit):
+        return [int(member) for member in self.client.zrevrange(cache.make_key(key), 0, limit - 1)]
+
+    def decay(self, force=False):
+        # Затухание выполняет один процесс за интервал
+        lock_key = cache.make_key('trending:decay_lock')
+        if not self.client.set(lock_key, 1, nx=True, ex=get_decay_interval()) and not force:
+            return
+        last_key = cache.make_key('trending:decayed_at')
+        now = time.time()
+        last = float(self.client.get(last_key) or now)
+        self.client.set(last_key, now)
+        factor = 0.5 ** ((now - last) / get_half_life())
+
+        for key in self.client.scan_iter(match=cache.make_key('trending:z:*')):
+            pipeline = self.client.pipeline()
+            if factor < 1:
+                pipeline.zunionstore(key, {key: factor})
+            pipeline.zremrangebyscore(key, '-inf', MIN_SCORE)
+            pipeline.zremrangebyrank(key, 0, -(get_max_items() + 1))
+            pipeline.execute()
+
+
+class LocalTrendingStore:
+    """
+    Скетчи и рейтинги в памяти процесса (разработка и развертывания без Redis).
+
+    Скетчи прошедших окон удаляются при смене окна, а сверх
+    TRENDING_LOCAL_MAX_SKETCHES вытесняются давно не обновлявшиеся. В
+    рейтинге хранится не больше 2 × TRENDING_MAX_ITEMS объектов.
+    """
+
+    def __init__(self):
+        self.sketches = OrderedDict()
+        self.sketches_window = current_window()
+        self.rankings = defaultdict(dict)
+        self.decayed_at = time.time()
+
+    def add_visitor(self, kind, object_id, visitor, window):
+        with _lock:
+            if window != self.sketches_window:
+                self.sketches = OrderedDict(
+                    (key, sketch) for key, sketch in self.sketches.items() if key[2] >= window - 1
+                )
+                self.sketches_window = window
+
+            key = (kind, object_id, window)
+            sketch = self.sketches.get(key)
+            if sketch is None:
+                sketch = self.sketches[key] = HyperLogLog()
+                while len(self.sketches) > get_local_max_sketches():
+                    self.sketches.popitem(last=False)
+            else:
+                self.sketches.move_to_end(key)
+            return sketch.add(visitor)
+
+    def count_visitors(self, kind, object_id, window):
+        sketch = self.sketches.get((kind, object_id, window))
+        return sketch.count() if sketch else 0
+
+    def increment(self, keys, object_id, amount):
+        with _lock:
+            for key in keys:
+                ranking = self.rankings[key]
+                ranking[object_id] = ranking.get(object_id, 0) + amount
+                if len(ranking) > get_max_items() * 2:
+                    self.rankings[key] = self.trim(ranking)
+
+        if time.time() - self.decayed_at >= get_decay_interval():
+            self.decay()
+
+    @staticmethod
+    def trim(ranking):
+        return dict(heapq.nlargest(get_max_items(), ranking.items(), key=itemgetter(1)))
+
+    def top(self, key, limit):
+        ranking = self.rankings.get(key, {})
+        largest = heapq.nlargest(limit, ranking.items(), key=itemgetter(1))
+        return [object_id for object_id, _ in largest]
+
+    def decay(self, force=False):
+        now = time.time()
+        with _lock:
+            factor = 0.5 ** ((now - self.decayed_at) / get_half_life())
+            self.decayed_at = now
+            for key, ranking in self.rankings.items():
+                decayed = {
+                    object_id: score * factor
+                    for object_id, score in ranking.items()
+                    if score * factor >= MIN_SCORE
+                }
+                if len(decayed) > get_max_items():
+                    decayed = self.trim(decayed)
+                self.rankings[key] = decayed
+
+
+def get_store():
+    """Хранилище рейтингов: Redis, если кэш работает на нем, иначе память процесса"""
+    global _local_store
+    client = get_redis_client()
+    if client is not None:
+        return RedisTrendingStore(client)
+    if _local_store is None:
+        _local_store = LocalTrendingStore()
+    return _local_store
+
+
+def record_view(kind, object_id, visitor, category_id=None):
+    """
+    Учитывает просмотр объекта посетителем.
+
+    Рейтинг растет только при первом просмотре в окне, поэтому повторные
+    обновления страницы не накручивают популярность.
+    """
+    store = get_store()
+    if store.add_visitor(kind, object_id, visitor, current_window()):
+        keys = [ranking_key(kind)]
+        if category_id is not None:
+            keys.append(ranking_key(kind, category_id))
+        store.increment(keys, object_id, 1.0)
+
+
+def unique_visitors(kind, object_id):
+    """Оценка количества уникальных посетителей объекта в текущем окне"""
+    return get_store().count_visitors(kind, object_id, current_window())
+
+
+def top_ids(kind, limit, category_id=None):
+    """id объектов с наибольшим рейтингом (по убыванию)"""
+    return get_store().top(ranking_key(kind, category_id), limit)
+
+
+def decay_rankings():
+    """Принудительно применяет затухание (команда decay_trending)"""
+    get_store().decay(force=True)
@@ -12,4 +12,9 @@ urlpatterns = [
     path('product/<int:product_id>/delete/', views.DeleteProductView.as_view(), name='delete_product'),
     path('product/<int:product_id>/toggle-status/', views.toggle_product_status, name='toggle_product_status'),
     path("category/<int:category_id>/products/", views.CategoryProductsView.as_view(), name="category_products"),
+    path('search/', views.ProductSearchView.as_view(), name='product_search'),
+    path('api/search/', views.product_search_api, name='product_search_api'),
+    path('api/products/', views.product_list_api, name='product_list_api'),
+    path('api/products/export/', views.product_export_api, name='product_export_api'),
+    path('api/categories/', views.category_list_api, name='category_list_api'),
 ]
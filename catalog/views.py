@@ -1,36 +1,49 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
-from django.http import HttpRequest, HttpResponse, JsonResponse
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.urls import reverse_lazy
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.core.paginator import Paginator
+from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
 from django.contrib.auth.decorators import permission_required
-from django.views.decorators.http import require_POST
-from .models import Product, ContactInfo, Category
+from django.views.decorators.http import condition, require_GET, require_POST
+from .models import Product, ContactInfo
 from .forms import ProductForm
-import re
-from django.views.decorators.cache import cache_page
+import hashlib
+import json
 from django.utils.decorators import method_decorator
-from django.core.cache import cache
-from catalog.services import CategoryService
-
-class OwnerOrModeratorRequiredMixin(UserPassesTestMixin):
+from django.utils.functional import SimpleLazyObject
+from catalog.services import CatalogQueryService, CategoryService, ProductService, TrendingService
+from catalog.cache import (
+    GLOBAL_NAMESPACE,
+    PRODUCT_DETAIL_CACHE_TIMEOUT,
+    category_namespace,
+    get_namespace_versions,
+    make_versioned_key,
+)
+from catalog.mixins import CachedPageMixin, RequestObjectCacheMixin
+from catalog.pagination import InvalidCursor, KeysetPaginationMixin, KeysetPaginator
+from catalog.search import search_products
+from catalog import trending
+
+class OwnerOrModeratorRequiredMixin(RequestObjectCacheMixin, UserPassesTestMixin):
     """
     Миксин для проверки, что пользователь является владельцем продукта или модератором.
     Модератор определяется наличием права 'catalog.can_unpublish_product'.
+    Продукт загружается через get_object() и переиспользуется представлением.
     """
     
     def test_func(self):
         if not self.request.user.is_authenticated:
             return False
             
-        # Получаем продукт
-        product = get_object_or_404(Product, pk=self.kwargs.get('product_id'))
+        # Получаем продукт (результат кэшируется на время запроса)
+        product = self.get_object()
         
         # Проверяем, является ли пользователь владельцем
-        is_owner = product.owner == self.request.user
+        is_owner = product.owner_id == self.request.user.pk
         
         # Проверяем, является ли пользователь модератором
         is_moderator = self.request.user.has_perm('catalog.can_unpublish_product')
@@ -45,21 +58,22 @@ class OwnerOrModeratorRequiredMixin(UserPassesTestMixin):
             raise PermissionDenied("У вас нет прав для выполнения этого действия.")
 
 
-class OwnerRequiredMixin(UserPassesTestMixin):
+class OwnerRequiredMixin(RequestObjectCacheMixin, UserPassesTestMixin):
     """
     Миксин для проверки, что пользователь является владельцем продукта.
     Только для редактирования.
+    Продукт загружается через get_object() и переиспользуется представлением.
     """
     
     def test_func(self):
         if not self.request.user.is_authenticated:
             return False
             
-        # Получаем продукт
-        product = get_object_or_404(Product, pk=self.kwargs.get('product_id'))
+        # Получаем продукт (результат кэшируется на время запроса)
+        product = self.get_object()
         
         # Проверяем, является ли пользователь владельцем
-        return product.owner == self.request.user
+        return product.owner_id == self.request.user.pk
 
     def handle_no_permission(self):
         """Переопределяем обработку отказа в доступе"""
@@ -69,7 +83,7 @@ class OwnerRequiredMixin(UserPassesTestMixin):
             raise PermissionDenied("Только владелец может редактировать этот товар.")
 
 
-class IndexView(ListView):
+class IndexView(CachedPageMixin, KeysetPaginationMixin, ListView):
     """Главная страница каталога с пагинацией и фильтром неопубликованных товаров"""
 
     model = Product
@@ -77,37 +91,34 @@ class IndexView(ListView):
     context_object_name = 'products'
     paginate_by = 6
     ordering = ['-created_at']
+    keyset_with_total = True
 
     def get_queryset(self):
         user = self.request.user
         show_unpublished = self.request.GET.get('show_unpublished', 'false').lower() == 'true'
 
-        # Уникальный ключ кэша учитывает пользователя и фильтр
-        cache_key = f"index_queryset_{user.id if user.is_authenticated else 'anon'}_{show_unpublished}"
-        queryset = cache.get(cache_key)
-
-        if not queryset:
-            queryset = Product.objects.select_related('category')
-
-            if show_unpublished:
-                if user.is_authenticated:
-                    if user.has_perm('catalog.can_unpublish_product'):
-                        # Модератор видит все неопубликованные товары
-                        queryset = queryset.filter(publish__in=['pending','rejected','unpublished'])
-                    else:
-                        # Обычные пользователи видят свои неопубликованные + опубликованные
-                        queryset = queryset.filter(publish='published') | queryset.filter(owner=user).exclude(publish='published')
-                else:
-                    # Гости видят только опубликованные
-                    queryset = queryset.filter(publish='published')
-            else:
-                # Фильтр выключен — показываем только опубликованные
-                queryset = queryset.filter(publish='published')
+        # Модератору в карточках выводится владелец товара
+        select_related = (
+            ('category', 'owner')
+            if user.has_perm('catalog.can_unpublish_product')
+            else ('category',)
+        )
 
-            queryset = queryset.order_by('-created_at')
-            cache.set(cache_key, queryset, 60 * 15)
+        return CatalogQueryService.get_products(
+            user, show_unpublished, select_related=select_related
+        )
 
-        return queryset
+    def get_page_cache_key(self, page_number):
+        """Ключ страницы: уровень видимости (общий для всех, кто видит одно и то же)
+        и версия каталога. В курсорном режиме страницы выбираются по индексу и не кэшируются"""
+        if self.uses_keyset_pagination():
+            return None
+        show_unpublished = self.request.GET.get('show_unpublished', 'false').lower() == 'true'
+        return make_versioned_key(
+            'index_page',
+            CatalogQueryService.get_visibility_tier(self.request.user, show_unpublished),
+            page_number,
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -117,23 +128,77 @@ class IndexView(ListView):
         context.update({
             'title': 'Главная страница - Skystore',
             'description': 'Добро пожаловать в наш каталог товаров!',
+            'trending_products': SimpleLazyObject(TrendingService.get_trending_products),
             'show_unpublished': show_unpublished,
             'can_view_unpublished': user.has_perm('catalog.can_unpublish_product'),
             'can_view_own_unpublished': user.is_authenticated,
         })
 
-        # Количество неопубликованных товаров для текущего пользователя
+        # Количество неопубликованных товаров: денормализованный счетчик, без запроса COUNT
         if user.is_authenticated:
-            context['user_unpublished_count'] = Product.objects.filter(owner=user).exclude(publish='published').count()
+            context['user_unpublished_count'] = user.unpublished_products_count
         else:
             context['user_unpublished_count'] = 0
 
         return context
 
 
-@method_decorator(cache_page(60 * 15), name='dispatch')
+def get_product_access_tier(user, owner_id):
+    """
+    Уровень доступа пользователя к странице товара.
+
+    Страница товара отличается только флагами прав (can_edit, can_delete,
+    is_moderator), поэтому ее содержимое можно кэшировать по уровню доступа,
+    а не по пользователю. Модератор, который одновременно владелец товара,
+    выделен в отдельный уровень: ему доступно и редактирование, и модерация.
+    """
+    if not user.is_authenticated:
+        return 'anonymous'
+    is_owner = user.pk == owner_id
+    if user.has_perm('catalog.can_unpublish_product'):
+        return 'moderator_owner' if is_owner else 'moderator'
+    return 'owner' if is_owner else 'authenticated'
+
+
+def _get_product_detail_meta(request, product_id):
+    """Легкий запрос метаданных товара для условного GET (один раз за запрос)"""
+    if not hasattr(request, '_product_detail_meta'):
+        meta = (
+            Product.objects.filter(pk=product_id)
+            .values('owner_id', 'category_id', 'updated_at')
+            .first()
+        )
+        if meta:
+            meta['tier'] = get_product_access_tier(request.user, meta['owner_id'])
+            namespace = category_namespace(meta['category_id'])
+            versions = get_namespace_versions(GLOBAL_NAMESPACE, namespace)
+            meta['category_version'] = versions[namespace]
+            # Навигация по категориям в шапке зависит от всего каталога
+            meta['catalog_version'] = versions[GLOBAL_NAMESPACE]
+        request._product_detail_meta = meta
+    return request._product_detail_meta
+
+
+def _product_detail_etag(request, product_id):
+    meta = _get_product_detail_meta(request, product_id)
+    if meta is None:
+        return None
+    # В ETag входит пользователь: в шапке страницы выводится его имя
+    raw = (
+        f"{product_id}:{meta['updated_at'].isoformat()}:{meta['tier']}:"
+        f"{request.user.pk or ''}:{meta['category_version']}:{meta['catalog_version']}"
+    )
+    return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+# Last-Modified не отправляется: дата изменения товара не учитывает ни уровень доступа,
+# ни навигацию в шапке, и If-Modified-Since давал бы 304 для устаревшей страницы
+@method_decorator(condition(etag_func=_product_detail_etag), name='dispatch')
 class ProductDetailView(DetailView):
-    """Class-based view для отображения детальной информации о товаре"""
+    """Class-based view для отображения детальной информации о товаре.
+
+    Повторные посещения получают 304 по ETag без рендеринга, а основная
+    часть страницы кэшируется фрагментом с учетом уровня доступа пользователя."""
 
     model = Product
     template_name = 'catalog/product_detail.html'
@@ -141,7 +206,9 @@ class ProductDetailView(DetailView):
     pk_url_kwarg = 'product_id'
 
     def get_queryset(self):
-        return Product.objects.select_related('category')
+        return CatalogQueryService.apply_projection(
+            Product.objects.all(), CatalogQueryService.DETAIL, select_related=('category',)
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -149,24 +216,34 @@ class ProductDetailView(DetailView):
 
         context['title'] = f'{product.name} - Skystore'
 
-        # Получаем связанные товары из той же категории (исключая текущий)
-        related_products = Product.objects.filter(
-            category=product.category,
-            publish='published'  # Показываем только опубликованные в похожих товарах
-        ).exclude(
-            id=product.pk
-        ).order_by('-created_at')[:4]
+        # Уникальные посетители и рейтинг «В тренде» (общий и категории)
+        if product.publish == 'published':
+            trending.record_view(
+                trending.PRODUCT, product.pk, trending.visitor_id(self.request),
+                category_id=product.category_id,
+            )
 
-        context['related_products'] = related_products
+        # Похожие товары из предрасчитанного списка категории. Объект ленивый:
+        # запрос не выполняется, если фрагмент страницы взят из кэша
+        context['related_products'] = SimpleLazyObject(
+            lambda: ProductService.get_related_products(product)
+        )
 
         # Добавляем информацию о правах пользователя
         user = self.request.user
         context['can_view_unpublished'] = user.has_perm('catalog.can_unpublish_product')
-        context['is_owner'] = user.is_authenticated and product.owner == user
+        context['is_owner'] = user.is_authenticated and product.owner_id == user.pk
         context['is_moderator'] = user.has_perm('catalog.can_unpublish_product')
-        context['can_edit'] = user.is_authenticated and product.owner == user
-        context['can_delete'] = (user.is_authenticated and product.owner == user) or user.has_perm(
-            'catalog.can_unpublish_product')
+        context['can_edit'] = user.is_authenticated and product.owner_id == user.pk
+        context['can_delete'] = (
+            user.is_authenticated and product.owner_id == user.pk
+        ) or user.has_perm('catalog.can_unpublish_product')
+
+        # Ключ фрагментного кэша: товар, его версия, уровень доступа и версия категории
+        meta = _get_product_detail_meta(self.request, product.pk)
+        context['detail_cache_timeout'] = PRODUCT_DETAIL_CACHE_TIMEOUT
+        context['access_tier'] = meta['tier']
+        context['category_version'] = meta['category_version']
 
         return context
 
@@ -254,6 +331,9 @@ class EditProductView(LoginRequiredMixin, OwnerRequiredMixin, UpdateView):
     template_name = 'catalog/add_product.html'
     pk_url_kwarg = 'product_id'
 
+    def get_queryset(self):
+        return Product.objects.select_related('category', 'owner')
+
     def get_form_kwargs(self):
         """Передаем пользователя в форму"""
         kwargs = super().get_form_kwargs()
@@ -296,6 +376,9 @@ class DeleteProductView(LoginRequiredMixin, OwnerOrModeratorRequiredMixin, Delet
     template_name = 'catalog/delete_product.html'
     pk_url_kwarg = 'product_id'
     success_url = reverse_lazy('catalog:index')
+
+    def get_queryset(self):
+        return Product.objects.select_related('category', 'owner')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -305,13 +388,15 @@ class DeleteProductView(LoginRequiredMixin, OwnerOrModeratorRequiredMixin, Delet
         })
         return context
     
-    def delete(self, request, *args, **kwargs):
-        product_name = self.get_object().name
+    def form_valid(self, form):
+        # DeleteView обрабатывает POST через form_valid; объект уже загружен в post()
+        product_name = self.object.name
+        response = super().form_valid(form)
         messages.success(
             self.request, 
             f'Товар "{product_name}" успешно удален!'
         )
-        return super().delete(request, *args, **kwargs)
+        return response
 
 
 class ContactsView(TemplateView):
@@ -385,8 +470,7 @@ class ContactsView(TemplateView):
         return self.get(request, *args, **kwargs)
 
 
-@method_decorator(cache_page(60 * 5), name='dispatch')  # кэшируем на 5 минут
-class CategoryProductsView(ListView):
+class CategoryProductsView(CachedPageMixin, KeysetPaginationMixin, ListView):
     template_name = "catalog/category_products.html"
     context_object_name = "products"
     paginate_by = 12
@@ -396,42 +480,184 @@ class CategoryProductsView(ListView):
         user = self.request.user
         show_unpublished = self.request.GET.get('show_unpublished', 'false').lower() == 'true'
 
-        # Уникальный ключ кэша для пользователя, категории и фильтра
-        cache_key = f"category_{category_id}_products_{user.id if user.is_authenticated else 'anon'}_{show_unpublished}"
-        queryset = cache.get(cache_key)
-
-        if not queryset:
-            queryset = Product.objects.filter(category_id=category_id).select_related('category')
-
-            if show_unpublished:
-                if user.is_authenticated:
-                    if user.has_perm('catalog.can_unpublish_product'):
-                        # Модератор видит все неопубликованные товары
-                        queryset = queryset.filter(publish__in=['pending','rejected','unpublished'])
-                    else:
-                        # Обычные пользователи видят свои неопубликованные + опубликованные
-                        queryset = queryset.filter(publish='published') | queryset.filter(owner=user).exclude(publish='published')
-                else:
-                    # Гости видят только опубликованные
-                    queryset = queryset.filter(publish='published')
-            else:
-                # Фильтр выключен — показываем только опубликованные
-                queryset = queryset.filter(publish='published')
-
-            queryset = queryset.order_by('-created_at')
-            cache.set(cache_key, queryset, 60 * 5)
+        # Название категории выводится в заголовке страницы, в карточках оно не нужно
+        return CatalogQueryService.get_products(
+            user, show_unpublished, category_id=category_id, select_related=()
+        )
 
-        return queryset
+    def get_page_cache_key(self, page_number):
+        """Ключ страницы: категория, уровень видимости и версия категории"""
+        if self.uses_keyset_pagination():
+            return None
+        category_id = self.kwargs['category_id']
+        show_unpublished = self.request.GET.get('show_unpublished', 'false').lower() == 'true'
+        return make_versioned_key(
+            f'category_{category_id}_page',
+            CatalogQueryService.get_visibility_tier(self.request.user, show_unpublished),
+            page_number,
+            namespaces=(category_namespace(category_id),),
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category_id = self.kwargs['category_id']
-        category = Category.objects.get(id=category_id)
+        # Данные категории берутся из закэшированной навигации, без запроса к базе
+        category = CategoryService.get_category(self.kwargs['category_id'])
+        if category is None:
+            raise Http404('Категория не найдена')
         context['category'] = category
+        context['trending_products'] = SimpleLazyObject(
+            lambda: TrendingService.get_trending_products(category_id=category['id'])
+        )
 
         user = self.request.user
         show_unpublished = self.request.GET.get('show_unpublished', 'false').lower() == 'true'
         context['show_unpublished'] = show_unpublished
         context['can_view_unpublished'] = user.has_perm('catalog.can_unpublish_product')
 
-        return context
\ No newline at end of file
+        return context
+
+
+class ProductSearchView(ListView):
+    """Полнотекстовый поиск по товарам с сортировкой по релевантности"""
+
+    template_name = 'catalog/search.html'
+    context_object_name = 'products'
+    paginate_by = 12
+
+    def get_search_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self):
+        show_unpublished = self.request.GET.get('show_unpublished', 'false').lower() == 'true'
+        queryset = CatalogQueryService.get_products(self.request.user, show_unpublished)
+        return search_products(queryset, self.get_search_query())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.get_search_query()
+        context.update({
+            'title': f'Поиск: {query} - Skystore' if query else 'Поиск - Skystore',
+            'query': query,
+        })
+        return context
+
+
+def product_search_api(request):
+    """JSON-эндпоинт поиска товаров: ?q=<запрос>&page=<номер>"""
+    query = request.GET.get('q', '').strip()
+    show_unpublished = request.GET.get('show_unpublished', 'false').lower() == 'true'
+
+    queryset = CatalogQueryService.get_products(request.user, show_unpublished)
+    paginator = Paginator(search_products(queryset, query), ProductSearchView.paginate_by)
+    page = paginator.get_page(request.GET.get('page'))
+
+    return JsonResponse({
+        'query': query,
+        'count': paginator.count,
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'has_next': page.has_next(),
+        'results': [
+            {
+                'id': product.pk,
+                'name': product.name,
+                'price': str(product.price),
+                'category': product.category.name,
+                'url': reverse('catalog:product_detail', kwargs={'product_id': product.pk}),
+                'rank': getattr(product, 'search_rank', None),
+            }
+            for product in page.object_list
+        ],
+    })
+
+
+# Размер страницы JSON API товаров (по умолчанию и максимальный)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+# Сколько строк читается из серверного курсора за одну порцию при выгрузке
+API_EXPORT_CHUNK_SIZE = 2000
+
+
+def _serialize_product(product):
+    """Представление товара в JSON API"""
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'description': product.description,
+        'price': str(product.price),
+        'image': product.image.url if product.image else None,
+        'publish': product.publish,
+        'category_id': product.category_id,
+        'category': product.category.name,
+        'owner_id': product.owner_id,
+        'created_at': product.created_at,
+        'updated_at': product.updated_at,
+        'url': reverse('catalog:product_detail', kwargs={'product_id': product.pk}),
+    }
+
+
+def _get_api_products(request):
+    """Товары для API: те же правила видимости, что и на главной странице"""
+    show_unpublished = request.GET.get('show_unpublished', 'false').lower() == 'true'
+    category_id = request.GET.get('category')
+    return CatalogQueryService.get_products(
+        request.user,
+        show_unpublished,
+        category_id=int(category_id) if category_id and category_id.isdigit() else None,
+        projection=CatalogQueryService.DETAIL,
+    )
+
+
+@require_GET
+def product_list_api(request):
+    """
+    JSON API товаров с курсорной пагинацией.
+
+    Параметры: cursor, limit (до API_MAX_PAGE_SIZE), category, show_unpublished.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = API_PAGE_SIZE
+
+    paginator = KeysetPaginator(_get_api_products(request), limit)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'results': [_serialize_product(product) for product in page.object_list],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+def product_export_api(request):
+    """
+    Полная выгрузка товаров в формате NDJSON (один JSON-объект на строку).
+
+    Строки читаются из серверного курсора порциями и сразу отправляются
+    клиенту, поэтому память не зависит от размера каталога.
+    """
+    queryset = _get_api_products(request).order_by('id')
+
+    def rows():
+        for product in queryset.iterator(chunk_size=API_EXPORT_CHUNK_SIZE):
+            yield json.dumps(
+                _serialize_product(product), cls=DjangoJSONEncoder, ensure_ascii=False
+            ) + '\n'
+
+    response = StreamingHttpResponse(rows(), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="products.ndjson"'
+    return response
+
+
+@require_GET
+def category_list_api(request):
+    """JSON API категорий с количеством опубликованных товаров (из кэша навигации)"""
+    return JsonResponse(
+        {'results': CategoryService.get_navigation()},
+        json_dumps_params={'ensure_ascii': False},
+    )
@@ -70,6 +70,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "catalog.context_processors.category_navigation",
             ],
         },
     },
@@ -134,6 +135,25 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# В продакшене collectstatic добавляет хэш содержимого к именам файлов и
+# сохраняет gzip-копии; при DEBUG статика берется из STATICFILES_DIRS как есть
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "catalog.staticfiles.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
+# Раздавать собранную статику самим приложением, когда DEBUG выключен
+# (для небольших развертываний без отдельного веб-сервера или CDN)
+SERVE_STATIC = os.environ.get("SERVE_STATIC", "true").lower() in ("true", "1", "yes", "on")
+
 # Media files (User uploaded content)
 # https://docs.djangoproject.com/en/5.2/topics/files/
 
@@ -149,6 +169,13 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Вход по email без учета регистра через индекс на lower(email)
+AUTHENTICATION_BACKENDS = ['users.backends.EmailBackend']
+
+# Уникальность email обеспечивает ограничение на lower(email), а не unique=True
+# у поля, поэтому проверка auth.W004 о неуникальном USERNAME_FIELD не применима
+SILENCED_SYSTEM_CHECKS = ['auth.W004']
+
 # Настройки для входа/выхода (опционально)
 LOGIN_URL = '/users/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -165,6 +192,24 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 
+# Очередь исходящих писем (users/outbox.py, команда send_outbox): размер пачки,
+# число попыток до статуса «Не доставлено» и задержка первой повторной попытки, секунды
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+
+# Адрес сайта для ссылок в письмах, которые отправляются вне запроса
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
+
+# Рассылка уведомлений о новых записях блога (blog/announcements.py, команда
+# announce_blog_posts): потоки отправки, ограничение писем в секунду (0 — без
+# ограничения) и количество адресов в одной порции
+BLOG_ANNOUNCEMENT_WORKERS = 4
+BLOG_ANNOUNCEMENT_RATE = 50
+BLOG_ANNOUNCEMENT_CHUNK_SIZE = 500
+# Рассылка без продвижения дольше этого времени (с) считается прерванной и продолжается
+BLOG_ANNOUNCEMENT_STALE_AFTER = 10 * 60
+
 
 # Настройки кэширования Redis
 CACHES = {
@@ -174,3 +219,44 @@ CACHES = {
     }
 }
 
+
+# Сессии хранятся в кэше (Redis), в базу копируются не чаще раза в
+# SESSION_DB_WRITE_INTERVAL секунд (см. users/sessions.py)
+SESSION_ENGINE = 'users.sessions'
+SESSION_DB_WRITE_INTERVAL = 60 * 5
+
+# Сообщения — в cookie; сессия используется только для вошедших пользователей,
+# поэтому гостям сессия не создается (см. users/message_storage.py)
+MESSAGE_STORAGE = 'users.message_storage.CookieFirstStorage'
+
+
+# Время жизни закэшированных списков каталога (инвалидация — через версии в catalog/cache.py)
+CATALOG_LISTING_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Режим пагинации списков товаров: 'offset' (номера страниц) или 'keyset' (курсоры)
+CATALOG_PAGINATION_MODE = 'offset'
+
+# Как часто накопленные просмотры записей блога переносятся в базу, секунды
+# (см. blog/counters.py и команду flush_blog_views)
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 60
+
+# Рейтинги «В тренде» и «Популярное» (см. catalog/trending.py и команду decay_trending):
+# период полураспада рейтинга, окно уникальных посетителей и интервал затухания
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_UNIQUE_WINDOW = 60 * 60 * 24
+TRENDING_DECAY_INTERVAL = 60 * 60
+# Сколько скетчей посетителей хранит процесс без Redis (1 КБ каждый)
+TRENDING_LOCAL_MAX_SKETCHES = 10000
+
+# Время жизни закэшированного фрагмента страницы товара
+CATALOG_PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 60
+
+# Уменьшенные копии изображений (catalog/renditions.py): генерация после сохранения
+# в том же запросе; True — в пуле процессов веб-процесса (задачи из очереди теряются
+# при перезапуске, недостающие копии создает команда generate_renditions)
+RENDITIONS_ASYNC = False
+RENDITION_WORKERS = 2
+# Сколько секунд не проверять повторно отсутствующую копию (до запуска generate_renditions)
+RENDITION_MISS_TTL = 60
+# Сколько результатов проверки наличия копий хранит каждый процесс
+RENDITION_LOOKUP_CACHE_SIZE = 10000
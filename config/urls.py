@@ -16,10 +16,12 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from catalog.staticfiles import serve_static
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("catalog.urls")),
@@ -30,4 +32,9 @@ urlpatterns = [
 # Добавляем обслуживание медиа-файлов в режиме разработки
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0])
\ No newline at end of file
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0])
+elif settings.SERVE_STATIC:
+    # Собранная статика (collectstatic) с gzip-копиями и долгим кэшированием
+    urlpatterns += [
+        re_path(r"^%s(?P<path>.*)$" % settings.STATIC_URL.lstrip("/"), serve_static),
+    ]
@@ -3,6 +3,10 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
 from django.utils.html import format_html
 
+from catalog.renditions import rendition_srcset, rendition_url
+from .models import OutboxEmail
+from .outbox import retry_failed
+
 User = get_user_model()
 
 
@@ -57,9 +61,12 @@ class CustomUserAdmin(UserAdmin):
     def avatar_preview(self, obj):
         """Превью аватара в списке пользователей"""
         if obj.avatar:
+            # Уменьшенная копия 32x32 (и 64x64 для экранов высокой плотности) вместо оригинала
             return format_html(
-                '<img src="{}" width="30" height="30" style="border-radius: 50%;" />',
-                obj.avatar.url
+                '<img src="{}" srcset="{}" sizes="30px" width="30" height="30" '
+                'style="border-radius: 50%;" />',
+                rendition_url(obj.avatar, 'avatar_thumb'),
+                rendition_srcset(obj.avatar, 'avatar_thumb'),
             )
         return "Нет аватара"
 
@@ -73,4 +80,32 @@ class CustomUserAdmin(UserAdmin):
         if not request.user.is_superuser:
             readonly_fields.extend(['is_superuser', 'user_permissions', 'groups'])
 
-        return readonly_fields
\ No newline at end of file
+        return readonly_fields
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Очередь писем: контроль доставки и повторная отправка недоставленных"""
+
+    list_display = [
+        'subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at',
+    ]
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject']
+    readonly_fields = [
+        'subject', 'body', 'html_body', 'from_email', 'to', 'status',
+        'attempts', 'next_attempt_at', 'last_error', 'created_at', 'sent_at',
+    ]
+    actions = ['retry_selected']
+
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+    recipients.short_description = 'Получатели'
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_selected(self, request, queryset):
+        count = retry_failed(queryset)
+        self.message_user(request, f'Возвращено в очередь писем: {count}')
+    retry_selected.short_description = 'Вернуть недоставленные письма в очередь'
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+User = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    Вход по email без учета регистра.
+
+    Пользователь ищется через уникальный индекс на lower(email)
+    (CustomUserManager.get_by_email), поэтому Foo@x.ru и foo@x.ru — один
+    аккаунт, а поиск — одно обращение к индексу.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        email = username if username is not None else kwargs.get(User.USERNAME_FIELD)
+        if email is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_email(email)
+        except User.DoesNotExist:
+            # Хэширование пароля выравнивает время ответа для существующих и несуществующих адресов
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -80,8 +80,8 @@ class CustomUserCreationForm(UserCreationForm):
         })
 
     def clean_email(self):
-        email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        email = User.objects.normalize_email(self.cleaned_data.get('email'))
+        if User.objects.email_exists(email):
             raise forms.ValidationError('Пользователь с таким email уже существует')
         return email
 
@@ -180,9 +180,9 @@ class UserProfileForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
     def clean_email(self):
-        email = self.cleaned_data.get('email')
-        # Проверяем, что email не занят другим пользователем
-        if User.objects.filter(email=email).exclude(pk=self.instance.pk).exists():
+        email = User.objects.normalize_email(self.cleaned_data.get('email'))
+        # Проверяем, что email не занят другим пользователем (без учета регистра)
+        if User.objects.email_exists(email, exclude_pk=self.instance.pk):
             raise forms.ValidationError('Пользователь с таким email уже существует')
         return email
 
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.outbox import get_batch_size, send_batch
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди (outbox) пачками через одно соединение с почтовым сервером'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Писем в одной пачке (по умолчанию EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--loop', action='store_true', help='Работать постоянно, проверяя очередь'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=5,
+            help='Пауза при пустой очереди в режиме --loop, секунды',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or get_batch_size()
+        if batch_size < 1 or options['interval'] < 1:
+            raise CommandError('--batch-size и --interval должны быть положительными')
+
+        if options['loop']:
+            self.stdout.write('📬 Обработка очереди писем (Ctrl+C для остановки)')
+            try:
+                while True:
+                    if not self.drain(batch_size):
+                        time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
+        elif not self.drain(batch_size):
+            self.stdout.write('Очередь писем пуста')
+
+    def drain(self, batch_size):
+        """Отправляет пачки, пока в очереди есть письма с наступившим сроком.
+        Возвращает число обработанных писем"""
+        processed = 0
+        while True:
+            sent, retried, failed = send_batch(batch_size)
+            total = sent + retried + failed
+            if not total:
+                return processed
+            processed += total
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Отправлено: {sent}, отложено: {retried}, не доставлено: {failed}'
+            ))
+            # Неполная пачка — очередь исчерпана (отложенные письма ждут своего срока)
+            if total < batch_size or sent == 0:
+                return processed
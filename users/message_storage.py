@@ -0,0 +1,26 @@
+from django.contrib.messages.storage.fallback import FallbackStorage
+
+
+class CookieFirstStorage(FallbackStorage):
+    """
+    Хранилище сообщений: cookie, а сессия — только для вошедших пользователей.
+
+    Для вошедших поведение как у FallbackStorage: сообщения, не поместившиеся
+    в cookie, переносятся в сессию. Для гостей сессия не используется вовсе
+    (ни чтение, ни запись), поэтому сообщение гостю не создает сессию;
+    не поместившиеся в cookie старые сообщения отбрасываются.
+    """
+
+    def _uses_session(self):
+        user = getattr(self.request, 'user', None)
+        return user is not None and user.is_authenticated
+
+    def _get(self, *args, **kwargs):
+        if self._uses_session():
+            return super()._get(*args, **kwargs)
+        return self.storages[0]._get()
+
+    def _store(self, messages, response, *args, **kwargs):
+        if self._uses_session():
+            return super()._store(messages, response, *args, **kwargs)
+        return self.storages[0]._store(messages, response, *args, **kwargs)
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_unpublished_counters(apps, schema_editor):
+    CustomUser = apps.get_model("users", "CustomUser")
+    Product = apps.get_model("catalog", "Product")
+
+    counts = (
+        Product.objects.filter(owner=OuterRef("pk"))
+        .exclude(publish="published")
+        .order_by()
+        .values("owner")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    CustomUser.objects.update(unpublished_products_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+        ("catalog", "0002_alter_product_options_product_owner_product_publish"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="unpublished_products_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Неопубликованных товаров"
+            ),
+        ),
+        migrations.RunPython(fill_unpublished_counters, migrations.RunPython.noop),
+    ]
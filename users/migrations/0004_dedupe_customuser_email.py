@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:20
+
+from django.db import migrations
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Lower
+
+
+def dedupe_emails(apps, schema_editor):
+    """
+    Объединяет аккаунты, email которых различается только регистром.
+
+    Остается аккаунт с самым поздним входом (при равенстве — более ранний),
+    ему передаются товары остальных. Дубликаты не удаляются: они
+    деактивируются, а их адрес заменяется служебным, чтобы не нарушать
+    уникальность. Затем все адреса приводятся к нижнему регистру.
+    """
+    CustomUser = apps.get_model("users", "CustomUser")
+    Product = apps.get_model("catalog", "Product")
+
+    duplicated = (
+        CustomUser.objects.annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(total=Count("pk"))
+        .filter(total__gt=1)
+        .values_list("email_lower", flat=True)
+    )
+    for email in list(duplicated):
+        users = list(
+            CustomUser.objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower=email)
+            .order_by(F("last_login").desc(nulls_last=True), "pk")
+        )
+        keep, duplicates = users[0], users[1:]
+        Product.objects.filter(owner__in=duplicates).update(owner=keep)
+        for user in duplicates:
+            user.email = f"duplicate-{user.pk}.{user.email}"[:254]
+            user.is_active = False
+            user.save(update_fields=["email", "is_active"])
+
+    # Счетчики неопубликованных товаров после передачи товаров
+    counts = (
+        Product.objects.filter(owner=OuterRef("pk"))
+        .exclude(publish="published")
+        .order_by()
+        .values("owner")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    CustomUser.objects.update(
+        email=Lower("email"),
+        unpublished_products_count=Coalesce(Subquery(counts), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_outboxemail"),
+        ("catalog", "0006_product_excerpt"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_emails, migrations.RunPython.noop),
+    ]
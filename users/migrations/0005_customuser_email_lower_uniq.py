@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:21
+
+import django.db.models.functions.text
+import users.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0004_dedupe_customuser_email"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="customuser",
+            managers=[
+                ("objects", users.models.CustomUserManager()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="customuser",
+            name="email",
+            field=models.EmailField(max_length=254, verbose_name="Email адрес"),
+        ),
+        migrations.AddConstraint(
+            model_name="customuser",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("email"),
+                name="users_customuser_email_lower_uniq",
+                violation_error_message="Пользователь с таким email уже существует",
+            ),
+        ),
+    ]
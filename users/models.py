@@ -1,14 +1,49 @@
-
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+
+class CustomUserManager(UserManager):
+    """Менеджер пользователей с регистронезависимым email.
+
+    Email хранится в нормализованном виде (в нижнем регистре), а поиск идет
+    по выражению lower(email) — по нему построен уникальный индекс, поэтому
+    вход и проверки занятости адреса выполняются одним обращением к индексу."""
+
+    @classmethod
+    def normalize_email(cls, email):
+        return (email or '').strip().lower()
+
+    def filter_by_email(self, email):
+        # lower() на стороне базы — то же выражение, что и в индексе
+        return self.alias(email_lower=Lower('email')).filter(
+            email_lower=Lower(Value(self.normalize_email(email)))
+        )
+
+    def get_by_email(self, email):
+        return self.filter_by_email(email).get()
+
+    def email_exists(self, email, exclude_pk=None):
+        queryset = self.filter_by_email(email)
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        return queryset.exists()
+
+    def get_by_natural_key(self, username):
+        return self.get_by_email(username)
+
+    async def aget_by_natural_key(self, username):
+        return await self.filter_by_email(username).aget()
 
 
 class CustomUser(AbstractUser):
     """Кастомная модель пользователя с дополнительными полями"""
 
+    # Уникальность — ограничением на lower(email) (см. Meta.constraints)
     email = models.EmailField(
         max_length=254,
-        unique=True,
         verbose_name="Email адрес",
     )
 
@@ -40,13 +75,101 @@ class CustomUser(AbstractUser):
         verbose_name="Страна"
     )
 
+    # Денормализованный счетчик: поддерживается сигналами каталога
+    # (catalog/signals.py), пересчитывается командой rebuild_unpublished_counters
+    unpublished_products_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Неопубликованных товаров"
+    )
+
     # ВАЖНО: Эти поля должны быть на уровне класса!
     USERNAME_FIELD = 'email'  # Используем email для входа
     REQUIRED_FIELDS = ['username']  # обязательные поля при создании суперпользователя
 
+    objects = CustomUserManager()
+
     def __str__(self):
         return self.email
 
+    # Поля, которые меняются только запросами UPDATE с F() (сигналы каталога)
+    # и не записываются обычным save(): иначе значение, загруженное при открытии
+    # формы профиля или админки, затерло бы изменения, сделанные за это время
+    COUNTER_FIELDS = ('unpublished_products_count',)
+
+    def save(self, *args, **kwargs):
+        # Адрес нормализуется при любом сохранении, не только через формы и create_user
+        self.email = type(self).objects.normalize_email(self.email)
+        if (
+            kwargs.get('update_fields') is None
+            and not self._state.adding
+            and not kwargs.get('force_insert')
+        ):
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Пользователь'
-        verbose_name_plural = 'Пользователи'
\ No newline at end of file
+        verbose_name_plural = 'Пользователи'
+        constraints = [
+            models.UniqueConstraint(
+                Lower('email'),
+                name='users_customuser_email_lower_uniq',
+                violation_error_message='Пользователь с таким email уже существует',
+            ),
+        ]
+
+
+class OutboxEmail(models.Model):
+    """Письмо в очереди на отправку (см. users/outbox.py и команду send_outbox).
+
+    Письмо сохраняется в той же транзакции, что и вызвавшее его изменение,
+    и становится доступно обработчику только после фиксации. Обработчик
+    отправляет письма пачками через одно SMTP-соединение, повторяет неудачные
+    попытки с растущей задержкой и после исчерпания попыток помечает письмо
+    как недоставленное."""
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Не доставлено'),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name="Тема")
+    body = models.TextField(verbose_name="Текст")
+    html_body = models.TextField(blank=True, default='', verbose_name="HTML")
+    from_email = models.CharField(max_length=254, blank=True, verbose_name="Отправитель")
+    to = models.JSONField(default=list, verbose_name="Получатели")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Статус"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, default='', verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name="Отправлено")
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)}"
+
+    class Meta:
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Очередь писем'
+        indexes = [
+            # Выборка обработчика: письма в очереди, срок попытки которых наступил
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                name='outbox_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
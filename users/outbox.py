@@ -0,0 +1,171 @@
+"""
+Очередь исходящих писем (outbox).
+
+enqueue_email сохраняет готовое письмо в таблицу OutboxEmail в текущей
+транзакции, поэтому запрос, который его создал, не ждет SMTP-сервер, а
+письмо не уходит, если транзакция откатилась. Команда send_outbox забирает
+письма пачками и отправляет их через одно соединение почтового бэкенда.
+
+Неудачная отправка повторяется с экспоненциальной задержкой; после
+EMAIL_OUTBOX_MAX_ATTEMPTS попыток письмо получает статус «Не доставлено»
+и остается в таблице для разбора (в админке его можно вернуть в очередь).
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# Максимальная задержка между попытками
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def get_batch_size():
+    return getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+
+
+def get_max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def get_retry_delay():
+    """Задержка перед первой повторной попыткой, секунды"""
+    return getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+
+
+def enqueue_email(subject, body, to, html_body='', from_email=None):
+    """
+    Ставит письмо в очередь на отправку.
+
+    :param subject: тема
+    :param body: текстовая версия
+    :param to: список адресов получателей
+    :param html_body: HTML-версия (необязательно)
+    :param from_email: отправитель (по умолчанию DEFAULT_FROM_EMAIL)
+    :return: OutboxEmail
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+        to=list(to),
+    )
+
+
+def enqueue_bulk(subject, body, recipients, html_body='', from_email=None, batch_size=1000):
+    """
+    Ставит в очередь одно и то же письмо отдельно каждому получателю
+    (вставка пачками, например для недоставленных писем рассылки).
+
+    :return: количество писем, поставленных в очередь
+    """
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL or ''
+    emails = [
+        OutboxEmail(
+            subject=subject, body=body, html_body=html_body, from_email=from_email, to=[recipient]
+        )
+        for recipient in recipients
+    ]
+    OutboxEmail.objects.bulk_create(emails, batch_size=batch_size)
+    return len(emails)
+
+
+def build_message(email, mail_connection=None):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        # Пустой отправитель — DEFAULT_FROM_EMAIL на момент отправки
+        from_email=email.from_email or None,
+        to=email.to,
+        connection=mail_connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка со случайным разбросом, чтобы повторы не шли волной"""
+    delay = timedelta(seconds=get_retry_delay() * 2 ** (attempts - 1))
+    delay = min(delay, MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def send_batch(batch_size=None):
+    """
+    Отправляет одну пачку писем, срок попытки которых наступил.
+
+    Строки пачки блокируются до конца обработки (на PostgreSQL с SKIP LOCKED),
+    поэтому несколько обработчиков не отправят одно письмо дважды.
+
+    :return: (отправлено, отложено для повтора, не доставлено)
+    """
+    batch_size = batch_size or get_batch_size()
+    sent = retried = failed = 0
+    now = timezone.now()
+
+    with transaction.atomic():
+        queryset = OutboxEmail.objects.filter(
+            status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now
+        ).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        emails = list(queryset[:batch_size])
+        if not emails:
+            return sent, retried, failed
+
+        # Одно соединение с почтовым сервером на всю пачку
+        mail_connection = get_connection(fail_silently=False)
+        try:
+            mail_connection.open()
+        except Exception as error:
+            # Сервер недоступен — проблема не в письмах: откладываем пачку, не расходуя попытки
+            logger.warning('Почтовый сервер недоступен: %s', error)
+            for email in emails:
+                email.last_error = f'{type(error).__name__}: {error}'
+                email.next_attempt_at = timezone.now() + retry_delay(email.attempts + 1)
+            OutboxEmail.objects.bulk_update(emails, ['next_attempt_at', 'last_error'])
+            return sent, len(emails), failed
+
+        try:
+            for email in emails:
+                email.attempts += 1
+                try:
+                    build_message(email, mail_connection).send()
+                except Exception as error:
+                    email.last_error = f'{type(error).__name__}: {error}'
+                    if email.attempts >= get_max_attempts():
+                        email.status = OutboxEmail.STATUS_FAILED
+                        failed += 1
+                        logger.error('Письмо %s не доставлено: %s', email.pk, email.last_error)
+                    else:
+                        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                        retried += 1
+                else:
+                    email.status = OutboxEmail.STATUS_SENT
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    sent += 1
+        finally:
+            mail_connection.close()
+
+        OutboxEmail.objects.bulk_update(
+            emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+
+    return sent, retried, failed
+
+
+def retry_failed(queryset):
+    """Возвращает недоставленные письма в очередь (действие админки)"""
+    return queryset.filter(status=OutboxEmail.STATUS_FAILED).update(
+        status=OutboxEmail.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+    )
@@ -0,0 +1,90 @@
+"""
+Движок сессий: кэш (Redis) как основное хранилище, база — отложенная копия.
+
+Чтение идет из кэша, в базу — только при промахе (как в cached_db).
+Сохранение всегда обновляет кэш, а строку django_session — не чаще раза в
+SESSION_DB_WRITE_INTERVAL секунд для одной сессии. Создание сессии (вход,
+смена ключа) записывается в базу сразу.
+
+Если кэш потеряет сессию, она восстановится из базы с изменениями не старше
+одного интервала. Сессия без данных не создается вовсе (SessionMiddleware
+не сохраняет пустую сессию), поэтому просмотр сайта гостем не обращается
+ни к кэшу сессий, ни к базе; сообщения гостей хранятся в cookie
+(users/message_storage.py).
+
+Подключение: SESSION_ENGINE = 'users.sessions'.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+logger = logging.getLogger('django.contrib.sessions')
+
+SYNC_KEY_PREFIX = 'users.sessions.synced:'
+
+
+def get_db_write_interval():
+    """Не чаще какого интервала сессия записывается в базу, секунды"""
+    return getattr(settings, 'SESSION_DB_WRITE_INTERVAL', 60 * 5)
+
+
+class SessionStore(CachedDBStore):
+
+    def sync_key(self, session_key=None):
+        return SYNC_KEY_PREFIX + (session_key or self.session_key)
+
+    def db_write_due(self):
+        """
+        True, если сессию пора записать в базу.
+
+        cache.add атомарен: из одновременных запросов запись в базу
+        выполнит только тот, кто первым поставил отметку.
+        """
+        try:
+            return self._cache.add(self.sync_key(), 1, get_db_write_interval())
+        except Exception:
+            return True
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or self.db_write_due():
+            super().save(must_create)
+            if self.session_key is not None:
+                self.mark_synced()
+            return
+        try:
+            self._cache.set(self.cache_key, self._get_session(), self.get_expiry_age())
+        except Exception:
+            # Кэш недоступен — данные не должны потеряться
+            logger.exception('Error saving to cache (%s)', self._cache)
+            super().save()
+
+    def mark_synced(self):
+        try:
+            self._cache.set(self.sync_key(), 1, get_db_write_interval())
+        except Exception:
+            pass
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        super().delete(session_key)
+        if session_key is not None:
+            self._cache.delete(self.sync_key(session_key))
+
+    async def asave(self, must_create=False):
+        if must_create or self.session_key is None or await self._cache.aadd(
+            self.sync_key(), 1, get_db_write_interval()
+        ):
+            await super().asave(must_create)
+            if self.session_key is not None:
+                await self._cache.aset(self.sync_key(), 1, get_db_write_interval())
+            return
+        await self._cache.aset(
+            await self.acache_key(), await self._aget_session(), await self.aget_expiry_age()
+        )
+
+    async def adelete(self, session_key=None):
+        session_key = session_key or self.session_key
+        await super().adelete(session_key)
+        if session_key is not None:
+            await self._cache.adelete(self.sync_key(session_key))
@@ -1,3 +1,201 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import Category, Product
+from .forms import CustomUserCreationForm, UserProfileForm
+from .models import OutboxEmail
+from .outbox import enqueue_email, retry_failed, send_batch
+from .sessions import SessionStore
+
+
+User = get_user_model()
+
+
+class CaseInsensitiveEmailTests(TestCase):
+    """Email хранится в нижнем регистре и ищется без учета регистра через индекс"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='foo', email=' Foo@Example.COM ', password='pass'
+        )
+
+    def test_email_is_stored_normalized(self):
+        self.assertEqual(self.user.email, 'foo@example.com')
+
+    def test_login_ignores_case(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(authenticate(username='FOO@example.com', password='pass'), self.user)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LOWER("users_customuser"."email")', queries[0]['sql'])
+        self.assertIsNone(authenticate(username='FOO@example.com', password='wrong'))
+
+    def test_database_rejects_case_variant(self):
+        with self.assertRaises(IntegrityError):
+            # Обход нормализации в save(): уникальность держит индекс на lower(email)
+            User.objects.bulk_create([User(username='bar', email='FOO@example.com')])
+
+    def test_forms_reject_case_variant(self):
+        form = CustomUserCreationForm(data={
+            'username': 'bar',
+            'email': 'FOO@EXAMPLE.COM',
+            'password1': 'Str0ng-pass-123',
+            'password2': 'Str0ng-pass-123',
+        })
+        self.assertIn('email', form.errors)
+
+        other = User.objects.create_user(username='bar', email='bar@example.com', password='pass')
+        form = UserProfileForm(data={'username': 'bar', 'email': 'Foo@example.com'}, instance=other)
+        self.assertIn('email', form.errors)
+        # Собственный адрес в другом регистре не считается занятым
+        form = UserProfileForm(
+            data={'username': 'foo', 'email': 'FOO@example.com'}, instance=self.user
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['email'], 'foo@example.com')
+
+
+class UnpublishedCounterPreservationTests(TestCase):
+    """Обычное сохранение пользователя не затирает счетчик, измененный сигналами каталога"""
+
+    def test_profile_save_keeps_counter_changed_meanwhile(self):
+        user = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pass'
+        )
+        category = Category.objects.create(name='Плагины')
+        product = Product.objects.create(
+            name='Плагин',
+            description='Описание',
+            price=100,
+            category=category,
+            owner=user,
+            publish='published',
+        )
+
+        # Форма открыта с пользователем, загруженным до снятия товара с публикации
+        stale_user = User.objects.get(pk=user.pk)
+        form = UserProfileForm(
+            data={'username': 'owner', 'email': 'owner@example.com', 'first_name': 'Иван'},
+            instance=stale_user,
+        )
+        product.publish = 'pending'
+        product.save()
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, 'Иван')
+        self.assertEqual(user.unpublished_products_count, 1)
+
+
+class OutboxEmailTests(TestCase):
+    """Письма ставятся в очередь и отправляются пачками с повторами"""
+
+    def test_registration_enqueues_welcome_email(self):
+        response = self.client.post(reverse('users:register'), {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password1': 'Str0ng-pass-123',
+            'password2': 'Str0ng-pass-123',
+        })
+        self.assertRedirects(response, reverse('catalog:index'), fetch_redirect_response=False)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, ['new@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(send_batch(), (1, 0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.STATUS_SENT)
+        self.assertIsNotNone(email.sent_at)
+        # Повторный запуск ничего не отправляет
+        self.assertEqual(send_batch(), (0, 0, 0))
+
+    def test_batch_uses_one_connection(self):
+        for index in range(3):
+            enqueue_email('Тема', 'Текст', [f'user{index}@example.com'])
+        with mock.patch('users.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertEqual(send_batch(batch_size=2), (2, 0, 0))
+        get_connection.assert_called_once()
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.STATUS_PENDING).count(), 1)
+
+    def test_failed_send_is_retried_then_dead_lettered(self):
+        email = enqueue_email('Тема', 'Текст', ['user@example.com'])
+        with self.settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2), \
+                mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('timeout')):
+            self.assertEqual(send_batch(), (0, 1, 0))
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            # До срока повторной попытки письмо не берется
+            self.assertEqual(send_batch(), (0, 0, 0))
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_batch(), (0, 0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.STATUS_FAILED)
+        self.assertIn('timeout', email.last_error)
+
+        self.assertEqual(retry_failed(OutboxEmail.objects.all()), 1)
+        self.assertEqual(send_batch(), (1, 0, 0))
+
+
+class SessionStorageTests(TestCase):
+    """Сессии читаются из кэша, в базу пишутся с задержкой; гостям сессия не создается"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_session_changes_are_written_behind(self):
+        session = SessionStore()
+        session['step'] = 1
+        session.save()
+        key = session.session_key
+        self.assertEqual(Session.objects.get(pk=key).get_decoded(), {'step': 1})
+
+        session['step'] = 2
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+            self.assertEqual(SessionStore(key)['step'], 2)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(Session.objects.get(pk=key).get_decoded(), {'step': 1})
+
+        # Интервал истек — следующее сохранение записывает сессию в базу
+        cache.delete(session.sync_key())
+        session.save()
+        self.assertEqual(Session.objects.get(pk=key).get_decoded(), {'step': 2})
+
+        session.delete()
+        self.assertFalse(Session.objects.filter(pk=key).exists())
+        self.assertEqual(SessionStore(key).load(), {})
+
+    def test_anonymous_browsing_creates_no_session(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('catalog:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
+    def test_logout_message_is_kept_in_cookie(self):
+        user = User.objects.create_user(username='foo', email='foo@example.com', password='pass')
+        self.client.force_login(user)
+
+        response = self.client.post(reverse('users:logout'))
+        self.assertIn('messages', response.cookies)
+        self.assertFalse(Session.objects.exists())
 
-# Create your tests here.
+        response = self.client.get(reverse('catalog:index'))
+        self.assertContains(response, 'Вы успешно вышли из системы')
+        self.assertFalse(Session.objects.exists())
@@ -6,10 +6,10 @@ from django.contrib import messages
 from django.views.generic import CreateView, TemplateView, UpdateView
 from django.urls import reverse_lazy
 from django.template.loader import render_to_string
-from django.core.mail import send_mail
-from django.conf import settings
+from django.db import transaction
 from django.contrib.auth import get_user_model
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, UserProfileForm
+from .outbox import enqueue_email
 
 
 User = get_user_model()
@@ -23,41 +23,36 @@ class RegisterView(CreateView):
 
     def form_valid(self, form):
         """Автоматический вход после успешной регистрации"""
-        # Создаем пользователя вручную
-        user = form.save()
+        # Пользователь и приветственное письмо сохраняются вместе: письмо
+        # попадет в очередь, только если регистрация зафиксирована
+        with transaction.atomic():
+            user = form.save()
+            self.send_welcome_email(user)
 
-        # Работаем с созданным пользователем
-        self.send_welcome_email(user)
         login(self.request, user)
         messages.success(self.request, 'Регистрация прошла успешно! Добро пожаловать!')
         return redirect('catalog:index')
 
     def send_welcome_email(self, user):
-        """Отправка приветственного email"""
-        try:
-            subject = 'Добро пожаловать в Skystore!'
-
-            context = {
-                'user': user,
-                'site_name': 'Skystore',
-                'site_url': self.request.build_absolute_uri('/'),
-            }
-
-            html_message = render_to_string('users/emails/welcome_email.html', context)
-            plain_message = render_to_string('users/emails/welcome_email.txt', context)
-
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],  # Здесь используем user.email
-                html_message=html_message,
-                fail_silently=True,
-            )
-
-        except Exception as e:
-            print(f"Ошибка отправки email: {e}")
-
+        """Постановка приветственного email в очередь (отправляет команда send_outbox)"""
+        subject = 'Добро пожаловать в Skystore!'
+
+        context = {
+            'user': user,
+            'site_name': 'Skystore',
+            'site_url': self.request.build_absolute_uri('/'),
+        }
+
+        html_message = render_to_string('users/emails/welcome_email.html', context)
+        plain_message = render_to_string('users/emails/welcome_email.txt', context)
+
+        # Письмо сохраняется в транзакции запроса: регистрация не ждет почтовый сервер
+        enqueue_email(
+            subject=subject,
+            body=plain_message,
+            to=[user.email],
+            html_body=html_message,
+        )
 
     def dispatch(self, request, *args, **kwargs):
         """Если пользователь уже авторизован, перенаправляем на главную"""